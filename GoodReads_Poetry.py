@@ -3,6 +3,7 @@
 import ujson as json
 import math
 import sys
+import os
 
 from lib.Stream import BipartiteStream
 from lib.StreamProperties import *
@@ -18,8 +19,12 @@ data_file = sys.argv[1]
 h = 2
 a = 2
 
-s = BipartiteStream()
-s.readStream(data_file)
+if os.path.isdir(data_file):
+    # Stream saved with Stream.save_binary()
+    s = BipartiteStream.open_mmap(data_file)
+else:
+    s = BipartiteStream()
+    s.readStream(data_file)
 # s.E = s.E[0:10]
 print(len(s.E))
 # print(s.E)
@@ -0,0 +1,285 @@
+from lib.TimeNode import TimeNode, intern_node
+
+_FINGERPRINT_MASK = (1 << 64) - 1
+
+class BitsetTimeNodeSet:
+    """
+        TimeNodeSet backend for discrete-time streams: the presence of each
+        node is a bitmap over time slots, bit k standing for the slot
+        [alpha + k * step, alpha + (k + 1) * step). Intersection, union and
+        difference are bitwise operations, and durations are popcounts.
+
+        Times are rounded outwards to slot boundaries, so zero-length
+        intervals are empty. Use BitsetTimeNodeSet.slots(step, alpha) to get
+        the backend for a given time grid.
+    """
+    step = 1
+    alpha = 0
+
+    _classes = {}
+
+    @classmethod
+    def slots(cls, step, alpha=0):
+        """
+            Returns the BitsetTimeNodeSet class for slots of length step starting at alpha
+        """
+        if (step, alpha) not in cls._classes:
+            cls._classes[(step, alpha)] = type(cls.__name__, (cls,), { "step": step, "alpha": alpha })
+        return cls._classes[(step, alpha)]
+
+    def __init__(self, *args):
+        """
+            elements: list of TimeNodes
+        """
+        if len(args) == 0:
+            _elements = []
+        elif len(args) == 1:
+            if type(args[0]) is not list:
+                raise TypeError("BitsetTimeNodeSet only accepts a list of TimeNode as argument")
+
+            _elements = args[0]
+        else:
+            # There can only be 0 or 1 arg
+            raise NotImplementedError("BitsetTimeNodeSet can only have 0 or 1 argument.")
+
+        # node -> bitmap of its time slots
+        self.bits = {}
+        self._fingerprint = 0
+
+        for w in _elements:
+            self.add(w)
+
+    @classmethod
+    def from_intervals(cls, intervals):
+        """
+            Builds a set from (node, b, e, label) tuples, in any order and
+            possibly overlapping. Labels are not stored.
+        """
+        new = cls()
+        bits = {}
+        for u, b, e, _ in intervals:
+            u = intern_node(u)
+            bits[u] = bits.get(u, 0) | new._mask(b, e)
+
+        for u, mask in bits.items():
+            new._set_bits(u, mask)
+        return new
+
+    def _mask(self, b, e):
+        """
+            Bitmap of the slots covering [b, e]
+        """
+        first = int((b - self.alpha) // self.step)
+        last = -int((self.alpha - e) // self.step)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def _set_bits(self, u, mask):
+        if u in self.bits:
+            self._fingerprint -= self._hash_bits(u, self.bits[u])
+        if mask == 0:
+            self.bits.pop(u, None)
+        else:
+            self.bits[u] = mask
+            self._fingerprint += self._hash_bits(u, mask)
+        self._fingerprint &= _FINGERPRINT_MASK
+
+    def _hash_bits(self, u, mask):
+        """
+            Sum of the hashes of the TimeNodes of a bitmap, as in TimeNodeSet
+        """
+        return sum([ hash((u, b, e)) for b, e in self._runs(mask) ])
+
+    def _coerce(self, x):
+        """
+            Returns the bitmaps of x, converting it from another backend if needed.
+        """
+        if isinstance(x, BitsetTimeNodeSet) and x.step == self.step and x.alpha == self.alpha:
+            return x.bits
+
+        bits = {}
+        for w in x.values():
+            bits[w.node] = bits.get(w.node, 0) | self._mask(w.b, w.e)
+        return bits
+
+    def _runs(self, mask):
+        """
+            Yields the (b, e) intervals of the consecutive slots of a bitmap
+        """
+        offset = 0
+        while mask:
+            low = (mask & -mask).bit_length() - 1
+            mask >>= low
+            offset += low
+            length = (~mask & (mask + 1)).bit_length() - 1
+            yield self.alpha + offset * self.step, self.alpha + (offset + length) * self.step
+            mask >>= length
+            offset += length
+
+    @property
+    def elements(self):
+        """
+            Read-only view of the set as a dict of TimeNode lists,
+            for code written against TimeNodeSet.elements
+        """
+        return _ElementsView(self)
+
+    def _node_values(self, u):
+        for b, e in self._runs(self.bits[u]):
+            yield TimeNode(u, b, e, set())
+
+    def __iter__(self):
+        return self.values()
+
+    def __eq__(self, o):
+        """
+            Two TimeNodeSets are equal if they contain the same elements
+        """
+        if not isinstance(o, BitsetTimeNodeSet):
+            return all([x in o for x in self]) and len(self) == len(o)
+
+        return self._fingerprint == o._fingerprint and self.bits == self._coerce(o)
+
+    def __hash__(self):
+        return self._fingerprint
+
+    def fingerprint(self):
+        """
+            Returns a canonical fingerprint of the elements of the set: the
+            same as that of a TimeNodeSet with the same elements.
+        """
+        return self._fingerprint
+
+    def __contains__(self, x):
+        """
+            Returns True if the TimeNode x is an element of the set
+        """
+        return x in self.overlapping(x.node, x.b, x.e)
+
+    def covers(self, u, t):
+        """
+            Returns True if node u is in the set at time t
+        """
+        if not u in self.bits:
+            return False
+
+        k = int((t - self.alpha) // self.step)
+        return k >= 0 and (self.bits[u] >> k) & 1 == 1
+
+    def overlapping(self, u, b, e):
+        """
+            Returns the TimeNodes of node u that overlap [b, e]
+        """
+        if not u in self.bits:
+            return []
+
+        return [ x for x in self._node_values(u) if x.b <= e and b <= x.e ]
+
+    def json(self):
+        """
+            Returns a JSON representation
+        """
+        return [ x.json() for x in self.values() ]
+
+    def nodes(self):
+        return self.bits.keys()
+
+    def add(self, x):
+        u = intern_node(x.node)
+        self._set_bits(u, self.bits.get(u, 0) | self._mask(x.b, x.e))
+
+    def intersection(self, x):
+        """
+            Intersection of two TimeNodeSets.
+        """
+        bits = self._coerce(x)
+        intersection_set = type(self)()
+
+        for u in self.bits:
+            if u in bits:
+                intersection_set._set_bits(u, self.bits[u] & bits[u])
+
+        return intersection_set
+
+    def union(self, x):
+        """
+            Union of two TimeNodeSets.
+        """
+        bits = self._coerce(x)
+        union_set = type(self)()
+
+        for u in self.bits.keys() | bits.keys():
+            union_set._set_bits(u, self.bits.get(u, 0) | bits.get(u, 0))
+
+        return union_set
+
+    def difference(self, x):
+        """
+            Difference of two TimeNodeSets: elements of self not in x.
+        """
+        bits = self._coerce(x)
+        difference_set = type(self)()
+
+        for u in self.bits:
+            difference_set._set_bits(u, self.bits[u] & ~bits.get(u, 0))
+
+        return difference_set
+
+    def issubset(self, x):
+        """
+            Returns True if every element of self is covered by x
+        """
+        return len(self.difference(x)) == 0
+
+    def duration(self):
+        """
+            Total duration of the elements of the set
+        """
+        return sum(( bin(mask).count("1") for mask in self.bits.values() )) * self.step
+
+    def copy(self):
+        new = type(self)()
+        new.bits = dict(self.bits)
+        new._fingerprint = self._fingerprint
+        return new
+
+    def __len__(self):
+        # Number of runs of consecutive slots
+        return sum(( bin(mask & ~(mask << 1)).count("1") for mask in self.bits.values() ))
+
+    def values(self):
+        for u in self.bits:
+            yield from self._node_values(u)
+
+    def __str__(self):
+        ret = list(str(list(self.values())))
+        ret = ["{"] + ret[1:-1] + ["}"]
+        return "".join(ret)
+
+    def __repr__(self):
+        return str(self.__str__())
+
+class _ElementsView:
+    """
+        Mapping node -> list of TimeNodes over a BitsetTimeNodeSet
+    """
+    def __init__(self, tns):
+        self.tns = tns
+
+    def __contains__(self, u):
+        return u in self.tns.bits
+
+    def __getitem__(self, u):
+        if not u in self.tns.bits:
+            raise KeyError(u)
+        return list(self.tns._node_values(u))
+
+    def __iter__(self):
+        return iter(self.tns.bits)
+
+    def keys(self):
+        return self.tns.bits.keys()
+
+    def __len__(self):
+        return len(self.tns.bits)
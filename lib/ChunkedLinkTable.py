@@ -0,0 +1,362 @@
+import os
+import numpy as np
+
+from lib.LinkTable import LinkTable, _COLUMNS
+from lib.StreamCSR import StreamCSR
+from lib.binary import write_arrays, read_arrays
+
+def _merged(name):
+    return property(lambda self: getattr(self._table(), name))
+
+class ChunkedLinkTable(LinkTable):
+    """
+        Store for the links of a stream (Stream.E) partitioned by time:
+        chunk k is a LinkTable holding the links beginning in
+        [alpha + k * length, alpha + (k + 1) * length), with its own sorted
+        events (a StreamCSR) and the period its links span. Queries on a
+        period of time only go through the chunks overlapping it.
+
+        Chunks can be saved to a directory (see save()) and opened from it
+        (see open()): they then stay on disk, are memory-mapped when first
+        used, and can be sent back to disk with evict().
+
+        It behaves as a list of link dicts, in the order the links were
+        added, and as the LinkTable of all of them: its columns, nodes and
+        labels are those of the chunks merged, built when first read (see
+        _table()). Use ChunkedLinkTable.chunks(length, alpha) to get the
+        store for a given partition.
+    """
+    length = 1
+    alpha = 0
+
+    _classes = {}
+
+    # Columns, nodes and labels of LinkTable, over all the links
+    u, v, b, e, left, right = [ _merged(name) for name in _COLUMNS ]
+    nodes, node_ids, labels, label_ids = [ _merged(name) for name in ("nodes", "node_ids", "labels", "label_ids") ]
+
+    @classmethod
+    def chunks(cls, length, alpha=0):
+        """
+            Returns the ChunkedLinkTable class for chunks of length length starting at alpha
+        """
+        if (length, alpha) not in cls._classes:
+            cls._classes[(length, alpha)] = type(cls.__name__, (cls,), { "length": length, "alpha": alpha })
+        return cls._classes[(length, alpha)]
+
+    def __init__(self, links=[]):
+        # chunk index -> _Chunk
+        self._chunks = {}
+        # Chunk of each link, and its index in the chunk
+        self._chunk_of = []
+        self._local = []
+        # All the links as a LinkTable, see _table()
+        self._all = None
+        # Events of the chunks last combined by csr(), with the (chunks, number of links) they were for
+        self._csr = None
+        self._csr_of = None
+
+        for l in links:
+            self.append(l)
+
+    def _chunk_index(self, t):
+        return int((t - self.alpha) // self.length)
+
+    def append(self, l):
+        k = self._chunk_index(l["b"])
+        if k not in self._chunks:
+            self._chunks[k] = _Chunk()
+
+        if not isinstance(self._chunk_of, list):
+            self._chunk_of = self._chunk_of.tolist()
+            self._local = self._local.tolist()
+
+        self._chunk_of.append(k)
+        self._local.append(self._chunks[k].append(len(self._chunk_of) - 1, l))
+        if self._all is not None:
+            self._all.append(l)
+
+    @property
+    def n(self):
+        return len(self._chunk_of)
+
+    def _table(self):
+        """
+            Returns all the links as a LinkTable, in order, with the nodes
+            and labels numbered in the order they appear in the links. It
+            is built from the chunks, reading all of them, when first used,
+            and extended when links are added.
+        """
+        if self._all is None:
+            chunks = [ self._chunks[k] for k in sorted(self._chunks) ]
+            nodes, node_rows = _first_seen(chunks, "nodes", ("u", "v"))
+            labels, label_rows = _first_seen(chunks, "labels", ("left", "right"))
+
+            columns = { col: np.empty(len(self), dtype=np.float64 if col in ("b", "e") else np.int64) for col in _COLUMNS }
+            for chunk, nodes_k, labels_k in zip(chunks, node_rows, label_rows):
+                table, ids = chunk.table, chunk.ids()
+                # Indices in the chunk are mapped to those in nodes and labels
+                rows = { "u": nodes_k, "v": nodes_k, "left": labels_k, "right": labels_k }
+                for col in _COLUMNS:
+                    values = getattr(table, col)[:table.n]
+                    columns[col][ids] = rows[col][values] if col in rows else values
+
+            self._all = LinkTable.from_arrays(*[ columns[col] for col in _COLUMNS ], nodes, labels)
+        return self._all
+
+    def global_ids(self):
+        return self._table().global_ids()
+
+    def csr(self, b=-np.inf, e=np.inf):
+        """
+            Returns the sorted events of the links of the chunks overlapping
+            [b, e] (see StreamCSR), combined from the events of each chunk:
+            they hold all the links overlapping [b, e], and possibly others.
+            Link numbers are indices in the whole table, and nodes are
+            numbered in the order they appear in these links.
+        """
+        keys = [ k for k in sorted(self._chunks) if self._chunks[k].b <= e and self._chunks[k].e >= b ]
+        if self._csr_of != (keys, len(self)):
+            chunks = [ self._chunks[k] for k in keys ]
+            nodes, rows = _first_seen(chunks, "nodes", ("u", "v"))
+            self._csr = StreamCSR.combine([ (chunk.csr(), rows_k, chunk.ids()) for chunk, rows_k in zip(chunks, rows) ], nodes)
+            self._csr_of = (keys, len(self))
+        return self._csr
+
+    def copy(self):
+        """
+            Returns a copy of the table, sharing its chunks until either table modifies them.
+        """
+        new = type(self)()
+        new._chunks = { k: chunk.copy() for k, chunk in self._chunks.items() }
+        if isinstance(self._chunk_of, list):
+            new._chunk_of, new._local = list(self._chunk_of), list(self._local)
+        else:
+            new._chunk_of, new._local = self._chunk_of, self._local
+        if self._all is not None:
+            new._all = self._all.copy()
+        return new
+
+    def overlapping(self, b, e):
+        """
+            Returns the chunks holding links that overlap [b, e], by time
+        """
+        return [ self._chunks[k] for k in sorted(self._chunks)
+                 if self._chunks[k].b <= e and self._chunks[k].e >= b ]
+
+    def links_between(self, b, e):
+        """
+            Returns the sorted indices of the links overlapping [b, e]
+        """
+        ids = [ chunk.ids()[chunk.between(b, e)] for chunk in self.overlapping(b, e) ]
+        if ids == []:
+            return []
+        return np.sort(np.concatenate(ids)).tolist()
+
+    def selected_between(self, U, V, b, e):
+        """
+            Returns the sorted indices of the links going from a node of U to
+            a node of V and overlapping [b, e]
+        """
+        ids = []
+        for chunk in self.overlapping(b, e):
+            table = chunk.table
+            mask = chunk.between(b, e) & table.node_mask(U, "left") & table.node_mask(V, "right")
+            ids.append(chunk.ids()[mask])
+
+        if ids == []:
+            return []
+        return np.sort(np.concatenate(ids)).tolist()
+
+    def save(self, path, meta={}, arrays={}):
+        """
+            Saves the table in a directory (see lib.binary), with one
+            subdirectory per chunk, and meta as part of its description
+            along with the given arrays. Its chunks can then be evicted
+            from memory.
+        """
+        spans = []
+        for k in sorted(self._chunks):
+            chunk = self._chunks[k]
+            chunk.save(os.path.join(path, f"chunk_{k}"))
+            spans.append([ k, chunk.b, chunk.e ])
+
+        meta = dict(meta, length=self.length, alpha=self.alpha, chunks=spans)
+        write_arrays(path, meta, dict(arrays, chunk=np.array(self._chunk_of, dtype=np.int64),
+                                             local=np.array(self._local, dtype=np.int64)))
+
+    @classmethod
+    def open(cls, path):
+        """
+            Opens a table saved by save(), without reading its chunks.
+            Returns the table, and the description and arrays it was saved with.
+        """
+        meta, arrays = read_arrays(path)
+        new = ChunkedLinkTable.chunks(meta["length"], meta["alpha"])()
+        for k, b, e in meta["chunks"]:
+            new._chunks[k] = _Chunk(os.path.join(path, f"chunk_{k}"), b, e)
+        new._chunk_of, new._local = arrays.pop("chunk"), arrays.pop("local")
+
+        return new, meta, arrays
+
+    def evict(self):
+        """
+            Drops the chunks that are saved and unchanged from memory:
+            they are read again when used.
+        """
+        for chunk in self._chunks.values():
+            chunk.evict()
+
+    def loaded(self):
+        """
+            Returns the number of chunks in memory
+        """
+        return len([ chunk for chunk in self._chunks.values() if chunk._table is not None ])
+
+    def link(self, i):
+        """
+            Returns the i-th link, as a dict
+        """
+        return self._chunks[int(self._chunk_of[i])].table.link(int(self._local[i]))
+
+    def __len__(self):
+        return len(self._chunk_of)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [ self.link(j) for j in range(*i.indices(len(self))) ]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("link index out of range")
+        return self.link(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.link(i)
+
+    def __eq__(self, o):
+        return len(self) == len(o) and all([ x == y for x, y in zip(self, o) ])
+
+def _first_seen(chunks, name, columns):
+    """
+        Returns the elements (nodes or labels, as given by name) of the
+        tables of chunks, in the order they appear in the links, the first
+        of columns before the second, and for each chunk the array of the
+        indices in them of its elements.
+    """
+    first = {}
+    for chunk in chunks:
+        table, ids = chunk.table, chunk.ids()
+        elements = getattr(table, name)
+        seen = np.full(len(elements), np.iinfo(np.int64).max, dtype=np.int64)
+        for k, col in enumerate(columns):
+            np.minimum.at(seen, getattr(table, col)[:table.n], 2 * ids + k)
+        for x, key in zip(elements, seen.tolist()):
+            if key < first.get(x, key + 1):
+                first[x] = key
+
+    elements = sorted(first, key=first.get)
+    index = { x: i for i, x in enumerate(elements) }
+    return elements, [ np.array([ index[x] for x in getattr(chunk.table, name) ], dtype=np.int64) for chunk in chunks ]
+
+class _Chunk:
+    """
+        Links of a chunk, as a LinkTable along with their index in the
+        whole table, and their sorted events. A chunk saved in path is read
+        from it when used.
+    """
+
+    def __init__(self, path=None, b=np.inf, e=-np.inf):
+        self.path = path
+        # Period spanned by the links of the chunk
+        self.b = b
+        self.e = e
+        # Chunks changed since they were saved cannot be evicted
+        self.changed = path is None
+
+        self._table = LinkTable() if path is None else None
+        self._ids = []
+        self._csr = None
+
+    def _load(self):
+        meta, arrays = read_arrays(self.path)
+        self._table = LinkTable.from_arrays(arrays["u"], arrays["v"], arrays["b"], arrays["e"],
+                                            arrays["left"], arrays["right"], meta["nodes"], meta["labels"])
+        self._ids = arrays["ids"]
+        self._csr = StreamCSR.from_arrays(meta["nodes"], { name: arrays["csr_" + name] for name in StreamCSR.array_names })
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._load()
+        return self._table
+
+    def ids(self):
+        """
+            Returns the array of the indices in the whole table of the links of the chunk
+        """
+        if self._table is None:
+            self._load()
+        if isinstance(self._ids, list):
+            self._ids = np.array(self._ids, dtype=np.int64)
+        return self._ids
+
+    def append(self, i, l):
+        """
+            Adds the link of index i in the whole table, and returns its index in the chunk
+        """
+        table = self.table
+        if not isinstance(self._ids, list):
+            self._ids = self._ids.tolist()
+        self._ids.append(i)
+        table.append(l)
+
+        self.b = min(self.b, l["b"])
+        self.e = max(self.e, l["e"])
+        self.changed = True
+        return table.n - 1
+
+    def between(self, b, e):
+        """
+            Returns a boolean array telling for each link of the chunk if it overlaps [b, e]
+        """
+        table = self.table
+        return (table.b[:table.n] <= e) & (table.e[:table.n] >= b)
+
+    def csr(self):
+        """
+            Returns the sorted events of the links of the chunk (see StreamCSR).
+            Link numbers are indices in the chunk, see ids().
+        """
+        table = self.table
+        if self._csr is None or len(self._csr) != 4 * table.n:
+            self._csr = StreamCSR(table)
+        return self._csr
+
+    def copy(self):
+        new = _Chunk(self.path, self.b, self.e)
+        new.changed = self.changed
+        if self._table is not None:
+            new._table = self._table.copy()
+            new._ids = list(self._ids) if isinstance(self._ids, list) else self._ids
+            new._csr = self._csr
+        return new
+
+    def save(self, path):
+        table = self.table
+        csr = self.csr()
+        arrays = { "u": table.u[:table.n], "v": table.v[:table.n], "b": table.b[:table.n], "e": table.e[:table.n],
+                   "left": table.left[:table.n], "right": table.right[:table.n], "ids": self.ids() }
+        for name in StreamCSR.array_names:
+            arrays["csr_" + name] = getattr(csr, name)
+
+        write_arrays(path, { "nodes": table.nodes, "labels": [ list(label) for label in table.labels ] }, arrays)
+        self.path = path
+        self.changed = False
+
+    def evict(self):
+        if self.path is not None and not self.changed:
+            self._table = None
+            self._ids = []
+            self._csr = None
@@ -0,0 +1,341 @@
+import numpy as np
+
+from lib.TimeNode import TimeNode, TimeNodeSet, node_id, _node_ids, _id_nodes, _FINGERPRINT_MASK
+
+class ColumnarTimeNodeSet:
+    """
+        TimeNodeSet backend storing its elements as parallel arrays: integer
+        node ids, and the beginning and end of each interval as floats.
+        Elements are sorted by (node, b) and the intervals of a node are
+        disjoint, as in TimeNodeSet, so set operations are computed as one
+        vectorized sweep over the events of both sets.
+
+        It has the same API as TimeNodeSet and can be mixed with it.
+    """
+
+    def __init__(self, *args):
+        """
+            elements: list of TimeNodes
+        """
+        if len(args) == 0:
+            _elements = []
+        elif len(args) == 1:
+            if type(args[0]) is not list:
+                raise TypeError("ColumnarTimeNodeSet only accepts a list of TimeNode as argument")
+
+            _elements = args[0]
+        else:
+            # There can only be 0 or 1 arg
+            raise NotImplementedError("ColumnarTimeNodeSet can only have 0 or 1 argument.")
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.b = np.empty(0, dtype=np.float64)
+        self.e = np.empty(0, dtype=np.float64)
+
+        # Elements added one at a time are buffered, and merged
+        # into the arrays on the next read
+        self._pending = []
+        self._fingerprint = None
+
+        for w in _elements:
+            self.add(w)
+
+    @staticmethod
+    def from_arrays(ids, b, e):
+        """
+            Builds a set from arrays of node ids, beginnings and ends,
+            in any order and possibly overlapping.
+        """
+        new = ColumnarTimeNodeSet()
+        new.ids, new.b, new.e = _normalize(np.asarray(ids, dtype=np.int64),
+                                           np.asarray(b, dtype=np.float64),
+                                           np.asarray(e, dtype=np.float64))
+        return new
+
+    @classmethod
+    def from_intervals(cls, intervals):
+        """
+            Builds a set from (node, b, e, label) tuples, in any order and
+            possibly overlapping. Labels are not stored.
+        """
+        intervals = list(intervals)
+        return ColumnarTimeNodeSet.from_arrays([ node_id(x[0]) for x in intervals ],
+                                               [ x[1] for x in intervals ],
+                                               [ x[2] for x in intervals ])
+
+    @staticmethod
+    def from_timenodeset(x):
+        """
+            Converts any TimeNodeSet-like object to a ColumnarTimeNodeSet.
+        """
+        if isinstance(x, ColumnarTimeNodeSet):
+            return x
+
+        values = list(x.values())
+        return ColumnarTimeNodeSet.from_arrays([ node_id(w.node) for w in values ],
+                                               [ w.b for w in values ],
+                                               [ w.e for w in values ])
+
+    def _flush(self):
+        if len(self._pending) == 0:
+            return
+
+        ids, b, e = zip(*self._pending)
+        self._pending = []
+        self._fingerprint = None
+        self.ids, self.b, self.e = _normalize(np.concatenate((self.ids, ids)),
+                                              np.concatenate((self.b, b)),
+                                              np.concatenate((self.e, e)))
+
+    @property
+    def elements(self):
+        """
+            Read-only view of the set as a dict of TimeNode lists,
+            for code written against TimeNodeSet.elements
+        """
+        self._flush()
+        return _ElementsView(self)
+
+    def __iter__(self):
+        return self.values()
+
+    def __eq__(self, o):
+        """
+            Two TimeNodeSets are equal if they contain the same elements
+        """
+        if not isinstance(o, ColumnarTimeNodeSet):
+            return all([x in o for x in self]) and len(self) == len(o)
+
+        if self.fingerprint() != o.fingerprint():
+            return False
+
+        return np.array_equal(self.ids, o.ids)\
+               and np.array_equal(self.b, o.b)\
+               and np.array_equal(self.e, o.e)
+
+    def __hash__(self):
+        return self.fingerprint()
+
+    def fingerprint(self):
+        """
+            Returns a canonical fingerprint of the elements of the set: the
+            same as that of a TimeNodeSet with the same elements.
+        """
+        self._flush()
+        if self._fingerprint is None:
+            self._fingerprint = sum([ hash((_id_nodes[u], b, e)) for u, b, e in
+                                      zip(self.ids.tolist(), self.b.tolist(), self.e.tolist()) ]) & _FINGERPRINT_MASK
+        return self._fingerprint
+
+    def __contains__(self, x):
+        """
+            Returns True if the TimeNode x is an element of the set
+        """
+        self._flush()
+        lo, hi = self._range(x.node)
+        i = lo + np.searchsorted(self.b[lo:hi], x.b)
+
+        return i < hi and self.b[i] == x.b and self.e[i] == x.e
+
+    def covers(self, u, t):
+        """
+            Returns True if node u is in the set at time t
+        """
+        self._flush()
+        lo, hi = self._range(u)
+        i = lo + np.searchsorted(self.e[lo:hi], t)
+
+        return i < hi and self.b[i] <= t
+
+    def overlapping(self, u, b, e):
+        """
+            Returns the TimeNodes of node u that overlap [b, e]
+        """
+        self._flush()
+        lo, hi = self._range(u)
+        i = lo + np.searchsorted(self.e[lo:hi], b)
+        j = lo + np.searchsorted(self.b[lo:hi], e, side="right")
+
+        return [ TimeNode(u, _as_time(x_b), _as_time(x_e), set())
+                 for x_b, x_e in zip(self.b[i:j].tolist(), self.e[i:j].tolist()) ]
+
+    def _range(self, u):
+        """
+            Returns the range of the arrays holding the elements of node u
+        """
+        if u not in _node_ids:
+            return 0, 0
+        i = _node_ids[u]
+        lo, hi = np.searchsorted(self.ids, [i, i + 1])
+        return lo, hi
+
+    def json(self):
+        """
+            Returns a JSON representation
+        """
+        return [ x.json() for x in self.values() ]
+
+    def nodes(self):
+        self._flush()
+        return [ _id_nodes[u] for u in np.unique(self.ids) ]
+
+    def add(self, x):
+        self._pending.append((node_id(x.node), x.b, x.e))
+
+    def intersection(self, x):
+        """
+            Intersection of two TimeNodeSets.
+        """
+        return self._combine(x, lambda in_self, in_x: in_self & in_x)
+
+    def union(self, x):
+        """
+            Union of two TimeNodeSets.
+        """
+        return self._combine(x, lambda in_self, in_x: in_self | in_x)
+
+    def difference(self, x):
+        """
+            Difference of two TimeNodeSets: elements of self not in x.
+        """
+        return self._combine(x, lambda in_self, in_x: in_self & ~in_x)
+
+    def issubset(self, x):
+        """
+            Returns True if every element of self is covered by x
+        """
+        return len(self.difference(x)) == 0
+
+    def duration(self):
+        """
+            Total duration of the elements of the set
+        """
+        self._flush()
+        return float(np.sum(self.e - self.b))
+
+    def _combine(self, x, keep):
+        """
+            Sweeps the events of self and x together, keeping the segments
+            for which keep(in_self, in_x) is True.
+        """
+        self._flush()
+        x = ColumnarTimeNodeSet.from_timenodeset(x)
+        x._flush()
+
+        n, m = len(self.ids), len(x.ids)
+        ids = np.concatenate((self.ids, self.ids, x.ids, x.ids))
+        t = np.concatenate((self.b, self.e, x.b, x.e))
+        # Beginnings are swept before ends at equal times, as intervals are
+        # closed, and x is opened first and closed last so that only the
+        # boundaries of self get zero-length segments
+        rank = np.concatenate((np.ones(n), 2 * np.ones(n), np.zeros(m), 3 * np.ones(m)))
+        delta_self = np.concatenate((np.ones(n), -np.ones(n), np.zeros(2 * m)))
+        delta_x = np.concatenate((np.zeros(2 * n), np.ones(m), -np.ones(m)))
+
+        order = np.lexsort((rank, t, ids))
+        ids, t = ids[order], t[order]
+        in_self = np.cumsum(delta_self[order]) > 0
+        in_x = np.cumsum(delta_x[order]) > 0
+
+        # Segment i goes from event i to event i+1 of the same node
+        seg = keep(in_self[:-1], in_x[:-1]) & (ids[:-1] == ids[1:])
+
+        new = ColumnarTimeNodeSet()
+        new.ids, new.b, new.e = _merge_touching(ids[:-1][seg], t[:-1][seg], t[1:][seg])
+        return new
+
+    def copy(self):
+        """
+            Returns a copy of the set. Arrays are never modified in place,
+            so they are shared with the copy.
+        """
+        self._flush()
+        new = ColumnarTimeNodeSet()
+        new.ids, new.b, new.e = self.ids, self.b, self.e
+        new._fingerprint = self._fingerprint
+        return new
+
+    def __len__(self):
+        self._flush()
+        return len(self.ids)
+
+    def values(self):
+        self._flush()
+        for u, b, e in zip(self.ids.tolist(), self.b.tolist(), self.e.tolist()):
+            yield TimeNode(_id_nodes[u], _as_time(b), _as_time(e), set())
+
+    def __str__(self):
+        ret = list(str(list(self.values())))
+        ret = ["{"] + ret[1:-1] + ["}"]
+        return "".join(ret)
+
+    def __repr__(self):
+        return str(self.__str__())
+
+class _ElementsView:
+    """
+        Mapping node -> list of TimeNodes over a ColumnarTimeNodeSet
+    """
+    def __init__(self, tns):
+        self.tns = tns
+
+    def __contains__(self, u):
+        lo, hi = self.tns._range(u)
+        return hi > lo
+
+    def __getitem__(self, u):
+        lo, hi = self.tns._range(u)
+        if hi == lo:
+            raise KeyError(u)
+        return [ TimeNode(u, _as_time(b), _as_time(e), set())
+                 for b, e in zip(self.tns.b[lo:hi].tolist(), self.tns.e[lo:hi].tolist()) ]
+
+    def __iter__(self):
+        return iter(self.tns.nodes())
+
+    def keys(self):
+        return self.tns.nodes()
+
+    def __len__(self):
+        return len(np.unique(self.tns.ids))
+
+def _as_time(t):
+    """
+        Times are stored as floats, give back integers when they were ones
+    """
+    return int(t) if t.is_integer() else t
+
+def _merge_touching(ids, b, e):
+    """
+        Merges consecutive intervals of the same node that overlap or touch.
+        Intervals must be sorted by (node, b) with non-decreasing ends.
+    """
+    if len(ids) == 0:
+        return ids, b, e
+
+    starts = np.ones(len(ids), dtype=bool)
+    starts[1:] = (ids[1:] != ids[:-1]) | (b[1:] > e[:-1])
+    runs = np.flatnonzero(starts)
+
+    return ids[runs], b[runs], np.maximum.reduceat(e, runs)
+
+def _normalize(ids, b, e):
+    """
+        Sorts arbitrary intervals and merges the overlapping ones, using
+        the same sweep as set operations.
+    """
+    if len(ids) == 0:
+        return ids, b, e
+
+    n = len(ids)
+    all_ids = np.concatenate((ids, ids))
+    t = np.concatenate((b, e))
+    kind = np.concatenate((np.zeros(n), np.ones(n)))
+    delta = np.concatenate((np.ones(n), -np.ones(n)))
+
+    order = np.lexsort((kind, t, all_ids))
+    all_ids, t = all_ids[order], t[order]
+    covered = np.cumsum(delta[order]) > 0
+
+    seg = covered[:-1] & (all_ids[:-1] == all_ids[1:])
+    return _merge_touching(all_ids[:-1][seg], t[:-1][seg], t[1:][seg])
@@ -0,0 +1,184 @@
+import numpy as np
+
+from lib.TimeNode import TimeNode, node_id
+from lib.ColumnarTimeNode import ColumnarTimeNodeSet, _as_time
+
+_COLUMNS = ("u", "v", "b", "e", "left", "right")
+
+class LinkTable:
+    """
+        Columnar store for the links of a stream (Stream.E): u, v, b and e
+        are arrays, and labels are references to a table of distinct label
+        sets, shared by all the links carrying the same labels. Nodes are
+        numbered in the order they appear in the table.
+
+        It behaves as a list of link dicts ({"u", "v", "b", "e", "label"}),
+        built on access, for code that iterates on Stream.E.
+    """
+
+    def __init__(self, links=[]):
+        self.n = 0
+        self.u = np.empty(16, dtype=np.int64)
+        self.v = np.empty(16, dtype=np.int64)
+        self.b = np.empty(16, dtype=np.float64)
+        self.e = np.empty(16, dtype=np.float64)
+        self.left = np.empty(16, dtype=np.int64)
+        self.right = np.empty(16, dtype=np.int64)
+
+        # Distinct label sets, and their index in the table
+        self.labels = []
+        self.label_ids = {}
+
+        # Nodes, and their index in the table
+        self.nodes = []
+        self.node_ids = {}
+        self._global_ids = np.empty(0, dtype=np.int64)
+
+        # Arrays shared with a copy are reallocated before being written
+        self._shared = False
+
+        for l in links:
+            self.append(l)
+
+    @staticmethod
+    def from_arrays(u, v, b, e, left, right, nodes, labels):
+        """
+            Builds a table from its columns, u and v being indices in nodes
+            and left and right indices in labels. Arrays are not copied (they
+            may be memory-mapped), until the table is modified.
+        """
+        new = LinkTable()
+        new.u, new.v, new.b, new.e, new.left, new.right = u, v, b, e, left, right
+        new.n = len(u)
+        new.nodes = list(nodes)
+        new.node_ids = { x: i for i, x in enumerate(new.nodes) }
+        new.labels = [ frozenset(label) for label in labels ]
+        new.label_ids = { label: i for i, label in enumerate(new.labels) }
+        new._shared = True
+        return new
+
+    def label_id(self, label):
+        """
+            Returns the index of a label set in the label table, adding it if needed.
+        """
+        label = frozenset(label)
+        try:
+            return self.label_ids[label]
+        except KeyError:
+            self.label_ids[label] = len(self.labels)
+            self.labels.append(label)
+            return self.label_ids[label]
+
+    def node_id(self, u):
+        """
+            Returns the index of a node in the table, adding it if needed.
+        """
+        try:
+            return self.node_ids[u]
+        except KeyError:
+            self.node_ids[u] = len(self.nodes)
+            self.nodes.append(u)
+            return self.node_ids[u]
+
+    def global_ids(self):
+        """
+            Returns the array of the global ids (see lib.TimeNode.node_id)
+            of the nodes of the table, by index.
+        """
+        if len(self._global_ids) != len(self.nodes):
+            self._global_ids = np.array([ node_id(x) for x in self.nodes ], dtype=np.int64)
+        return self._global_ids
+
+    def _reserve(self, n):
+        if n <= len(self.u) and not self._shared:
+            return
+
+        size = max(n, 2 * len(self.u))
+        for col in _COLUMNS:
+            old = getattr(self, col)
+            new = np.empty(size, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, col, new)
+
+        self.labels = list(self.labels)
+        self.label_ids = dict(self.label_ids)
+        self.nodes = list(self.nodes)
+        self.node_ids = dict(self.node_ids)
+        self._shared = False
+
+    def append(self, l):
+        self._reserve(self.n + 1)
+        i = self.n
+        self.u[i] = self.node_id(l["u"])
+        self.v[i] = self.node_id(l["v"])
+        self.b[i] = l["b"]
+        self.e[i] = l["e"]
+        self.left[i] = self.label_id(l["label"]["left"])
+        self.right[i] = self.label_id(l["label"]["right"])
+        self.n += 1
+
+    def copy(self):
+        """
+            Returns a copy of the table, sharing its arrays until either table is modified.
+        """
+        new = LinkTable()
+        for col in _COLUMNS + ("labels", "label_ids", "nodes", "node_ids", "_global_ids", "n"):
+            setattr(new, col, getattr(self, col))
+        new._shared = True
+        self._shared = True
+        return new
+
+    def link(self, i):
+        """
+            Returns the i-th link, as a dict
+        """
+        return {
+            "u": self.nodes[self.u[i]],
+            "v": self.nodes[self.v[i]],
+            "b": _as_time(float(self.b[i])),
+            "e": _as_time(float(self.e[i])),
+            "label": { "left": self.labels[self.left[i]], "right": self.labels[self.right[i]] }
+        }
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [ self.link(j) for j in range(*i.indices(self.n)) ]
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError("link index out of range")
+        return self.link(i)
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield self.link(i)
+
+    def __eq__(self, o):
+        return len(self) == len(o) and all([ x == y for x, y in zip(self, o) ])
+
+    def node_mask(self, nodes, side):
+        """
+            Returns a boolean array telling for each link if its u (side "left")
+            or v (side "right") endpoint is in nodes.
+        """
+        ids = np.array([ self.node_ids[x] for x in nodes if x in self.node_ids ], dtype=np.int64)
+        return np.isin(self.u[:self.n] if side == "left" else self.v[:self.n], ids)
+
+    def timenodes(self, rows_left, rows_right, W_class=ColumnarTimeNodeSet):
+        """
+            Returns the time-nodes of the u endpoints of the links selected
+            by rows_left, and of the v endpoints of the links selected by
+            rows_right (boolean masks or arrays of indices), as a W_class set.
+        """
+        ids = np.concatenate((self.u[:self.n][rows_left], self.v[:self.n][rows_right]))
+        b = np.concatenate((self.b[:self.n][rows_left], self.b[:self.n][rows_right]))
+        e = np.concatenate((self.e[:self.n][rows_left], self.e[:self.n][rows_right]))
+
+        if W_class is ColumnarTimeNodeSet:
+            return ColumnarTimeNodeSet.from_arrays(self.global_ids()[ids], b, e)
+
+        return W_class([ TimeNode(self.nodes[u], _as_time(x_b), _as_time(x_e))
+                         for u, x_b, x_e in zip(ids.tolist(), b.tolist(), e.tolist()) ])
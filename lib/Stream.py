@@ -4,16 +4,221 @@ import sys
 import logging
 # from lib.StreamProperties import StreamStarSat
 from lib.TimeNode import *
+from lib.BitsetTimeNode import BitsetTimeNodeSet
+from lib.LinkTable import LinkTable
+from lib.ChunkedLinkTable import ChunkedLinkTable
+from lib.Vocabulary import Vocabulary
+from lib.StreamCSR import StreamCSR
+from lib.loaders import iter_stream
+from lib.binary import write_arrays, read_arrays, pack_sets, unpack_sets
+from lib.ColumnarTimeNode import ColumnarTimeNodeSet, _as_time
+import numpy as np
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from itertools import chain
+from collections.abc import Mapping
+from functools import reduce
+import operator
 from lib.visualization.FigPrinter import *
 from IPython.display import Image
 
+_FINGERPRINT_MASK = (1 << 64) - 1
+
+def _link_hash(l):
+    return hash((l["u"], l["v"], l["b"], l["e"],
+                 frozenset(l["label"]["left"]), frozenset(l["label"]["right"])))
+
+def _clip(u, v, b, e, W):
+    """
+        Returns the part of [b, e] during which both u and v are in W, or
+        None if there is none. Each of them must be in W during a single
+        interval of [b, e], otherwise the link is dropped.
+    """
+    if u == v:
+        return None
+
+    cap_u = W.overlapping(u, b, e)
+    if len(cap_u) != 1:
+        return None
+    cap_v = W.overlapping(v, b, e)
+    if len(cap_v) != 1:
+        return None
+
+    b = max(b, cap_u[0].b, cap_v[0].b)
+    e = min(e, cap_u[0].e, cap_v[0].e)
+    if b > e:
+        return None
+    return b, e
+
+_event_time = itemgetter(1)
+
+def _add_events(events, v, b, e, label):
+    """
+        Adds the beginning and end events of a link with v, on [b, e], to a
+        temporal adjacency list sorted by time. At equal times, ends of links
+        come before beginnings, and otherwise events are in the order their
+        links were added. A link with b == e has its end right after its
+        beginning, among the beginnings.
+    """
+    events.insert(bisect_right(events, b, key=_event_time), (v, b, 1, label))
+
+    if b == e:
+        i = bisect_right(events, e, key=_event_time)
+    else:
+        i = bisect_left(events, e, key=_event_time)
+        while i < len(events) and events[i][1] == e and events[i][2] == -1:
+            i += 1
+    events.insert(i, (v, e, -1, label))
+
+def _queued_time(x):
+    return x[:2]
+
+def _merge_events(events, queued):
+    """
+        Returns a temporal adjacency list sorted by time (see _add_events)
+        with queued events merged in, in the same order as if they had been
+        added one by one with _add_events. queued holds (t, rank, event)
+        tuples in the order they were added, where rank is 0 for the end of
+        a link with b < e, and 1 otherwise.
+    """
+    queued = sorted(queued, key=_queued_time)
+    if len(events) == 0:
+        return [ event for _, _, event in queued ]
+
+    merged = []
+    i = 0
+    for t, rank, event in queued:
+        if rank == 1:
+            j = bisect_right(events, t, lo=i, key=_event_time)
+        else:
+            j = bisect_left(events, t, lo=i, key=_event_time)
+            while j < len(events) and events[j][1] == t and events[j][2] == -1:
+                j += 1
+        merged.extend(events[i:j])
+        merged.append(event)
+        i = j
+    merged.extend(events[i:])
+    return merged
+
+def _link_ends(E):
+    """
+        Yields the (node, b, e, label) of both ends of the links of E
+    """
+    for l in E:
+        yield l["u"], l["b"], l["e"], l["label"]["left"]
+        yield l["v"], l["b"], l["e"], l["label"]["right"]
+
+def _label_at(index, t):
+    """
+        Returns the labels at time t in a label index (see Stream.label_index)
+    """
+    times, point, gap = index
+    i = bisect_right(times, t) - 1
+    if i < 0:
+        return frozenset()
+    return point[i] if times[i] == t else gap[i]
+
+def _pack_W(W, nodes):
+    """
+        Returns the time-nodes of W as arrays: the index in nodes of their
+        node (w_node), and their beginning and end (w_b and w_e)
+    """
+    node_ids = { x: i for i, x in enumerate(nodes) }
+    W = list(W.values())
+    return { "w_node": np.array([ node_ids[w.node] for w in W ], dtype=np.int64),
+             "w_b": np.array([ w.b for w in W ], dtype=np.float64),
+             "w_e": np.array([ w.e for w in W ], dtype=np.float64) }
+
+def _unpack_W(W_class, nodes, arrays):
+    """
+        Reverse of _pack_W: returns the time-nodes as a W_class set
+    """
+    if W_class is ColumnarTimeNodeSet:
+        ids = np.array([ node_id(x) for x in nodes ], dtype=np.int64)
+        return ColumnarTimeNodeSet.from_arrays(ids[arrays["w_node"]], arrays["w_b"], arrays["w_e"])
+    return W_class.from_intervals([ (nodes[u], _as_time(b), _as_time(e), set())
+                                    for u, b, e in zip(arrays["w_node"].tolist(), arrays["w_b"].tolist(), arrays["w_e"].tolist()) ])
+
+def _contains_sorted(a, i):
+    j = bisect_left(a, i)
+    return j < len(a) and a[j] == i
+
+def _link_labels(E, i):
+    """
+        Returns the left and right labels of the i-th link of E
+    """
+    if isinstance(E, LinkTable):
+        return E.labels[E.left[i]], E.labels[E.right[i]]
+    label = E[i]["label"]
+    return label["left"], label["right"]
+
+class _CSRDegrees(Mapping):
+    """
+        degrees of a stream whose links are in a LinkTable: the events of a
+        node are read from the arrays of the stream's csr() when accessed,
+        rather than stored as tuples.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __getitem__(self, u):
+        csr = self.stream.csr()
+        if u not in csr.node_ids:
+            raise KeyError(u)
+        E = self.stream.E
+        nodes = csr.nodes
+        neighbour, t, ev_type, link, side = csr.events(u)
+        return [ (nodes[v], _as_time(x), y, _link_labels(E, l)[k])
+                 for v, x, y, l, k in zip(neighbour.tolist(), t.tolist(), ev_type.tolist(), link.tolist(), side.tolist()) ]
+
+    def __iter__(self):
+        return iter(self.stream.csr().nodes)
+
+    def __len__(self):
+        return len(self.stream.csr().nodes)
+
+class _CSRTimes(Mapping):
+    """
+        times of a stream whose links are in a LinkTable, read from the
+        arrays of the stream's csr() when accessed (see _CSRDegrees).
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __getitem__(self, pair):
+        u, v = (tuple(pair) * 2)[:2]
+        b, e, link = self.stream.csr().pair_times(u, v)
+        if len(link) == 0:
+            raise KeyError(pair)
+        E = self.stream.E
+        return [ (_as_time(x_b), _as_time(x_e)) + _link_labels(E, l)
+                 for x_b, x_e, l in zip(b.tolist(), e.tolist(), link.tolist()) ]
+
+    def __iter__(self):
+        csr = self.stream.csr()
+        return ( frozenset([ csr.nodes[u], csr.nodes[v] ]) for u, v in csr.pairs.tolist() )
+
+    def __len__(self):
+        return len(self.stream.csr().pairs)
+
 class Stream:
-    def __init__(self, lang=set(), _loglevel=logging.DEBUG, _fp=sys.stdout):
+    def __init__(self, lang=set(), _loglevel=logging.DEBUG, _fp=sys.stdout, _W_class=TimeNodeSet, _E_class=list):
         self.T = {}
         self.V = set()
-        self.W = TimeNodeSet()
-        self.E = []
+        # Backend used for sets of time-nodes (TimeNodeSet, ColumnarTimeNodeSet
+        # or BitsetTimeNodeSet)
+        self.W_class = _W_class
+        self.W = _W_class()
+        # Store for the links (list of dicts, or LinkTable)
+        self.E_class = _E_class
+        self.E = _E_class()
+        # Labels of the links, interned (shared with copies and substreams)
+        self.vocabulary = Vocabulary()
         self.core_property = None
+        # Interiors already computed by the enumeration (see patterns.InteriorCache)
+        self.interior_cache = None
         
         self.bip_fp = _fp
         self.pattern_list = []
@@ -24,9 +229,42 @@ class Stream:
         self.patterns_flag = False
         
         # Store both degree view and links (times) view,
-        # as the optimal view is different depending on the calculation
-        self.degrees = {}
-        self.times = {}
+        # as the optimal view is different depending on the calculation.
+        # Events of degrees are sorted by time (see _add_events): those of
+        # new links are queued, and merged in when degrees is next read.
+        # With links in a LinkTable, both are read from its arrays instead.
+        if issubclass(_E_class, LinkTable):
+            self.degrees = _CSRDegrees(self)
+            self.times = _CSRTimes(self)
+        else:
+            self.degrees = {}
+            self.times = {}
+
+        # Indexes of the links, each with the (E, len(E)) it was built for (see _cached())
+        # Fingerprint of the links, see fingerprint()
+        self._E_fingerprint = 0
+        self._E_fingerprint_of = (None, 0)
+        # Inverted index of the labels of each side, see postings()
+        self._postings = { "left": {}, "right": {} }
+        self._postings_of = (None, 0)
+        # Index of the links by their u end, see links_from()
+        self._links_from = {}
+        self._links_from_of = (None, 0)
+        # Compact layout of degrees and times, see csr()
+        self._csr = None
+        self._csr_of = (None, 0)
+        # Time index of the labels of each node, see label_index()
+        self._label_index = {}
+        self._label_index_of = (None, 0)
+        # Time index of the links, see links_between()
+        self._time_index = None
+        self._time_index_of = (None, 0)
+
+        # Copies share E, and the lists of degrees and times, with the stream
+        # they were copied from: they are copied on first modification (see copy())
+        self._shared = False
+        self._owns_E = True
+        self._owned_times = set()
         
         self.logger = logging.getLogger()
         self.logger.setLevel(_loglevel)
@@ -50,7 +288,52 @@ class Stream:
         return json_repr
 
     def __eq__(self, o):
-        return self.T == o.T and self.V == o.V and self.W == o.W and self.E == o.E
+        return self.T == o.T and self.V == o.V and self.fingerprint() == o.fingerprint()\
+                and self.W == o.W and self.E == o.E
+
+    def __hash__(self):
+        return self.fingerprint()
+
+    def fingerprint(self):
+        """
+            Returns a canonical fingerprint of the stream, combining the
+            fingerprint of W and an order-independent hash of the links.
+            Streams with different fingerprints are different.
+        """
+        E_fingerprint = self._cached("_E_fingerprint", int, self._hash_links)
+        return hash((self.W.fingerprint(), E_fingerprint))
+
+    def signature(self):
+        """
+            Returns a compact signature of the stream: the fingerprints of W
+            and of the links, along with the numbers of nodes and of links.
+            Streams with different signatures are different.
+        """
+        E_fingerprint = self._cached("_E_fingerprint", int, self._hash_links)
+        return (self.W.fingerprint(), E_fingerprint, len(self.W.nodes()), len(self.E))
+
+    def _hash_links(self, fingerprint, n):
+        E = self.E
+        return (fingerprint + sum([ _link_hash(E[i]) for i in range(n, len(E)) ])) & _FINGERPRINT_MASK
+
+    def _cached(self, name, build, extend=None):
+        """
+            Returns the index of the links stored in attribute name, along
+            with the (E, len(E)) it was computed for in attribute name + "_of"
+            (see __init__). It is built by build() when E was replaced. When
+            links were added, it is extended by extend(index, n), that
+            returns it for all links, n being the number of links it covers,
+            or it is built again if extend is None.
+        """
+        E, n = getattr(self, name + "_of")
+        if E is not self.E or n > len(self.E) or (n < len(self.E) and extend is None):
+            setattr(self, name, build())
+            n = len(self.E) if extend is None else 0
+        if n < len(self.E):
+            setattr(self, name, extend(getattr(self, name), n))
+        setattr(self, name + "_of", (self.E, len(self.E)))
+
+        return getattr(self, name)
 
     def nodes(self):
         # iterator on nodes ?
@@ -87,17 +370,97 @@ class Stream:
         return tmp_fname, Image(f"{tmp_fname}.png")
     
     def copy(self):
-        stream_copy = Stream(lang=self.I, _fp=self.bip_fp)
+        stream_copy = Stream(lang=self.I, _fp=self.bip_fp, _W_class=self.W_class, _E_class=self.E_class)
         stream_copy.T = self.T
-        stream_copy.V = copy.deepcopy(self.V)
-        stream_copy.W = copy.deepcopy(self.W)
-        stream_copy.E = copy.deepcopy(self.E)
-        stream_copy.degrees = copy.deepcopy(self.degrees)
-        stream_copy.times = copy.deepcopy(self.times)
-        stream_copy.EL = copy.deepcopy(self.EL)
+        stream_copy.V = set(self.V)
+        stream_copy.W = self.W.copy()
+        stream_copy.E = self.E
+        stream_copy.vocabulary = self.vocabulary
+        if not isinstance(stream_copy.degrees, _CSRDegrees):
+            stream_copy.degrees = dict(self.degrees)
+            stream_copy.times = dict(self.times)
+        stream_copy.EL = set(self.EL)
         stream_copy.core_property = self.core_property
+        stream_copy._E_fingerprint = self._E_fingerprint
+        stream_copy._E_fingerprint_of = self._E_fingerprint_of
+
+        self._share()
+        stream_copy._share()
         
         return stream_copy
+
+    def _share(self):
+        """
+            Marks the lists of the stream as shared with a copy, so that
+            they are copied before being modified. Lists of degrees are
+            never modified: queued events are merged into new lists.
+        """
+        self._shared = True
+        self._owns_E = False
+        self._owned_times = set()
+
+    def _links(self):
+        """
+            Returns E, copying it first if it is shared with a copy of the stream.
+        """
+        if self._shared and not self._owns_E:
+            E, n = self._E_fingerprint_of
+            if E is self.E:
+                self._E_fingerprint_of = (self.E.copy(), n)
+                self.E = self._E_fingerprint_of[0]
+            else:
+                self.E = self.E.copy()
+            self._owns_E = True
+        return self.E
+
+    @property
+    def degrees(self):
+        if len(self._queued) > 0:
+            self._merge_queued()
+        return self._degrees
+
+    @degrees.setter
+    def degrees(self, degrees):
+        self._degrees = degrees
+        self._queued = {}
+
+    def _queue_events(self, u, v, b, e, label):
+        """
+            Queues the events of a link of u with v, on [b, e], to be merged
+            into degrees[u] when degrees is next read
+        """
+        try:
+            queued = self._queued[u]
+        except KeyError:
+            queued = self._queued[u] = []
+        queued.append((b, 1, (v, b, 1, label)))
+        queued.append((e, 1 if b == e else 0, (v, e, -1, label)))
+
+    def _merge_queued(self):
+        for u, queued in self._queued.items():
+            self._degrees[u] = _merge_events(self._degrees.get(u, []), queued)
+        self._queued = {}
+
+    def _keeps_events(self):
+        """
+            Returns False if degrees and times are read from the links rather than stored (see _CSRDegrees)
+        """
+        return not isinstance(self._degrees, _CSRDegrees)
+
+    def _pair_times(self, u, v):
+        """
+            Returns the interaction times of (u, v), copying them first
+            if they are shared with a copy of the stream.
+        """
+        pair = frozenset([u, v])
+        if self._shared and pair not in self._owned_times:
+            self.times[pair] = list(self.times.get(pair, []))
+            self._owned_times.add(pair)
+        try:
+            return self.times[pair]
+        except KeyError:
+            self.times[pair] = []
+            return self.times[pair]
     
     def add_link(self, l):
         u = l["u"]
@@ -109,39 +472,34 @@ class Stream:
         # la seule chose qui change entre pattern et bipattern, c'est I (et l'overlap ou non entre les labels)
         # label_u = l["label_u"]
         # label_v = l["label_v"]
-        label_u = l["label"]["left"]
-        label_v = l["label"]["right"]
+        label_u = self.vocabulary.intern(l["label"]["left"])
+        label_v = self.vocabulary.intern(l["label"]["right"])
+        if label_u is not l["label"]["left"] or label_v is not l["label"]["right"]:
+            l = dict(l, label={ "left": label_u, "right": label_v })
 
         self.V.add(u)
         self.V.add(v)
         
-        # Maintain temporal adjacency list 
-        try:
-            self.degrees[u].append((v, b, 1, label_u))
-            self.degrees[u].append((v, e, -1, label_u))
-        except KeyError:
-            self.degrees[u] = [(v, b, 1, label_u), (v, e, -1, label_u)]
+        if self._keeps_events():
+            # Maintain temporal adjacency list 
+            self._queue_events(u, v, b, e, label_u)
+            self._queue_events(v, u, b, e, label_v)
 
-        try:
-            self.degrees[v].append((u, b, 1, label_v))
-            self.degrees[v].append((u, e, -1, label_v))
-        except KeyError:
-            self.degrees[v] = [(u, b, 1, label_v), (u, e, -1, label_v)]
-
-        # Maintain interaction times for each pair of nodes (u,v)
-        try:
-            self.times[frozenset([u,v])].append((b, e, label_u, label_v))
-        except KeyError:
-            self.times[frozenset([u,v])] = [ (b, e, label_u, label_v) ]
+            # Maintain interaction times for each pair of nodes (u,v)
+            self._pair_times(u, v).append((b, e, label_u, label_v))
         
-        # Add to E
-        self.E.append(l)
+        # The fingerprint of E is extended with l when next needed
+        self._links().append(l)
     
     def setCoreProperty(self, prop):
         self.core_property = prop
     
     def add_links(self, links):
-        self.E = links
+        links = [ dict(l, label={ "left": self.vocabulary.intern(l["label"]["left"]),
+                                  "right": self.vocabulary.intern(l["label"]["right"]) })
+                  for l in links ]
+        self.E = self.E_class(links)
+        self.W = self.W_class.from_intervals(_link_ends(links))
         self.V = set()
         self.T = { "alpha": 0, "omega": 10 }
         
@@ -154,32 +512,26 @@ class Stream:
             b = link["b"]
             e = link["e"]
             label_u = link["label"]["left"]
-            label_v = link["label"]["left"]
+            label_v = link["label"]["right"]
             
-            try:
-                self.degrees[u].append((v, b, 1, label_u))
-                self.degrees[u].append((v, e, -1, label_u))
-            except KeyError:
-                self.degrees[u] = [(v, b, 1, label_u), (v, e, -1, label_u)]
-                
-            try:
-                self.degrees[v].append((u, b, 1, label_v))
-                self.degrees[v].append((u, e, -1, label_v))
-            except KeyError:
-                self.degrees[v] = [(u, b, 1, label_v), (u, e, -1, label_v)]
+            if not self._keeps_events():
+                continue
+            self._queue_events(u, v, b, e, label_u)
+            self._queue_events(v, u, b, e, label_v)
     
-            try:
-                self.times[frozenset([u,v])].append((b, e, label_u, label_v))
-            except KeyError:
-                self.times[frozenset([u,v])] = [ (b, e, label_u, label_v) ]
+            self._pair_times(u, v).append((b, e, label_u, label_v))
     
-    def readStream(self, filepath):
-        fp = open(filepath)
-        data = json.load(fp)
+    def readStream(self, filepath, time_step=None):
+        """
+            Reads a stream from a JSON file, or from a NDJSON file (see
+            lib.loaders.iter_stream). Links are added as they are parsed.
+            If time_step is given, times are discrete and W is stored as
+            bitmaps over slots of length time_step (see BitsetTimeNodeSet).
+        """
+        self.V = set()
+        data = self._read_file(filepath, time_step)
         self.T = data["T"]
-        self.V = set(data["V"])
-        self.W = TimeNodeSet()
-        self.E = []
+        self.V.update(data["V"])
         self.I = data["I"]
             
         if "left" in self.I and "right" in self.I and len(self.I) == 2:
@@ -190,28 +542,74 @@ class Stream:
             self.patterns_flag = True
             self.I = set(self.I)
         
-        for link in data["E"]:
-            t_u = TimeNode(link["u"], link["b"], link["e"], _label=link["label"]["left"])
-            t_v = TimeNode(link["v"], link["b"], link["e"], _label=link["label"]["right"])
-            self.W.add(t_u)
-            self.W.add(t_v)
-            self.add_link(link)
-        
+        data["E"] = self.E
+        return data
+
+    def _read_file(self, filepath, time_step=None):
+        """
+            Empties the stream and adds the links of a stream file as they
+            are parsed, then builds W from their ends. Returns the other
+            entries of the file.
+        """
+        data = {}
+        self.E = self.E_class()
+
+        for key, value in iter_stream(filepath):
+            if key == "link":
+                self._read_link(value)
+            else:
+                data[key] = value
+
+        # Slots of a discrete W start at T["alpha"], that may come after the links
+        if time_step is not None:
+            self.W_class = BitsetTimeNodeSet.slots(time_step, data["T"]["alpha"])
+        self._build_W()
+
         return data
+
+    def _read_link(self, link):
+        """
+            Adds a link, with its labels interned
+        """
+        label_u = self.vocabulary.intern(link["label"]["left"])
+        label_v = self.vocabulary.intern(link["label"]["right"])
+        self.add_link(dict(link, label={ "left": label_u, "right": label_v }))
+
+    def _build_W(self):
+        """
+            Sets W to the ends of the links, built in bulk (see TimeNodeSet.from_intervals)
+        """
+        self.W = self.W_class.from_intervals(_link_ends(self._links()))
+
+    @classmethod
+    def from_links(cls, links, T=None, **kwargs):
+        """
+            Returns a stream made of the given links (dicts with u, v, b, e
+            and label), W being the time-nodes of their ends. T defaults to
+            the span of the links; other arguments go to the constructor.
+        """
+        stream = cls(**kwargs)
+        stream.E = stream.E_class()
+        for l in links:
+            stream._read_link(l)
+        stream._build_W()
+
+        if T is None:
+            E = stream._links()
+            T = { "alpha": min([ l["b"] for l in E ], default=0),
+                  "omega": max([ l["e"] for l in E ], default=0) }
+        stream.T = T
+        return stream
     
     def loadJson(self, data):
         self.T = data["T"]
         self.V = set(data["V"])
-        self.W = TimeNodeSet()
-        self.E = []
+        self.E = self.E_class()
         self.I = data["I"]
         
         for link in data["E"]:
-            t_u = TimeNode(link["u"], link["b"], link["e"], _label=link["label"]["left"])
-            t_v = TimeNode(link["v"], link["b"], link["e"], _label=link["label"]["right"])
-            self.W.add(t_u)
-            self.W.add(t_v)
-            self.add_link(link)
+            self._read_link(link)
+        self._build_W()
         
         return data
     
@@ -224,79 +622,406 @@ class Stream:
         """
             Returns the label associated to an element of W
         """
-        labels = []
-        v = x.node
-        b, e = x.b, x.e
-        
-        # Iterate over neighborhood to find label
-        b_val = None
-        for u, t, ev_type, label in self.degrees[v]:
-            if t <= e and ev_type == 1:
-                b_val = t
-            if b_val is not None and ev_type == -1:
-                if b_val <= e <= t:
-                    labels.append(set(label))
+        # Labels of the links of x.node present at x.e
+        return set(_label_at(self.label_index(x.node), x.e))
+
+    def labels(self, W):
+        """
+            Returns the union of the labels of the elements of W
+        """
+        return set().union(*[ labels for _, labels in self.label_sets(W) ])
+
+    def label_sets(self, W):
+        """
+            Returns the (x, labels of x) of the elements x of W, as frozensets,
+            looking up the intervals of each node in a single sweep of its index.
+        """
+        label_sets = []
+        for u in W.nodes():
+            times, point, gap = self.label_index(u)
+            i = 0
+            # Intervals of a node are disjoint, so sorted by their ends too
+            for x in W.elements[u]:
+                while i < len(times) and times[i] <= x.e:
+                    i += 1
+                if i == 0:
+                    label_sets.append((x, frozenset()))
                 else:
-                    b_val = None
-        if len(labels) == 0:
-            return set()
-        else:
-            return set.union(*labels)
+                    label_sets.append((x, point[i - 1] if times[i - 1] == x.e else gap[i - 1]))
+
+        return label_sets
+
+    def label_index(self, u):
+        """
+            Returns the time index of the labels of node u, as lists
+            (times, point, gap): times are the distinct times of its events,
+            point[i] is the set of the labels of the links present at
+            times[i], and gap[i] of those present between times[i] and
+            times[i+1]. It is built on first use, and rebuilt when links are added.
+        """
+        label_index = self._cached("_label_index", dict)
+        try:
+            return label_index[u]
+        except KeyError:
+            pass
+
+        _, t, ev_type, link, side = self.csr().events(u)
+        times, point, gap = [], [], []
+        # Labels of the links present, with their counts. Their unions
+        # are interned, so that equal ones are stored once
+        active = {}
+        voc = self.vocabulary
+
+        k = 0
+        t, ev_type, link, side = t.tolist(), ev_type.tolist(), link.tolist(), side.tolist()
+        while k < len(t):
+            now = t[k]
+            ending = []
+            while k < len(t) and t[k] == now:
+                labels = voc.intern(self.E[link[k]]["label"]["right" if side[k] else "left"])
+                if ev_type[k] == 1:
+                    active[labels] = active.get(labels, 0) + 1
+                else:
+                    ending.append(labels)
+                k += 1
+
+            # Links are present at both their beginning and end
+            times.append(_as_time(now))
+            point.append(voc.intern(frozenset().union(*active)))
+            for labels in ending:
+                active[labels] -= 1
+                if active[labels] == 0:
+                    del active[labels]
+            gap.append(voc.intern(frozenset().union(*active)))
+
+        label_index[u] = (times, point, gap)
+        return label_index[u]
     
     def substream(self, W1, W2):
         # W1, W2: [(u, b,e), (v, b',e'), etc.]
         # returns a substream induced by a subset of W.
         # Only return links etc. involving W1, W2, at their resp. times
-        # TODO : Update to make faster (for starters, don't iterate through all E every time)
+        # The substream is a view on the links of self (see _SubstreamView)
         
-        subs = Stream()
+        subs = StreamView(_W_class=self.W_class, _E_class=self.E_class)
+        subs.vocabulary = self.vocabulary
         subs.T = self.T
         subs.V = set([x.node for x in  W1 ] + [x.node for x in W2])
         W = W1.union(W2)
         subs.W = self.W.intersection(W) #  eee ?
-        subs.W = TimeNodeSet(list(subs.W.values()))
-        subs.E = []
-        subs.degrees = { u: [] for u in subs.V }
-        
-        for l in self.E:
-            # It is necessary to truncate the link if it only partially
-            # intersects with subs.W
-            t_u = TimeNode(l["u"], l["b"], l["e"])
-            t_v = TimeNode(l["v"], l["b"], l["e"])
-
-            cap = list(TimeNodeSet([t_u, t_v]).intersection(subs.W).values())
-
-            if len(cap) == 2:
-                u, v = cap[0], cap[1]
-
-                if u.b == v.b and u.e == v.e:
-                    new_l = {
-                            "u":u.node,
-                            "v": v.node,
-                            "b": u.b,
-                            "e": u.e,
-                            "label": { "left": set(l["label"]["left"]),
-                                       "right": set(l["label"]["right"]) }
-                            }
-                    
-                    subs.add_link(new_l)
-                else:
-                    intv, val = Interval(u.b, u.e).intersect(Interval(v.b, v.e))
-                    if intv:
-                        new_l = {
-                            "u": u.node,
-                            "v": v.node,
-                            "b": val.b,
-                            "e": val.e,
-                            "label": {
-                                "left": copy.deepcopy(label_left),
-                                "right": copy.deepcopy(label_right)
-                            }
-                        }
-                        subs.add_link(new_l)
+        subs.W = self.W_class(list(subs.W.values()))
+        # Links are only visited and truncated to subs.W when needed
+        subs._view(self)
         
         return subs
+
+    def _substream_of(self, W, links):
+        """
+            Returns the substream induced by W, knowing its links: (index in
+            E, b, e) tuples sorted by index, already truncated to W.
+        """
+        subs = self.substream(W, W)
+        subs._preselect([ (self._root_index(i), b, e) for i, b, e in links ])
+        return subs
+
+    def _root_index(self, i):
+        """
+            Returns the index of the i-th link of E in the links of the root stream
+        """
+        return i
+
+    def window(self, b, e):
+        """
+            Returns the stream restricted to the period [b, e]: the links
+            overlapping it and the elements of W, truncated to [b, e].
+        """
+        stream = Stream(lang=self.I, _fp=self.bip_fp, _W_class=self.W_class, _E_class=self.E_class)
+        self._fill_window(stream, b, e)
+        stream.V = set(stream.W.nodes())
+
+        return stream
+
+    def _fill_window(self, stream, b, e):
+        stream.vocabulary = self.vocabulary
+        stream.core_property = self.core_property
+        stream.bipatterns_flag = self.bipatterns_flag
+        stream.patterns_flag = self.patterns_flag
+        stream.T = { "alpha": b, "omega": e }
+
+        stream.E = stream.E_class()
+        for i in self.links_between(b, e):
+            l = self.E[i]
+            stream.add_link(dict(l, b=max(b, l["b"]), e=min(e, l["e"])))
+
+        stream.W = self._window_W(stream, b, e)
+
+    def _window_W(self, stream, b, e):
+        """
+            Returns W truncated to [b, e], for the window stream
+        """
+        return self.W_class.from_intervals([ (u, max(b, x.b), min(e, x.e), x.label)
+                                             for u in self.W.nodes()
+                                             for x in self.W.overlapping(u, b, e) ])
+
+    def partition(self, length, alpha=None):
+        """
+            Stores the links in chunks of the given length of time (see
+            ChunkedLinkTable), starting at alpha (T["alpha"] by default).
+            Time windows and substreams then only go through the chunks
+            they overlap.
+        """
+        if alpha is None:
+            alpha = self.T.get("alpha", 0)
+        self.E_class = ChunkedLinkTable.chunks(length, alpha)
+        self.E = self.E_class(self.E)
+        self._owns_E = True
+
+        return self
+
+    def save_chunks(self, path):
+        """
+            Saves a stream whose links are stored in chunks (see partition())
+            in a directory, with one subdirectory per chunk, and W along
+            with them. Open it with Stream.open_chunks(path).
+        """
+        if not isinstance(self.E, ChunkedLinkTable):
+            raise ValueError("The links of the stream are not stored in chunks, see Stream.partition().")
+
+        nodes = list(dict.fromkeys([ w.node for w in self.W.values() ]))
+        self.E.save(path, {
+            "bipartite": isinstance(self, BipartiteStream),
+            "T": self.T,
+            "V": { side: list(self.V[side]) for side in self.V } if isinstance(self.V, dict) else list(self.V),
+            "I": { side: list(self.I[side]) for side in self.I } if isinstance(self.I, dict) else list(self.I),
+            "bipatterns_flag": self.bipatterns_flag,
+            "patterns_flag": self.patterns_flag,
+            "nodes": nodes,
+        }, _pack_W(self.W, nodes))
+
+    @staticmethod
+    def open_chunks(path, _W_class=TimeNodeSet):
+        """
+            Opens a stream saved by save_chunks(). Its chunks stay on disk
+            until they are used: windows of the stream and its interior (see
+            StreamBHACore.interior) only read the chunks they overlap, while
+            degrees and times read all of them, when first accessed.
+        """
+        E, meta, arrays = ChunkedLinkTable.open(path)
+        if meta["bipartite"]:
+            stream = ChunkedBipartiteStream(_W_class=_W_class, _E_class=type(E))
+        else:
+            stream = ChunkedStream(_W_class=_W_class, _E_class=type(E))
+        stream._open(meta, E, arrays)
+
+        return stream
+
+    def links_between(self, b, e):
+        """
+            Returns the sorted indices of the links overlapping [b, e], using
+            an index of the links sorted by their beginnings: only the links
+            beginning in [b - d, e] are checked, d being the longest link
+            duration. It is built on first use, and rebuilt when links are added.
+            Links stored in chunks (see partition()) are found in the chunks
+            overlapping [b, e] only.
+        """
+        if isinstance(self.E, ChunkedLinkTable):
+            return self.E.links_between(b, e)
+
+        order, begins, ends, longest = self._cached("_time_index", self._index_times)
+        lo = np.searchsorted(begins, b - longest, side="left")
+        hi = np.searchsorted(begins, e, side="right")
+        found = ends[lo:hi] >= b
+
+        return np.sort(order[lo:hi][found]).tolist()
+
+    def _index_times(self):
+        """
+            Builds the time index of links_between(): the order of the links
+            by their beginnings, their sorted beginnings and ends, and the
+            longest link duration
+        """
+        if isinstance(self.E, LinkTable):
+            begins, ends = self.E.b[:self.E.n], self.E.e[:self.E.n]
+        else:
+            begins = np.array([ l["b"] for l in self.E ], dtype=np.float64)
+            ends = np.array([ l["e"] for l in self.E ], dtype=np.float64)
+        order = np.argsort(begins, kind="stable")
+        longest = (ends - begins).max() if len(begins) > 0 else 0
+
+        return order, begins[order], ends[order], longest
     
+    def save_binary(self, path):
+        """
+            Saves the stream in a directory of memory-mappable arrays (see
+            lib.binary): its links, label vocabulary, label postings, W and
+            sorted events. Open it with Stream.open_mmap(path).
+        """
+        E = self.E if isinstance(self.E, LinkTable) else LinkTable(self.E)
+        nodes = list(E.nodes) + [ x for x in dict.fromkeys([ w.node for w in self.W.values() ]) if x not in E.node_ids ]
+        for label in E.labels:
+            self.vocabulary.intern(label)
+        labels = self.vocabulary.labels
+
+        arrays = { "u": E.u[:E.n], "v": E.v[:E.n], "b": E.b[:E.n], "e": E.e[:E.n],
+                   "left": E.left[:E.n], "right": E.right[:E.n] }
+        arrays["labelset_offsets"], arrays["labelset_labels"] = pack_sets(E.labels, self.vocabulary.ids)
+
+        for side in ("left", "right"):
+            postings = self.postings(side)
+            offsets, links = pack_sets([ postings.get(x, []) for x in labels ])
+            arrays[f"postings_{side}_offsets"], arrays[f"postings_{side}_links"] = offsets, links
+
+        arrays.update(_pack_W(self.W, nodes))
+
+        csr = StreamCSR(E)
+        for name in StreamCSR.array_names:
+            arrays["csr_" + name] = getattr(csr, name)
+
+        meta = {
+            "bipartite": isinstance(self, BipartiteStream),
+            "T": self.T,
+            "V": { side: list(self.V[side]) for side in self.V } if isinstance(self.V, dict) else list(self.V),
+            "I": { side: list(self.I[side]) for side in self.I } if isinstance(self.I, dict) else list(self.I),
+            "bipatterns_flag": self.bipatterns_flag,
+            "patterns_flag": self.patterns_flag,
+            "nodes": nodes,
+            "link_nodes": len(E.nodes),
+            "vocabulary": labels,
+        }
+        write_arrays(path, meta, arrays)
+
+    @staticmethod
+    def open_mmap(path, _W_class=ColumnarTimeNodeSet):
+        """
+            Opens a stream saved by save_binary(). Its links, events and label
+            postings are memory-mapped: only W is read right away, and degrees,
+            times and postings are built from the arrays when first used.
+        """
+        meta, arrays = read_arrays(path)
+        if meta["bipartite"]:
+            stream = MappedBipartiteStream(_W_class=_W_class, _E_class=LinkTable)
+        else:
+            stream = MappedStream(_W_class=_W_class, _E_class=LinkTable)
+        stream._open(meta, arrays)
+
+        return stream
+
+    def csr(self, b=-np.inf, e=np.inf):
+        """
+            Returns the events and interaction times of the stream in a
+            compressed sparse row layout (see StreamCSR), that can be
+            scanned without going through the tuples of degrees and times.
+            It is built on first use, and rebuilt when links are added.
+            Links stored in chunks (see partition()) are combined from the
+            layouts of the chunks overlapping [b, e] only: it then holds the
+            links overlapping [b, e], and possibly others.
+        """
+        if isinstance(self.E, ChunkedLinkTable):
+            return self.E.csr(b, e)
+        return self._cached("_csr", lambda: StreamCSR(self.E))
+
+    def postings(self, side):
+        """
+            Returns the inverted index of the labels of the given side ("left"
+            or "right") of the links: a dict mapping each label to the sorted
+            list of the indices in E of the links carrying it.
+            It is built on first use, and extended when links are added.
+        """
+        return self._cached("_postings", lambda: { "left": {}, "right": {} }, self._index_labels)[side]
+
+    def _index_labels(self, postings, n):
+        if isinstance(self.E, LinkTable):
+            return self._index_table_labels(postings, n)
+
+        for i in range(n, len(self.E)):
+            l = self.E[i]
+            for s in ("left", "right"):
+                index = postings[s]
+                for x in l["label"][s]:
+                    try:
+                        index[x].append(i)
+                    except KeyError:
+                        index[x] = [i]
+        return postings
+
+    def _index_table_labels(self, postings, n):
+        """
+            Same as _index_labels, for links in a LinkTable: the links of
+            each distinct label set are found at once from its arrays.
+        """
+        E = self.E
+        for s in ("left", "right"):
+            index = postings[s]
+            sets = getattr(E, s)[n:E.n]
+            order = np.argsort(sets, kind="stable")
+            ids, starts = np.unique(sets[order], return_index=True)
+            rows = np.split(order + n, starts[1:]) if len(order) > 0 else []
+
+            new = {}
+            for k, rows_k in zip(ids.tolist(), rows):
+                for x in E.labels[k]:
+                    new.setdefault(x, []).append(rows_k)
+            for x, arrays in new.items():
+                rows_x = np.sort(np.concatenate(arrays)).tolist() if len(arrays) > 1 else arrays[0].tolist()
+                try:
+                    index[x].extend(rows_x)
+                except KeyError:
+                    index[x] = rows_x
+        return postings
+
+    def links_with(self, q, side, within=None):
+        """
+            Returns the sorted indices of the links whose labels of the given
+            side contain all the labels of q, by intersecting their posting
+            lists. If within is given (sorted indices), only these links are
+            considered.
+        """
+        index = self.postings(side)
+        lists = [ index.get(x, []) for x in q ]
+        if within is not None:
+            lists.append(within)
+        if lists == []:
+            return list(range(len(self.E)))
+
+        # Go through the shortest list, looking up the others by bisection
+        lists.sort(key=len)
+        return [ i for i in lists[0] if all([ _contains_sorted(p, i) for p in lists[1:] ]) ]
+
+    def links_from(self, u):
+        """
+            Returns the sorted indices in E of the links going from u (l["u"] == u).
+            The index is built on first use, and extended when links are added.
+        """
+        return self._cached("_links_from", dict, self._index_links_from).get(u, [])
+
+    def _index_links_from(self, links_from, n):
+        for i in range(n, len(self.E)):
+            try:
+                links_from[self.E[i]["u"]].append(i)
+            except KeyError:
+                links_from[self.E[i]["u"]] = [i]
+        return links_from
+
+    def _selected_between(self, U, V, W=None):
+        """
+            Returns the links of E going from a node of U to a node of V,
+            as (index in E, b, e) tuples in the order of E. If W is given,
+            links outside of its period of time may be left out.
+        """
+        if isinstance(self.E, ChunkedLinkTable) and W is not None:
+            times = [ (x.b, x.e) for x in W.values() ]
+            if times == []:
+                return []
+            links = self.E.selected_between(U, V, min(times)[0], max([ e for _, e in times ]))
+        elif isinstance(self.E, LinkTable):
+            mask = self.E.node_mask(U, "left") & self.E.node_mask(V, "right")
+            links = np.flatnonzero(mask).tolist()
+        else:
+            links = sorted(chain.from_iterable([ self.links_from(u) for u in U ]))
+
+        E = self.E
+        return [ (i, E[i]["b"], E[i]["e"]) for i in links if E[i]["v"] in V ]
+
     def neighbours(self, node):
         return set([ x[0] for x in self.degrees[node] ])
     
@@ -313,33 +1038,9 @@ E: {edges}\
 
                            
 class BipartiteStream(Stream):
-    def __init__(self, _loglevel=logging.DEBUG, _fp=sys.stdout):
-        self.T = {}
+    def __init__(self, _loglevel=logging.DEBUG, _fp=sys.stdout, _W_class=TimeNodeSet, _E_class=list):
+        super().__init__(_loglevel=_loglevel, _fp=_fp, _W_class=_W_class, _E_class=_E_class)
         self.V = { "left": set(), "right": set() }
-        self.W = TimeNodeSet()
-        self.E = []
-        self.core_property = None
-        
-        self.bip_fp = _fp
-        self.pattern_list = []
-        self.EL = set()
-        
-        # Language compatibility
-        self.bipatterns_flag = False
-        self.patterns_flag = False
-        
-        self.I = set()
-        
-        # Store both degree view and links (times) view,
-        # as the optimal view is different depending on the calculation
-        self.degrees = {}
-        self.times = {}
-        
-        self.logger = logging.getLogger()
-        self.logger.setLevel(_loglevel)
-    
-    def __eq__(self, o):
-        return self.T == o.T and self.V == o.V and self.W == o.W and self.E == o.E
 
     def json(self):
         json_repr = {
@@ -367,16 +1068,23 @@ class BipartiteStream(Stream):
         return self.V["left"].union(self.V["right"])
     
     def copy(self):
-        stream_copy = BipartiteStream(_fp=self.bip_fp)
+        stream_copy = BipartiteStream(_fp=self.bip_fp, _W_class=self.W_class, _E_class=self.E_class)
         stream_copy.T = self.T
-        stream_copy.V = copy.deepcopy(self.V)
-        stream_copy.W = copy.deepcopy(self.W)
-        stream_copy.E = copy.deepcopy(self.E)
-        stream_copy.I = copy.deepcopy(self.I)
-        stream_copy.degrees = copy.deepcopy(self.degrees)
-        stream_copy.times = copy.deepcopy(self.times)
-        stream_copy.EL = copy.deepcopy(self.EL)
+        stream_copy.V = { "left": set(self.V["left"]), "right": set(self.V["right"]) }
+        stream_copy.W = self.W.copy()
+        stream_copy.E = self.E
+        stream_copy.vocabulary = self.vocabulary
+        stream_copy.I = copy.copy(self.I)
+        if not isinstance(stream_copy.degrees, _CSRDegrees):
+            stream_copy.degrees = dict(self.degrees)
+            stream_copy.times = dict(self.times)
+        stream_copy.EL = set(self.EL)
         stream_copy.core_property = self.core_property
+        stream_copy._E_fingerprint = self._E_fingerprint
+        stream_copy._E_fingerprint_of = self._E_fingerprint_of
+
+        self._share()
+        stream_copy._share()
         
         return stream_copy
     
@@ -385,40 +1093,35 @@ class BipartiteStream(Stream):
         v = l["v"]
         b = l["b"]
         e = l["e"]
-        label_u = l["label"]["left"]
-        label_v = l["label"]["right"]
+        label_u = self.vocabulary.intern(l["label"]["left"])
+        label_v = self.vocabulary.intern(l["label"]["right"])
+        if label_u is not l["label"]["left"] or label_v is not l["label"]["right"]:
+            l = dict(l, label={ "left": label_u, "right": label_v })
 
         # self.V["left"].add(u)
         # self.V["right"].add(v)
         
-        # Maintain temporal adjacency list 
-        try:
-            self.degrees[u].append((v, b, 1, label_u))
-            self.degrees[u].append((v, e, -1, label_u))
-        except KeyError:
-            self.degrees[u] = [(v, b, 1, label_u), (v, e, -1, label_u)]
+        if self._keeps_events():
+            # Maintain temporal adjacency list 
+            self._queue_events(u, v, b, e, label_u)
+            self._queue_events(v, u, b, e, label_v)
 
-        try:
-            self.degrees[v].append((u, b, 1, label_v))
-            self.degrees[v].append((u, e, -1, label_v))
-        except KeyError:
-            self.degrees[v] = [(u, b, 1, label_v), (u, e, -1, label_v)]
-
-        # Maintain interaction times for each pair of nodes (u,v)
-        try:
-            self.times[frozenset([u,v])].append((b, e, label_u, label_v))
-        except KeyError:
-            self.times[frozenset([u,v])] = [ (b, e, label_u, label_v) ]
+            # Maintain interaction times for each pair of nodes (u,v)
+            self._pair_times(u, v).append((b, e, label_u, label_v))
         
-        # Add to E
-        self.E.append(l)
+        # The fingerprint of E is extended with l when next needed
+        self._links().append(l)
     
     def setCoreProperty(self, prop):
         self.core_property = prop
         
     
     def add_links(self, links):
-        self.E = links
+        links = [ dict(l, label={ "left": self.vocabulary.intern(l["label"]["left"]),
+                                  "right": self.vocabulary.intern(l["label"]["right"]) })
+                  for l in links ]
+        self.E = self.E_class(links)
+        self.W = self.W_class.from_intervals(_link_ends(links))
         self.V = { "left": set(), "right": set() }
         self.T = { "alpha": 0, "omega": 10 }
         
@@ -433,29 +1136,23 @@ class BipartiteStream(Stream):
             label_u = link["label"]["left"]
             label_v = link["label"]["right"]
             
-            try:
-                self.degrees[u].append((v, b, 1, label_u))
-                self.degrees[u].append((v, e, -1, label_u))
-            except KeyError:
-                self.degrees[u] = [(v, b, 1, label_u), (v, e, -1, label_u)]
-                
-            try:
-                self.degrees[v].append((u, b, 1, label_v))
-                self.degrees[v].append((u, e, -1, label_v))
-            except KeyError:
-                self.degrees[v] = [(u, b, 1, label_v), (u, e, -1, label_v)]
+            if not self._keeps_events():
+                continue
+            self._queue_events(u, v, b, e, label_u)
+            self._queue_events(v, u, b, e, label_v)
     
-            try:
-                self.times[frozenset([u,v])].append((b, e, label_u, label_v))
-            except KeyError:
-                self.times[frozenset([u,v])] = [ (b, e, label_u, label_v) ]
+            self._pair_times(u, v).append((b, e, label_u, label_v))
     
-    def readStream(self, filepath):
-        fp = open(filepath)
-        data = json.load(fp)
+    def readStream(self, filepath, time_step=None):
+        """
+            Reads a stream from a JSON file, or from a NDJSON file (see
+            lib.loaders.iter_stream). Links are added as they are parsed.
+            If time_step is given, times are discrete and W is stored as
+            bitmaps over slots of length time_step (see BitsetTimeNodeSet).
+        """
+        data = self._read_file(filepath, time_step)
         self.T = data["T"]
         self.V = {"left": set(data["V"]["left"]), "right": set(data["V"]["right"]) }
-        self.W = TimeNodeSet()
         self.I = data["I"]
             
         if "left" in self.I and "right" in self.I and len(self.I) == 2:
@@ -465,20 +1162,10 @@ class BipartiteStream(Stream):
         else:
             self.patterns_flag = True
             self.I = set(data["I"])
-        
-        self.E = []
-        
-        for link in data["E"]:
-            t_u = TimeNode(link["u"], link["b"], link["e"], _label=link["label"]["left"])
-            t_v = TimeNode(link["v"], link["b"], link["e"], _label=link["label"]["right"])
-            self.W.add(t_u)
-            self.W.add(t_v)
-            self.add_link(link)
 
     def loadJson(self, data):
         self.T = data["T"]
         self.V = {"left": set(data["V"]["left"]), "right": set(data["V"]["right"]) }
-        self.W = TimeNodeSet()
         self.I = data["I"]
 
         if "left" in self.I and "right" in self.I and len(self.I) == 2:
@@ -489,14 +1176,11 @@ class BipartiteStream(Stream):
             self.patterns_flag = True
             self.I = set(data["I"])
         
-        self.E = []
+        self.E = self.E_class()
         
         for link in data["E"]:
-            t_u = TimeNode(link["u"], link["b"], link["e"], _label=link["label"]["left"])
-            t_v = TimeNode(link["v"], link["b"], link["e"], _label=link["label"]["right"])
-            self.W.add(t_u)
-            self.W.add(t_v)
-            self.add_link(link)
+            self._read_link(link)
+        self._build_W()
 
         return data
     
@@ -509,9 +1193,10 @@ class BipartiteStream(Stream):
         # W1, W2: [(u, b,e), (v, b',e'), etc.]
         # returns a substream induced by a subset of W.
         # Only return links etc. involving W1, W2, at their resp. times
-        # TODO : Update to make faster (for starters, don't iterate through all E every time)
+        # The substream is a view on the links of self (see _SubstreamView)
         
-        subs = BipartiteStream()
+        subs = BipartiteStreamView(_W_class=self.W_class, _E_class=self.E_class)
+        subs.vocabulary = self.vocabulary
         subs.T = self.T
         subs.V["left"] = set([x.node for x in  W1 if x.node in self.V["left"] ] + [x.node for x in W2 if x.node in self.V["left"] ])
         subs.V["right"] = set([x.node for x in  W1 if x.node in self.V["right"] ] + [x.node for x in W2 if x.node in self.V["right"] ])
@@ -529,64 +1214,23 @@ class BipartiteStream(Stream):
         if self.patterns_flag:
             subs.I = set()
 
-        subs.E = []
-        subs.degrees = { u: [] for u in list(subs.V["left"]) + list(subs.V["right"]) }
-        
-        for l in self.E:
-            # print(f"About {l}...")
-            # It is necessary to truncate the link if it only partially
-            # intersects with subs.W
-
-            # If both nodes are not in subs.W, we can stop
-            if (l["u"] not in subs.V["left"]) or\
-                (l["v"] not in subs.V["right"]):
-                    continue
-
-            t_u = TimeNode(l["u"], l["b"], l["e"])
-            t_v = TimeNode(l["v"], l["b"], l["e"])
-            label_left = set(l["label"]["left"])
-            label_right = set(l["label"]["right"])
-
-            if self.bipatterns_flag:
-                subs.I["left"] = subs.I["left"].union(label_left)
-                subs.I["right"] = subs.I["right"].union(label_right)
-            if self.patterns_flag:
-                subs.I = subs.I.union(label_left).union(label_right)
-
-            cap = list(TimeNodeSet([t_u, t_v]).intersection(subs.W).values())
-            # print(f"Intersection with of [{t_u}, {t_v}] with W: {cap}")
-
-            if len(cap) == 2:
-                u, v = cap[0], cap[1]
-
-                if u.b == v.b and u.e == v.e:
-                    new_l = {
-                        "u": u.node,
-                        "v": v.node,
-                        "b": u.b,
-                        "e": u.e,
-                        "label": {
-                            "left": copy.deepcopy(label_left),
-                            "right": copy.deepcopy(label_right)
-                        }
-                    }
-                    subs.add_link(new_l)
-                else:
-                    intv, val = Interval(u.b, u.e).intersect(Interval(v.b, v.e))
-                    if intv:
-                        new_l = {
-                            "u": u.node,
-                            "v": v.node,
-                            "b": val.b,
-                            "e": val.e,
-                            "label": {
-                                "left": copy.deepcopy(label_left),
-                                "right": copy.deepcopy(label_right)
-                            }
-                        }
-                        subs.add_link(new_l)
+        # Links are only visited and truncated to subs.W when needed
+        subs._view(self)
         
         return subs
+
+    def window(self, b, e):
+        """
+            Returns the stream restricted to the period [b, e]: the links
+            overlapping it and the elements of W, truncated to [b, e].
+        """
+        stream = BipartiteStream(_fp=self.bip_fp, _W_class=self.W_class, _E_class=self.E_class)
+        stream.I = self.I
+        self._fill_window(stream, b, e)
+        stream.V = { "left": set([ u for u in stream.W.nodes() if u in self.V["left"] ]),
+                     "right": set([ u for u in stream.W.nodes() if u in self.V["right"] ]) }
+
+        return stream
     
     def neighbours(self, node):
         return set([ x[0] for x in self.degrees[node] ])
@@ -601,3 +1245,307 @@ E: {edges}\
     
     def __repr__(self):
         return self.__str__()
+
+class _LazyEvents:
+    """
+        degrees and times of a stream, built by _materialize() when first accessed
+    """
+
+    @property
+    def degrees(self):
+        if self._degrees is None:
+            self._materialize()
+        return super().degrees
+
+    @degrees.setter
+    def degrees(self, degrees):
+        self._degrees = degrees
+        self._queued = {}
+
+    def _keeps_events(self):
+        if self._degrees is None:
+            self._materialize()
+        return super()._keeps_events()
+
+    @property
+    def times(self):
+        if self._times is None:
+            self._materialize()
+        return self._times
+
+    @times.setter
+    def times(self, times):
+        self._times = times
+
+class _SubstreamView(_LazyEvents):
+    """
+        Substream induced by a set of time-nodes (see Stream.substream).
+        Its links are kept as the indices of links of the root stream, with
+        their times truncated to W, and are only computed when needed.
+        E, degrees and times are built when first accessed, so that
+        substreams of which only W is read cost no link at all.
+    """
+
+    def _view(self, parent):
+        self._parent = parent
+        self._root = parent._root if isinstance(parent, _SubstreamView) else parent
+        # (index in the root links, b, e) of the links of the view
+        self._selected = None
+        self._selected_from = None
+        self._E = None
+        self._degrees = None
+        self._times = None
+
+    @property
+    def E(self):
+        if self._E is None:
+            self._materialize()
+        return self._E
+
+    @E.setter
+    def E(self, E):
+        self._E = E
+
+    def _ends(self):
+        """
+            Nodes that links of the view go from, and to
+        """
+        return self.V, self.V
+
+    def _visit(self, l):
+        """
+            Called on every link of the parent stream between nodes of the view
+        """
+        pass
+
+    def _selection(self):
+        """
+            Returns the links of the view, as (index in the root links, b, e)
+            tuples in the order of the root links.
+        """
+        if self._selected is None:
+            E = self._root.E
+            self._selected = []
+
+            for i, b, e in self._parent._selected_between(*self._ends(), W=self.W):
+                l = E[i]
+                self._visit(l)
+                # It is necessary to truncate the link if it only partially
+                # intersects with W
+                cap = _clip(l["u"], l["v"], b, e, self.W)
+                if cap is not None:
+                    self._selected.append((i, cap[0], cap[1]))
+
+            # Views do not keep their parent alive once computed
+            self._parent = None
+
+        return self._selected
+
+    def _preselect(self, selected):
+        """
+            Sets the links of the view, as returned by _selection()
+        """
+        self._selected = selected
+        self._parent = None
+
+    def _root_index(self, i):
+        return self._selection()[i][0]
+
+    def _selected_between(self, U, V, W=None):
+        """
+            Same as Stream._selected_between, on the links of the view
+        """
+        E = self._root.E
+        if self._selected_from is None:
+            self._selected_from = {}
+            for x in self._selection():
+                try:
+                    self._selected_from[E[x[0]]["u"]].append(x)
+                except KeyError:
+                    self._selected_from[E[x[0]]["u"]] = [x]
+
+        links = sorted(chain.from_iterable([ self._selected_from.get(u, []) for u in U ]))
+        return [ x for x in links if E[x[0]]["v"] in V ]
+
+    def _materialize(self):
+        E = self._root.E
+        self._E = self.E_class()
+        if issubclass(self.E_class, LinkTable):
+            self._degrees = _CSRDegrees(self)
+            self._times = _CSRTimes(self)
+        else:
+            self._degrees = { u: [] for u in self.nodes() }
+            self._times = {}
+
+        for i, b, e in self._selection():
+            l = E[i]
+            self.add_link({
+                "u": l["u"],
+                "v": l["v"],
+                "b": b,
+                "e": e,
+                "label": { "left": l["label"]["left"],
+                           "right": l["label"]["right"] }
+            })
+
+class StreamView(_SubstreamView, Stream):
+    pass
+
+class BipartiteStreamView(_SubstreamView, BipartiteStream):
+    _I_pending = False
+
+    @property
+    def I(self):
+        if self._I_pending:
+            self._selection()
+        return self._I
+
+    @I.setter
+    def I(self, I):
+        self._I = I
+
+    def _view(self, parent):
+        super()._view(parent)
+        # I collects the labels of the visited links
+        self._I_pending = parent.bipatterns_flag or parent.patterns_flag
+
+    def _ends(self):
+        return self.V["left"], self.V["right"]
+
+    def _visit(self, l):
+        if self._parent.bipatterns_flag:
+            self._I["left"] = self._I["left"].union(l["label"]["left"])
+            self._I["right"] = self._I["right"].union(l["label"]["right"])
+        if self._parent.patterns_flag:
+            self._I = self._I.union(l["label"]["left"]).union(l["label"]["right"])
+
+    def _selection(self):
+        selected = super()._selection()
+        self._I_pending = False
+        return selected
+
+    def _preselect(self, selected):
+        # I collects the labels of the links of the view
+        E = self._root.E
+        if self._I_pending:
+            for i, b, e in selected:
+                self._visit(E[i])
+        super()._preselect(selected)
+        self._I_pending = False
+
+class _MappedStream(_LazyEvents):
+    """
+        Stream opened by Stream.open_mmap(): E is a LinkTable over
+        memory-mapped arrays, degrees and times are read from the saved
+        arrays (see _CSRDegrees), and the label postings used by extents
+        (see Pattern.links) are read from the saved ones when first accessed.
+    """
+    _arrays = None
+
+    def _open(self, meta, arrays):
+        nodes = meta["nodes"]
+        link_nodes = nodes[:meta["link_nodes"]]
+
+        self.T = meta["T"]
+        if meta["bipartite"]:
+            self.V = { side: set(meta["V"][side]) for side in ("left", "right") }
+        else:
+            self.V = set(meta["V"])
+        if isinstance(meta["I"], dict):
+            self.I = { side: set(meta["I"][side]) for side in meta["I"] }
+        else:
+            self.I = set(meta["I"])
+        self.bipatterns_flag = meta["bipatterns_flag"]
+        self.patterns_flag = meta["patterns_flag"]
+
+        self.vocabulary = Vocabulary(meta["vocabulary"])
+        labels = unpack_sets(arrays["labelset_offsets"], arrays["labelset_labels"], self.vocabulary.labels)
+        labels = [ self.vocabulary.intern(x) for x in labels ]
+        self.E = LinkTable.from_arrays(arrays["u"], arrays["v"], arrays["b"], arrays["e"],
+                                       arrays["left"], arrays["right"], link_nodes, labels)
+
+        self._csr = StreamCSR.from_arrays(link_nodes, { name: arrays["csr_" + name] for name in StreamCSR.array_names })
+        self._csr_of = (self.E, len(self.E))
+
+        self.W = _unpack_W(self.W_class, nodes, arrays)
+
+        self._arrays = arrays
+        self._degrees = _CSRDegrees(self)
+        self._times = _CSRTimes(self)
+
+    def postings(self, side):
+        if self._arrays is not None:
+            # Postings of the saved links
+            labels = self.vocabulary.labels
+            for s in ("left", "right"):
+                offsets = self._arrays[f"postings_{s}_offsets"].tolist()
+                links = self._arrays[f"postings_{s}_links"]
+                self._postings[s] = { labels[k]: links[offsets[k]:offsets[k + 1]].tolist()
+                                      for k in range(len(offsets) - 1) if offsets[k + 1] > offsets[k] }
+            # Links added since then are indexed by Stream.postings
+            self._postings_of = (self.E, len(self._arrays["u"]))
+            self._arrays = None
+
+        return super().postings(side)
+
+class MappedStream(_MappedStream, Stream):
+    pass
+
+class MappedBipartiteStream(_MappedStream, BipartiteStream):
+    pass
+
+class _ChunkedStream(_LazyEvents):
+    """
+        Stream opened by Stream.open_chunks(): E is a ChunkedLinkTable whose
+        chunks are read when used, W is read from the saved arrays when
+        first accessed (or built from the links, if it was not saved), and
+        degrees and times are read from the events of the chunks (see
+        _CSRDegrees).
+    """
+    _W = None
+    _W_arrays = None
+
+    def _open(self, meta, E, arrays):
+        self.T = meta["T"]
+        if meta["bipartite"]:
+            self.V = { side: set(meta["V"][side]) for side in ("left", "right") }
+        else:
+            self.V = set(meta["V"])
+        if isinstance(meta["I"], dict):
+            self.I = { side: set(meta["I"][side]) for side in meta["I"] }
+        else:
+            self.I = set(meta["I"])
+        self.bipatterns_flag = meta["bipatterns_flag"]
+        self.patterns_flag = meta["patterns_flag"]
+
+        self.E = E
+        self._W = None
+        if "w_node" in arrays:
+            self._W_arrays = (meta["nodes"], arrays)
+        self._degrees = _CSRDegrees(self)
+        self._times = _CSRTimes(self)
+
+    @property
+    def W(self):
+        if self._W is None and self._W_arrays is not None:
+            self._W = _unpack_W(self.W_class, *self._W_arrays)
+            self._W_arrays = None
+        if self._W is None:
+            self._build_W()
+        return self._W
+
+    @W.setter
+    def W(self, W):
+        self._W = W
+
+    def _window_W(self, stream, b, e):
+        # Unless it was saved, W is made of the ends of the links: those of the window are enough
+        if self._W is None and self._W_arrays is None:
+            return self.W_class.from_intervals(_link_ends(stream.E))
+        return super()._window_W(stream, b, e)
+
+class ChunkedStream(_ChunkedStream, Stream):
+    pass
+
+class ChunkedBipartiteStream(_ChunkedStream, BipartiteStream):
+    pass
@@ -0,0 +1,252 @@
+import numpy as np
+
+from lib.LinkTable import LinkTable
+
+class StreamCSR:
+    """
+        Compressed sparse row layout of the events of a stream (as in
+        Stream.degrees) and of the interaction times of its pairs of nodes
+        (as in Stream.times), built from its links.
+
+        Nodes are numbered (nodes[i] is the node of index i, node_ids the
+        reverse mapping). The events of node i are at positions
+        offsets[i]:offsets[i+1] of the typed arrays neighbour, t, type, link
+        and side, in the order of Stream.degrees: the label of an event is
+        the label of the given side ("left" if 0, "right" if 1) of its link.
+    """
+
+    def __init__(self, E=[]):
+        if isinstance(E, LinkTable):
+            self.nodes = list(E.nodes)
+            u, v = E.u[:E.n], E.v[:E.n]
+            b, e = E.b[:E.n], E.e[:E.n]
+        else:
+            self.nodes = list(dict.fromkeys(_ends(E)))
+            ids = { x: i for i, x in enumerate(self.nodes) }
+            u = np.array([ ids[l["u"]] for l in E ], dtype=np.int64)
+            v = np.array([ ids[l["v"]] for l in E ], dtype=np.int64)
+            b = np.array([ l["b"] for l in E ], dtype=np.float64)
+            e = np.array([ l["e"] for l in E ], dtype=np.float64)
+        self.node_ids = { x: i for i, x in enumerate(self.nodes) }
+        n = len(u)
+        ids = np.arange(n, dtype=np.int64)
+
+        # Events: beginning and end of each link, for each of its ends
+        node = np.concatenate((u, u, v, v))
+        neighbour = np.concatenate((v, v, u, u))
+        t = np.concatenate((b, e, b, e))
+        ev_type = np.concatenate((np.ones(n), -np.ones(n), np.ones(n), -np.ones(n))).astype(np.int8)
+        link = np.concatenate((ids, ids, ids, ids))
+        side = np.concatenate((np.zeros(2 * n), np.ones(2 * n))).astype(np.int8)
+
+        self._sort_events(node, neighbour, t, ev_type, link, side, np.tile(b == e, 4))
+        self._sort_pairs(u, v, b, e, ids)
+
+    @staticmethod
+    def combine(parts, nodes):
+        """
+            Builds the layout of the links of several layouts, given as
+            (layout, rows, links) tuples: rows maps the node indices of the
+            layout to indices in nodes, and links maps its link numbers to
+            those of the combined layout.
+        """
+        new = StreamCSR.__new__(StreamCSR)
+        new.nodes = list(nodes)
+        new.node_ids = { x: i for i, x in enumerate(new.nodes) }
+
+        events, pairs = [], []
+        for csr, rows, links in parts:
+            # Links with b == e, found from their interaction times
+            instant = np.zeros(len(csr.pair_link), dtype=bool)
+            instant[csr.pair_link] = csr.pair_b == csr.pair_e
+
+            row = np.repeat(np.arange(len(csr.nodes), dtype=np.int64), np.diff(csr.offsets))
+            events.append((rows[row], rows[csr.neighbour], csr.t, csr.type, links[csr.link], csr.side, instant[csr.link]))
+            count = np.diff(csr.pair_offsets)
+            pairs.append((rows[np.repeat(csr.pairs[:, 0], count)], rows[np.repeat(csr.pairs[:, 1], count)],
+                          csr.pair_b, csr.pair_e, links[csr.pair_link]))
+
+        dtypes = (np.int64, np.int64, np.float64, np.int8, np.int64, np.int8, bool)
+        new._sort_events(*[ _concatenate([ x[k] for x in events ], dtype) for k, dtype in enumerate(dtypes) ])
+        dtypes = (np.int64, np.int64, np.float64, np.float64, np.int64)
+        new._sort_pairs(*[ _concatenate([ x[k] for x in pairs ], dtype) for k, dtype in enumerate(dtypes) ])
+        return new
+
+    def _sort_events(self, node, neighbour, t, ev_type, link, side, instant):
+        """
+            Sets the event arrays from the events of all nodes, instant
+            telling for each of them if its link has b == e
+        """
+        # At equal times, ends come before beginnings, except the end of a
+        # link with b == e that comes right after its beginning
+        rank = np.where((ev_type == -1) & ~instant, 0, 1)
+        order = np.lexsort((ev_type == -1, link, rank, t, node))
+
+        self.offsets = _offsets(node[order], len(self.nodes))
+        self.neighbour = neighbour[order]
+        self.t = t[order]
+        self.type = ev_type[order]
+        self.link = link[order]
+        self.side = side[order]
+
+    def _sort_pairs(self, u, v, b, e, link):
+        """
+            Sets the arrays of the interaction times of each pair of nodes, in the order of the links
+        """
+        low, high = np.minimum(u, v), np.maximum(u, v)
+        order = np.lexsort((link, high, low))
+        low, high = low[order], high[order]
+        starts = np.ones(len(low), dtype=bool)
+        starts[1:] = (low[1:] != low[:-1]) | (high[1:] != high[:-1])
+        rows = np.flatnonzero(starts)
+
+        self.pairs = np.stack((low[rows], high[rows]), axis=1)
+        self.pair_offsets = np.append(rows, len(low)).astype(np.int64)
+        self.pair_b = b[order]
+        self.pair_e = e[order]
+        self.pair_link = link[order]
+
+    @staticmethod
+    def from_arrays(nodes, arrays):
+        """
+            Builds a layout from its arrays (see array_names), without
+            copying them: they may be memory-mapped.
+        """
+        new = StreamCSR.__new__(StreamCSR)
+        new.nodes = list(nodes)
+        new.node_ids = { x: i for i, x in enumerate(new.nodes) }
+        for name in StreamCSR.array_names:
+            setattr(new, name, arrays[name])
+        return new
+
+    array_names = ("offsets", "neighbour", "t", "type", "link", "side",
+                   "pairs", "pair_offsets", "pair_b", "pair_e", "pair_link")
+
+    def _row(self, u):
+        """
+            Returns the range of the event arrays holding the events of node u
+        """
+        if u not in self.node_ids:
+            return 0, 0
+        i = self.node_ids[u]
+        return self.offsets[i], self.offsets[i + 1]
+
+    def events(self, u):
+        """
+            Returns the events of node u as arrays (neighbour, t, type, link, side),
+            sorted as in Stream.degrees. They are views on the arrays of the layout.
+        """
+        lo, hi = self._row(u)
+        return self.neighbour[lo:hi], self.t[lo:hi], self.type[lo:hi], self.link[lo:hi], self.side[lo:hi]
+
+    def pair_times(self, u, v):
+        """
+            Returns the interaction times of u and v as arrays (b, e, link),
+            in the order of the links.
+        """
+        if u not in self.node_ids or v not in self.node_ids:
+            return self.pair_b[:0], self.pair_e[:0], self.pair_link[:0]
+
+        key = sorted([self.node_ids[u], self.node_ids[v]])
+        i = np.searchsorted(self.pairs[:, 0], key[0])
+        j = np.searchsorted(self.pairs[:, 0], key[0], side="right")
+        k = i + np.searchsorted(self.pairs[i:j, 1], key[1])
+        if k == j or self.pairs[k, 1] != key[1]:
+            return self.pair_b[:0], self.pair_e[:0], self.pair_link[:0]
+
+        lo, hi = self.pair_offsets[k], self.pair_offsets[k + 1]
+        return self.pair_b[lo:hi], self.pair_e[lo:hi], self.pair_link[lo:hi]
+
+    def present(self, u, t):
+        """
+            Returns the (link, side) of the events of the links of u present
+            at time t, as two arrays.
+        """
+        _, times, ev_type, link, side = self.events(u)
+        # Links that began at t or before, and did not end before t
+        began = times <= t
+        ended = times < t
+        key = link * 2 + side
+        key = np.setdiff1d(key[began & (ev_type == 1)], key[ended & (ev_type == -1)])
+
+        return key // 2, key % 2
+
+    def sweep(self, threshold):
+        """
+            Sweep of the events of all nodes at once. The number of
+            neighbours of a node is a running sum over its events: a
+            neighbour comes with the first of its links present, and leaves
+            with the last one.
+
+            threshold is a number, or an array giving it for each node index.
+            Returns, as arrays, the positions of the ends of links at which
+            their node has at least threshold neighbours (just before the
+            end), and for each of them the index of the node, the position
+            of its last beginning of a link, and the position of the last
+            one at which it had less than threshold neighbours.
+        """
+        n = len(self.t)
+        position = np.arange(n, dtype=np.int64)
+        row = np.repeat(np.arange(len(self.nodes), dtype=np.int64), np.diff(self.offsets))
+        ev_type = self.type.astype(np.int64)
+
+        # Number of links of each pair present after each event
+        order = np.lexsort((position, self.neighbour, row))
+        pair_type = ev_type[order]
+        starts = np.ones(n, dtype=bool)
+        starts[1:] = (row[order][1:] != row[order][:-1]) | (self.neighbour[order][1:] != self.neighbour[order][:-1])
+        present = _running_sum(pair_type, starts)
+
+        change = np.empty(n, dtype=np.int64)
+        change[order] = ((pair_type == 1) & (present == 1)).astype(np.int64) - ((pair_type == -1) & (present == 0))
+
+        # Number of neighbours of the node just before each event
+        starts = np.ones(n, dtype=bool)
+        starts[1:] = row[1:] != row[:-1]
+        degree = _running_sum(change, starts) - change
+
+        # A link is present before its end, so thresholds below 1 are the same as 1
+        if isinstance(threshold, np.ndarray):
+            threshold = threshold[row]
+        threshold = np.maximum(threshold, 1)
+
+        # Ends are always preceded by a beginning of the same node
+        begin = ev_type == 1
+        begun = np.maximum.accumulate(np.where(begin, position, -1))
+        reached = np.maximum.accumulate(np.where(begin & (degree < threshold), position, -1))
+
+        ends = np.flatnonzero(~begin & (degree >= threshold))
+        return ends, row[ends], begun[ends], reached[ends]
+
+    def spans(self):
+        """
+            Returns the positions of the beginning and of the end of each
+            link, for each of its ends, as two arrays.
+        """
+        order = np.lexsort((-self.type, self.link * 2 + self.side))
+        return order[0::2], order[1::2]
+
+    def __len__(self):
+        return len(self.t)
+
+def _ends(E):
+    for l in E:
+        yield l["u"]
+        yield l["v"]
+
+def _running_sum(values, starts):
+    """
+        Cumulative sum of values, restarting at every position where starts is True
+    """
+    total = np.cumsum(values)
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(values)), 0))
+    return total - total[first] + values[first]
+
+def _concatenate(arrays, dtype):
+    return np.concatenate(arrays).astype(dtype, copy=False) if len(arrays) > 0 else np.empty(0, dtype=dtype)
+
+def _offsets(rows, n):
+    """
+        Returns the offsets of the rows 0..n-1 in a sorted array of row indices
+    """
+    return np.searchsorted(rows, np.arange(n + 1)).astype(np.int64)
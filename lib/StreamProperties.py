@@ -1,16 +1,336 @@
 from lib.TimeNode import Interval, TimeNode, TimeNodeSet
 from lib.Stream import Stream
+from lib.ChunkedLinkTable import ChunkedLinkTable
 from operator import itemgetter
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+def _hub_times(events, threshold):
+    """
+        Yields the periods [b, e] during which a node has at least threshold
+        neighbours, from its events sorted by time, ends first (see Stream.degrees):
+        b is the last time a neighbour came, and e the time one leaves.
+        Neighbours are counted once, whatever their number of links with the node.
+    """
+    # Neighbours, and their number of links present
+    neighbourhood = {}
+    last_t = None
+
+    for v, t, e_type, label in events:
+        if e_type == 1:
+            neighbourhood[v] = neighbourhood.get(v, 0) + 1
+            last_t = t
+        elif e_type == -1:
+            if len(neighbourhood) >= threshold:
+                # We have no idea about v's neighbourhood.
+                yield last_t, t
+            neighbourhood[v] -= 1
+            if neighbourhood[v] == 0:
+                del neighbourhood[v]
+
+def _event_times(E, csr, positions):
+    """
+        Times of the events at the given positions of csr, as given in the links E
+    """
+    return [ E[i]["b"] if ev_type == 1 else E[i]["e"]
+             for i, ev_type in zip(csr.link[positions].tolist(), csr.type[positions].tolist()) ]
+
+def _hubs_of(E, csr, ends, rows, begun):
+    """
+        Periods during which nodes have enough neighbours, by node, from
+        the ends of links found by csr.sweep(), their rows and last beginnings
+    """
+    hubs = {}
+    for i, b, e in zip(rows.tolist(), _event_times(E, csr, begun), _event_times(E, csr, ends)):
+        hubs.setdefault(csr.nodes[i], []).append((b, e))
+    return hubs
+
+def _ranges(lo, hi):
+    """
+        Concatenation of the ranges [lo[i], hi[i]), and the i of each of their elements
+    """
+    count = hi - lo
+    return (np.arange(count.sum()) - np.repeat(np.cumsum(count) - count - lo, count),
+            np.repeat(np.arange(len(lo)), count))
+
+def _merge_times(times):
+    """
+        Merges overlapping or touching (b, e), sorted by their beginnings
+    """
+    merged = []
+    for b, e in times:
+        if len(merged) > 0 and b <= merged[-1][1]:
+            if e > merged[-1][1]:
+                merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((b, e))
+    return merged
+
+def _intersect_times(i_list, j_list):
+    """
+        Intersection of two sorted lists of disjoint (b, e), as in TimeNodeSet.intersection
+    """
+    cap = []
+    i, j = 0, 0
+    while i < len(i_list) and j < len(j_list):
+        b = max(i_list[i][0], j_list[j][0])
+        e = min(i_list[i][1], j_list[j][1])
+        if b <= e:
+            cap.append((b, e))
+        if i_list[i][1] < j_list[j][1]:
+            i += 1
+        elif j_list[j][1] < i_list[i][1]:
+            j += 1
+        else:
+            i += 1
+            j += 1
+    return cap
+
+_begin = itemgetter(0)
+_end = itemgetter(1)
+
+def _clip_times(u, v, b, e, W):
+    """
+        Same as Stream._clip, W being sorted lists of disjoint (b, e) by node
+    """
+    if u == v or u not in W or v not in W:
+        return None
+
+    caps = []
+    for times in (W[u], W[v]):
+        i, j = bisect_left(times, b, key=_end), bisect_right(times, e, key=_begin)
+        if j != i + 1:
+            return None
+        caps.append(times[i])
+
+    b = max(b, caps[0][0], caps[1][0])
+    e = min(e, caps[0][1], caps[1][1])
+    if b > e:
+        return None
+    return b, e
+
+def _link_keys(i, piece):
+    """
+        Sort keys of the events of link i over piece, in the order of
+        Stream.degrees: (t, rank, i, end), rank being 0 for the end of a link
+        with b < e and 1 otherwise, and end 1 for ends.
+    """
+    b, e = piece
+    return (b, 1, i, 0), (e, 0 if b < e else 1, i, 1)
+
+class _PeelingEvents:
+    """
+        Events of the links incident to a node while peeling (see
+        StreamBHACore._peel), kept sorted by _link_keys, with the number of
+        distinct neighbours present after each of them. Both are updated in
+        place when a link is truncated or dropped, instead of being rebuilt.
+    """
+    def __init__(self, u, links, ends, pieces):
+        self.neighbour = {}
+        self.links_with = {}
+        keys = []
+        for i in links:
+            x, y = ends[i]
+            if x == y or pieces[i] is None:
+                continue
+            v = y if x == u else x
+            self.neighbour[i] = v
+            self.links_with.setdefault(v, []).append(i)
+            keys.extend(_link_keys(i, pieces[i]))
+        keys.sort()
+
+        # Neighbours, and their number of links present
+        neighbourhood = {}
+        counts = []
+        for t, rank, i, end in keys:
+            v = self.neighbour[i]
+            if end == 0:
+                neighbourhood[v] = neighbourhood.get(v, 0) + 1
+            else:
+                neighbourhood[v] -= 1
+                if neighbourhood[v] == 0:
+                    del neighbourhood[v]
+            counts.append(len(neighbourhood))
+
+        self.keys = keys
+        self.counts = np.array(counts, dtype=np.int64)
+        self.ends = np.array([ key[3] for key in keys ], dtype=bool)
+        self.times = np.array([ key[0] for key in keys ], dtype=np.float64)
+
+    def _count(self, i, piece_of, sign):
+        """
+            Adds sign to the number of neighbours after the events of link i
+            during which it is the only link present with its neighbour, the
+            links present being those of piece_of(j) not None
+        """
+        kb, ke = _link_keys(i, piece_of(i))
+        lo, hi = bisect_left(self.keys, kb), bisect_left(self.keys, ke)
+        if len(self.links_with[self.neighbour[i]]) == 1:
+            self.counts[lo:hi] += sign
+            return
+        alone = np.ones(hi - lo, dtype=np.int64)
+        for j in self.links_with[self.neighbour[i]]:
+            piece = piece_of(j) if j != i else None
+            if piece is None:
+                continue
+            kb, ke = _link_keys(j, piece)
+            b = max(bisect_left(self.keys, kb), lo)
+            e = min(bisect_left(self.keys, ke), hi)
+            if b < e:
+                alone[b - lo:e - lo] = 0
+        self.counts[lo:hi] += sign * alone
+
+    def update(self, old, pieces):
+        """
+            Replaces the events of the links in old, over their former pieces
+            old[i], by those over pieces[i] (none if None)
+        """
+        old = { i: piece for i, piece in old.items() if i in self.neighbour }
+
+        # Removes the former events one link at a time, discounting its neighbour when it was alone
+        removed = set()
+        positions = []
+        for i, piece in old.items():
+            self._count(i, lambda j: None if j in removed else old.get(j, pieces[j]), -1)
+            removed.add(i)
+            positions.extend(bisect_left(self.keys, key) for key in _link_keys(i, piece))
+        for k in sorted(positions, reverse=True):
+            del self.keys[k]
+        self.counts = np.delete(self.counts, positions)
+        self.ends = np.delete(self.ends, positions)
+        self.times = np.delete(self.times, positions)
+
+        # Inserts the new events, counted as the events before them, then adds the links one at a time
+        added = sorted(key for i in old if pieces[i] is not None for key in _link_keys(i, pieces[i]))
+        if len(added) == 0:
+            return
+        for key in added:
+            self.keys.insert(bisect_left(self.keys, key), key)
+        before = np.array([ bisect_left(self.keys, key) for key in added ]) - np.arange(len(added))
+        self.counts = np.insert(self.counts, before, np.concatenate(([0], self.counts))[before])
+        self.ends = np.insert(self.ends, before, [ key[3] == 1 for key in added ])
+        self.times = np.insert(self.times, before, [ key[0] for key in added ])
+        for i in old:
+            if pieces[i] is not None:
+                removed.discard(i)
+                self._count(i, lambda j: None if j in removed else pieces[j], 1)
+
+    def hub_times(self, threshold):
+        """
+            Same as _merge_times(_hub_times(events, threshold)) on the events kept
+        """
+        before = np.concatenate(([0], self.counts[:-1]))
+        hits = np.flatnonzero(self.ends & (before >= threshold))
+        if len(hits) == 0:
+            return []
+
+        # Last beginning before each end, and the ends where a merged period starts
+        positions = np.arange(len(self.keys))
+        begun = np.maximum.accumulate(np.where(self.ends, -1, positions))[hits]
+        b, e = self.times[begun], self.times[hits]
+        first = np.ones(len(hits), dtype=bool)
+        first[1:] = b[1:] > np.maximum.accumulate(e)[:-1]
+        first = np.flatnonzero(first)
+        last = np.append(first[1:], len(hits)) - 1
+        return [ (self.keys[x][0], self.keys[y][0]) for x, y in zip(begun[first].tolist(), hits[last].tolist()) ]
+
+def _peeling_span(s):
+    """
+        Period of time of the links that peeling s depends on, when they
+        are stored in chunks (see Stream.csr()): the links overlapping the
+        time-nodes of s, and those beginning while one of them is there, as
+        the periods of hubs can begin then (see _hub_times). Otherwise, all
+        the links are used.
+    """
+    if not isinstance(s.E, ChunkedLinkTable):
+        return -np.inf, np.inf
+
+    times = [ (x.b, x.e) for x in s.W.values() ]
+    if times == []:
+        return np.inf, -np.inf
+    b, e = min(times)[0], max([ e for _, e in times ])
+    E = s.E
+    return b, max([ e ] + [ E[i]["e"] for i in s.links_between(b, e) ])
+
+def _peeling_state(s, b=-np.inf, e=np.inf):
+    """
+        Returns what StreamBHACore._peel() works on: the ends of the links of
+        s, the links incident to each node, the times of the links
+        truncated to the time-nodes kept so far (None once dropped), these
+        time-nodes, as sorted lists of disjoint (b, e) by node, and the
+        _PeelingEvents of the nodes swept so far (built on their first sweep).
+        Links stored in chunks are only read if they overlap [b, e] (see
+        _peeling_span): the others are left out, as already dropped.
+    """
+    E = s.E
+    if isinstance(E, ChunkedLinkTable):
+        ends, pieces = [ None ] * len(E), [ None ] * len(E)
+        for i in s.links_between(b, e):
+            l = E[i]
+            ends[i], pieces[i] = (l["u"], l["v"]), (l["b"], l["e"])
+    else:
+        ends = [ (l["u"], l["v"]) for l in E ]
+        pieces = [ (l["b"], l["e"]) for l in E ]
+    incident = {}
+    for i, piece in enumerate(pieces):
+        if piece is not None:
+            u, v = ends[i]
+            incident.setdefault(u, []).append(i)
+            incident.setdefault(v, []).append(i)
+
+    W = { u: [ (x.b, x.e) for x in s.W.elements[u] ] for u in incident if u in s.W.elements }
+    return ends, incident, pieces, W, {}
+
+def _core_of(s, W, pieces):
+    """
+        Substream of s of the time-nodes W and links pieces left by peeling
+    """
+    core = TimeNodeSet.from_intervals([ (u, b, e, set()) for u in W for b, e in W[u] ])
+    return s._substream_of(core, [ (i,) + piece for i, piece in enumerate(pieces) if piece is not None ])
 
 class StreamProperty():
+    """
+        Property defining the core of a stream. Properties with no interior()
+        of their own define p1(u, s) and p2(u, s), that return whether the
+        first (resp. second) condition holds for node u in stream s, and the
+        TimeNodes of u for which it does (see patterns.generic_interior).
+    """
+    # Number of hops from a node within which links may change the value
+    # of p1 and p2 on it: 1 if they only depend on the links of the node,
+    # None if they may depend on the whole stream
+    locality = None
+
     def __init__(self, stream):
         self.S = stream
         
-    def p1(self):
-        return True
+    def p1(self, u, s):
+        return True, s.W.overlapping(u, float("-inf"), float("inf"))
+
+    def p2(self, u, s):
+        return True, s.W.overlapping(u, float("-inf"), float("inf"))
+
+    def key(self):
+        """
+            Returns a key identifying the property and its parameters: two
+            properties with the same key have the same interiors. By
+            default, a property is only the same as itself.
+        """
+        return (type(self), id(self))
 
-    def p2(self):
-        return True
+    def affected(self, nodes, s):
+        """
+            Returns the nodes of s on which p1 and p2 may change when the
+            TimeNodes of nodes change
+        """
+        if self.locality is None:
+            return set(s.W.nodes())
+
+        affected = set(nodes)
+        frontier = set(nodes)
+        for _ in range(self.locality):
+            frontier = set().union(*[ s.neighbours(u) for u in frontier if u in s.degrees ]).difference(affected)
+            affected.update(frontier)
+        return affected
 
 class BHACore(StreamProperty):
     def __init__(self, stream):
@@ -33,70 +353,256 @@ class BHACore(StreamProperty):
         return degree >= self.a and pattern
 
 class StreamBHACore(StreamProperty):
+    # Hubs and authorities only depend on their own links
+    locality = 1
+
     def __init__(self, stream, h=2, a=2):
         super().__init__(stream)
         self.h = h
         self.a = a
         # Ensure that BipartiteStream ?
+
+    def key(self):
+        return (type(self), self.h, self.a)
+
+    def p1(self, u, s):
+        """
+            Hub condition: times at which left node u has at least h neighbours in s
+        """
+        return self._has_neighbours(u, s, "left", self.h)
+
+    def p2(self, u, s):
+        """
+            Authority condition: times at which right node u has at least a neighbours in s
+        """
+        return self._has_neighbours(u, s, "right", self.a)
+
+    def _has_neighbours(self, u, s, side, threshold):
+        if u not in s.V[side] or u not in s.degrees:
+            return False, []
+
+        times = [ TimeNode(u, b, e) for b, e in _merge_times(_hub_times(s.degrees[u], threshold)) ]
+        return len(times) > 0, times
         
     
     def find_bicore(self, stream):
+        hubs = self._hub_intervals(stream)
+        hubs = TimeNodeSet.from_intervals([ (u, b, e, set()) for u in hubs for b, e in hubs[u] ])
 
-        # print("<================ bicore")
-        # print(stream)
+        return stream.substream(hubs, hubs)
 
-        hubs = TimeNodeSet()
+    def _hub_intervals(self, s, b=-np.inf, e=np.inf):
+        """
+            Periods during which each node of s has enough neighbours (as
+            in _hub_times), by node, from a sweep of the events of s: of
+            those overlapping [b, e], at least, for links stored in chunks
+            (see Stream.csr())
+        """
+        csr = s.csr(b, e)
+        thresholds = [ self._threshold(s, u) for u in csr.nodes ]
+        thresholds = np.array([ np.inf if x is None else x for x in thresholds ], dtype=np.float64)
+        ends, rows, begun, _ = csr.sweep(thresholds)
+        return _hubs_of(s.E, csr, ends, rows, begun)
 
-        for u in stream.degrees:
-            # print(f"Node {u}")
-            if u in stream.V["left"]:
-                threshold = self.h
-            if u in stream.V["right"]:
-                threshold = self.a
+    def interior(self, s, X=None, Y=None):
+        """
+            (h,a)-core of s: the fixpoint of find_bicore, computed by peeling.
+            Instead of building the substream of the whole stream on every
+            round, the links are truncated in place, and only the nodes
+            whose links changed in a round are swept in the next one, on
+            their events as updated by the truncations (see _PeelingEvents).
+        """
+        span = _peeling_span(s)
+        ends, incident, pieces, W, events = _peeling_state(s, *span)
+        # The first round sweeps all nodes (on the events of s), and truncates all links
+        self._peel(s, ends, incident, pieces, W, events, set(incident), set(range(len(ends))), self._hub_intervals(s, *span))
 
-            neighbourhood = set()
-            last_t = {}
-
-            for v,t,e_type,label in sorted(stream.degrees[u], key=itemgetter(1)):
-                # print([(v, t, e_type) for v,t, e_type, label in sorted(stream.degrees[u], key=itemgetter(1))])
-                # print(f"linked with {v,t,e_type}")
-                if e_type == 1:
-                    # print(f"We add {t,v} to the neighbourhood.")
-                    neighbourhood.add(v)
-                    last_t[u] = t
-                    last_t[v] = t
-                elif e_type == -1:
-                    # print(f"{u} has {len(neighbourhood)} neighbours.")
-                    if len(neighbourhood) >= threshold:
-                        # print(u, len(neighbourhood), last_t[u], t)
-                        # print(f"We add {u} [{last_t[u]}, {t}] to hubs.")
-                        hubs.add(TimeNode(u, last_t[u], t))
-                        # We have no idea about v's neighbourhood.
-                        # hubs.add(TimeNode(v, last_t[v], t))
-                    # print(f"We remove {t, v} from neighbourhood.")
-                    # print(f"{u}")
-                    neighbourhood.remove(v)
-
-        # print(str([ x for x in hubs]))
-        # print(len(hubs), len(stream.W))
-        subs = stream.substream(hubs, hubs)
-        # print(subs)
-        # print("=========bicore===========/>")
-        return subs
+        return _core_of(s, W, pieces)
 
-    def interior(self, s, X=None, Y=None):
-        # print("Calling INTERIOR") 
-        core_size = 0
-        old_core_size = -1
-        hubs = s
+    def decompose(self, s):
+        """
+            (h,a)-cores of s for a = self.a and all h, as peeled from s in
+            interior(). Returns a BHACoreDecomposition, from which the core
+            for any h is read off.
+
+            Cores of s are not always nested, so the (h+1,a)-core can not
+            be peeled from the (h,a)-core: a link is dropped from a core when
+            the time-nodes of one of its ends are split during it (see
+            Stream.substream), and a node has enough neighbours from the
+            last one that came (see _hub_times), which can be earlier once
+            some of them are dropped. Each core is peeled from s, but the
+            first round of peeling, on the events of s, is carried over from
+            h to h+1: only the hubs with h neighbours at some end of link,
+            and their links, are swept again.
+        """
+        span = _peeling_span(s)
+        ends, incident, pieces, W, _ = _peeling_state(s, *span)
+        decomposition = BHACoreDecomposition(s, self.a, W, pieces)
+        csr = s.csr(*span)
+        hub_rows = np.array([ u in s.V["left"] and u not in s.V["right"] for u in csr.nodes ], dtype=bool)
+
+        # First round of peeling: times of the nodes with enough neighbours in s, and links truncated to them
+        first_W, first_pieces = dict(W), list(pieces)
+        hits = None
+        # Links truncated in the first round, and what changed in the last core
+        truncated, nodes_changed, links_changed = set(), set(), set()
+
+        h = 1
+        while True:
+            core_property = StreamBHACore(self.S, h=h, a=self.a)
+            thresholds = [ core_property._threshold(s, u) for u in csr.nodes ]
+            thresholds = np.array([ np.inf if x is None else x for x in thresholds ], dtype=np.float64)
+            positions, rows, begun, _ = csr.sweep(thresholds)
+
+            # Nodes whose number of ends of links with enough neighbours changed
+            counts = np.bincount(rows, minlength=len(csr.nodes))
+            swept = np.arange(len(csr.nodes)) if hits is None else np.flatnonzero(counts != hits)
+            hits = counts
+            kept = np.isin(rows, swept)
+            hubs = _hubs_of(s.E, csr, positions[kept], rows[kept], begun[kept])
+
+            links = set([ i for i, piece in enumerate(pieces) if piece is not None ]) if h == 1 else set()
+            for u in incident if h == 1 else [ csr.nodes[k] for k in swept.tolist() ]:
+                W_u = _intersect_times(W[u], _merge_times(hubs.get(u, []))) if u in W else []
+                if W_u != first_W.get(u, []):
+                    if len(W_u) == 0:
+                        del first_W[u]
+                    else:
+                        first_W[u] = W_u
+                    links.update(incident.get(u, []))
+                    nodes_changed.add(u)
+            for i in links:
+                x, y = ends[i]
+                cap = _clip_times(x, y, pieces[i][0], pieces[i][1], first_W)
+                if cap != first_pieces[i]:
+                    first_pieces[i] = cap
+                    links_changed.add(i)
+                if cap != pieces[i]:
+                    truncated.add(i)
+                else:
+                    truncated.discard(i)
+
+            # The next rounds, from the nodes of the links truncated in the first one
+            core_W, core_pieces = dict(first_W), list(first_pieces)
+            frontier = set([ u for i in truncated for u in ends[i] ])
+            changed = core_property._peel(s, ends, incident, core_pieces, core_W, {}, frontier, set())
+            decomposition._record(h, core_W, core_pieces, nodes_changed | changed[0], links_changed | changed[1])
+            nodes_changed, links_changed = changed
+
+            # No hub has h neighbours in s, hence in any of its cores for a larger h
+            if not counts[hub_rows].any():
+                break
+            # Nor in the first round, once cores are empty
+            if len(core_W) == 0 and not self._reaches(s, ends, incident, pieces, first_W, h + 1):
+                break
+            h += 1
+
+        return decomposition
+
+    def _reaches(self, s, ends, incident, pieces, W, h):
+        """
+            Whether a hub could have h neighbours at once in a (h',a)-core
+            for h' >= h, given the time-nodes W of the first round of peeling
+            for a smaller h (see decompose): the times of the nodes in the
+            core are within W, those of the hubs only get shorter as h
+            grows, and those of the authorities do not depend on h.
+        """
+        for u in W:
+            if u not in s.V["left"] or u in s.V["right"]:
+                continue
+            events = []
+            for i in incident[u]:
+                x, y = ends[i]
+                v = y if x == u else x
+                if v == u or v not in W:
+                    continue
+                for b, e in _intersect_times(_intersect_times([ pieces[i] ], W[u]), W[v]):
+                    events.extend(((b, 0, v), (e, 1, v)))
+            if len(set([ v for _, _, v in events ])) < h:
+                continue
+
+            # Links during a same instant are there at once
+            present = {}
+            for t, end, v in sorted(events, key=itemgetter(0, 1)):
+                if end == 0:
+                    present[v] = present.get(v, 0) + 1
+                    if len(present) >= h:
+                        return True
+                else:
+                    present[v] -= 1
+                    if present[v] == 0:
+                        del present[v]
+        return False
+
+    def _peel(self, s, ends, incident, pieces, W, events, frontier, links, hubs=None):
+        """
+            Peels the links (pieces), time-nodes (W) and events of s, as built
+            by _peeling_state(), until the nodes of frontier and the links of
+            links, and those they change, satisfy the property. hubs are the
+            periods during which nodes have enough neighbours in s, if known.
+            Returns the nodes and links that changed.
+        """
+        changed_nodes = set()
+        changed_links = set()
+        first_round = True
 
-        while len(self.find_bicore(hubs).W) != old_core_size:
-            # print("IN LOOP")
-            hubs = self.find_bicore(hubs)
-            old_core_size = len(hubs.W)
-        # authorities = self.find_bicore(hubs, threshold=self.a)
+        while len(frontier) > 0:
+            # Rounds are synchronous: all nodes are swept on the links of the last round
+            peeled = {}
+            for u in frontier:
+                threshold = self._threshold(s, u)
+                if u not in W or threshold is None:
+                    peeled[u] = []
+                    continue
 
-        return hubs
+                if first_round and hubs is not None:
+                    peeled[u] = _intersect_times(W[u], _merge_times(hubs.get(u, [])))
+                    continue
+
+                if u not in events:
+                    events[u] = _PeelingEvents(u, incident[u], ends, pieces)
+                peeled[u] = _intersect_times(W[u], events[u].hub_times(threshold))
+
+            for u, W_u in peeled.items():
+                if W_u == W.get(u, []):
+                    continue
+                if len(W_u) == 0:
+                    del W[u]
+                    events.pop(u, None)
+                else:
+                    W[u] = W_u
+                links.update(incident[u])
+                changed_nodes.add(u)
+
+            frontier = set()
+            truncated = {}
+            for i in links:
+                if pieces[i] is None:
+                    continue
+                x, y = ends[i]
+                cap = _clip_times(x, y, pieces[i][0], pieces[i][1], W)
+                if cap != pieces[i]:
+                    for u in { x, y } & events.keys():
+                        truncated.setdefault(u, {})[i] = pieces[i]
+                    pieces[i] = cap
+                    frontier.update((x, y))
+                    changed_links.add(i)
+            for u, old in truncated.items():
+                events[u].update(old, pieces)
+            links = set()
+            first_round = False
+
+        return changed_nodes, changed_links
+
+    def _threshold(self, s, u):
+        """
+            Minimum number of neighbours of u: h for hubs (left nodes), a for authorities (right nodes)
+        """
+        if u in s.V["right"]:
+            return self.a
+        if u in s.V["left"]:
+            return self.h
+        return None
 
 
     def interior_bak(self, s, X=None, Y=None):
@@ -115,7 +621,8 @@ class StreamBHACore(StreamProperty):
                 
             neigh = set()
             last_times = {} # {u: -1 for u in s.degrees}
-            for i in sorted(s.degrees[u], key=itemgetter(1, 2,-3)):
+            # Events are sorted by time, ends first (see Stream.degrees)
+            for i in s.degrees[u]:
                 v, t, ev_type = i[0], i[1], i[2]
                 # First check if the property is true
                 bha_is_true = len(neigh) >= threshold
@@ -137,11 +644,75 @@ class StreamBHACore(StreamProperty):
         
         return s.substream(hub, authority)
         
+class BHACoreDecomposition:
+    """
+        (h,a)-cores of a stream for a given a and all h (see
+        StreamBHACore.decompose), kept as the times of each node and link in
+        the (h,a)-core for the values of h where they change.
+    """
+
+    def __init__(self, s, a, W, pieces):
+        self.S = s
+        self.a = a
+        # Highest h with a non-empty (h,a)-core
+        self.h_max = 0
+        # Changes of the times of each node, and of each link, as (h, times)
+        # sorted by h, starting with their times in s (h = 0)
+        self._nodes = { u: [ (0, W[u]) ] for u in W }
+        self._links = [ [ (0, piece) ] for piece in pieces ]
+
+    def _record(self, h, W, pieces, nodes, links):
+        """
+            Records the (h,a)-core, given as the time-nodes (W) and links
+            (pieces) of the peeling state, where it can differ from the
+            last core recorded: on the given nodes and links
+        """
+        for u in nodes & self._nodes.keys():
+            changes = self._nodes[u]
+            if W.get(u, []) != changes[-1][1]:
+                changes.append((h, W.get(u, [])))
+        for i in links:
+            changes = self._links[i]
+            if pieces[i] != changes[-1][1]:
+                changes.append((h, pieces[i]))
+        if len(W) > 0:
+            self.h_max = h
+
+    def interior(self, h):
+        """
+            Returns the (h,a)-core of the stream
+        """
+        h = max(h, 1)
+        W = dict([ (u, _at(changes, h)) for u, changes in self._nodes.items() ])
+        return _core_of(self.S, W, [ _at(changes, h) for changes in self._links ])
+
+    def core_number(self, u, t):
+        """
+            Returns the highest h such that u is in the (h,a)-core at time t, 0 if there is none
+        """
+        changes = self._nodes.get(u, [])
+        number = 0
+        for k, (h, times) in enumerate(changes):
+            # times are those of u in the cores h to last
+            last = changes[k + 1][0] - 1 if k + 1 < len(changes) else self.h_max
+            if last >= 1 and any([ b <= t <= e for b, e in times ]):
+                number = last
+        return number
+
+def _at(changes, h):
+    """
+        Value at h of a list of (h, value) changes sorted by h
+    """
+    return changes[bisect_right(changes, h, key=_begin) - 1][1]
+
 class StreamStarSat(StreamProperty):
     
     def __init__(self, stream, threshold=3):
         super().__init__(stream)
         self.threshold = threshold
+
+    def key(self):
+        return (type(self), self.threshold)
         
     def interior(self, s):
         """
@@ -149,38 +720,33 @@ class StreamStarSat(StreamProperty):
             @param s: a stream graph
             @return: two TimeNodeSets, each containing the k-stars and k-satellites of s
         """
-        THRESHOLD = self.threshold
-        stars = TimeNodeSet()
-        satellites = TimeNodeSet()
+        csr = s.csr()
+        ends, rows, _, reached = csr.sweep(self.threshold)
+        # A node is a star from the time it reached threshold neighbours to
+        # every end of a link while it has them: only the last end before
+        # it has to reach them again matters
+        last = np.flatnonzero(np.append(reached[1:] != reached[:-1], len(ends) > 0))
+        stars = [ (csr.nodes[i], b, e, set()) for i, b, e in
+                  zip(rows[last].tolist(), _event_times(s.E, csr, reached[last]), _event_times(s.E, csr, ends[last])) ]
 
-        for k, u in enumerate(s.degrees):
-            neigh = set()
-            best_neighs = set()
-            last_times = {} # {u: -1 for u in s.degrees}
-            for i in sorted(s.degrees[u], key=itemgetter(1, 2,-3)):
-                v, t, ev_type = i[0], i[1], i[2]
-                # First check if the property is true
-                starsat_is_true = len(neigh) >= THRESHOLD
+        # Its neighbours present at such an end are its satellites, from the
+        # last time they came (or the star did) to the end. Here as well,
+        # only the last such end of each link before the star reaches
+        # threshold neighbours again matters.
+        begins, link_ends = csr.spans()
+        lo = np.searchsorted(ends, begins, side="right")
+        hi = np.searchsorted(ends, link_ends, side="right")
+        present = hi > lo
+        begins, lo, hi = begins[present], lo[present], hi[present]
+        k, link = _ranges(np.searchsorted(last, lo), np.searchsorted(last, hi - 1))
+        k = np.concatenate((last[k], hi - 1))
+        begins = begins[np.concatenate((link, np.arange(len(hi))))]
 
-                if starsat_is_true:
-                    best_neighs = best_neighs.union(neigh)
+        satellites = [ (csr.nodes[i], b, e, set()) for i, b, e in
+                       zip(csr.neighbour[begins].tolist(), _event_times(s.E, csr, np.maximum(begins, reached[k])),
+                           _event_times(s.E, csr, ends[k])) ]
 
-                if ev_type == 1:
-                    neigh.add(v)
-                    last_times[v] = t
-                    if not starsat_is_true:
-                        # While the property is true (typically, we have degree > THRESHOLD)
-                        # u remains star, so we should not change the times
-                        last_times[u] = t
-                else:
-                    neigh.remove(v)
-                    if starsat_is_true:
-                        stars.add(TimeNode(u, last_times[u], t))
-                        for x in best_neighs:
-                            # min sur le t aussi ? 
-                            satellites.add(TimeNode(x, max(last_times[x], last_times[u]), t))
-                        best_neighs = set()
-        return s.substream(stars, satellites)
+        return s.substream(TimeNodeSet.from_intervals(stars), TimeNodeSet.from_intervals(satellites))
     
     def get_values(self):
         return self.stars, self.sat
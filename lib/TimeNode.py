@@ -1,18 +1,47 @@
-import copy
+from bisect import bisect_left, bisect_right
+from operator import attrgetter, itemgetter
+
+# Canonical node identifiers: equal node names share a single object,
+# and are numbered so that array-based backends can use integer ids.
+_node_ids = {}
+_id_nodes = []
+
+def node_id(u):
+    """
+        Returns the integer id of node u, registering it if needed.
+    """
+    try:
+        return _node_ids[u]
+    except KeyError:
+        _node_ids[u] = len(_id_nodes)
+        _id_nodes.append(u)
+        return _node_ids[u]
+
+def intern_node(u):
+    """
+        Returns the canonical object for node u.
+    """
+    return _id_nodes[node_id(u)]
 
 class TimeNode:
     """
-        For later refactoring
+        A node u over the time interval [b, e].
+        TimeNodes stored in a TimeNodeSet are shared, and should not be modified.
     """
+    __slots__ = ("node", "b", "e", "label", "_interval")
+
     def __init__(self, _node, _b, _e, _label=set()):
-        self.node = _node
+        self.node = intern_node(_node)
         self.b = _b
         self.e = _e
         self.label = _label
+        self._interval = None
 
     @property
     def interval(self):
-        return Interval(self.b, self.e)
+        if self._interval is None:
+            self._interval = Interval(self.b, self.e)
+        return self._interval
         
     def json(self):
         """
@@ -41,6 +70,7 @@ class TimeNode:
         return hash((self.node, self.b, self.e))
 
 class Interval:
+    __slots__ = ("b", "e")
 
     def __init__(self, b, e):
         self.b = b
@@ -98,6 +128,18 @@ class Interval:
         return self.__str__()
 
 class TimeNodeSet:
+    """
+        Set of time-nodes, stored per node as a list of TimeNodes.
+        The intervals of a node are kept sorted by their beginning and
+        pairwise disjoint (overlapping or touching intervals are merged),
+        so that set operations can be done with a single merge sweep.
+
+        The set also maintains an order-independent fingerprint of its
+        elements, used to tell sets apart in O(1) and as their hash.
+
+        Interval lists may be shared between sets (by copy() and union());
+        a set only modifies the lists it owns, and copies the others first.
+    """
 
     def __init__(self, *args):
         """
@@ -116,20 +158,77 @@ class TimeNodeSet:
             raise NotImplementedError("TimeNodeSet can only have 0 or 1 argument.")
 
         self.elements = {}
+        self._fingerprint = 0
+        self._owned = set()
 
         for w in _elements:
             self.add(w)
 
+    @classmethod
+    def from_intervals(cls, intervals):
+        """
+            Builds a set from (node, b, e, label) tuples, in any order and
+            possibly overlapping: they are sorted once per node and merged in
+            a single sweep, instead of being added one at a time. Merged
+            intervals keep the label of the first one.
+        """
+        new = cls()
+
+        by_node = {}
+        for u, b, e, label in intervals:
+            by_node.setdefault(intern_node(u), []).append((b, e, label))
+
+        for u, times in by_node.items():
+            times.sort(key=_begin_end)
+            merged = []
+            for b, e, label in times:
+                if len(merged) > 0 and b <= merged[-1][1]:
+                    if e > merged[-1][1]:
+                        merged[-1][1] = e
+                else:
+                    merged.append([b, e, label])
+            new._set_intervals(u, [ TimeNode(u, b, e, label) for b, e, label in merged ])
+
+        return new
+
     def __iter__(self):
-        for u in self.elements.keys():
-            for intv, label in self.elements[u]:
-                yield TimeNode(u, intv.b, intv.e, label)
+        for u in self.elements:
+            yield from self.elements[u]
 
     def __eq__(self, o):
         """
             Two TimeNodeSets are equal if they contain the same elements
         """
-        return all([x in o for x in self])
+        if not isinstance(o, TimeNodeSet):
+            return all([x in o for x in self]) and len(self) == len(o)
+
+        if self._fingerprint != o._fingerprint:
+            return False
+
+        if self.elements.keys() != o.elements.keys():
+            return False
+
+        return all([ _same_intervals(self.elements[u], o.elements[u]) for u in self.elements ])
+
+    def __hash__(self):
+        return self._fingerprint
+
+    def fingerprint(self):
+        """
+            Returns a canonical fingerprint of the elements of the set:
+            equal sets have equal fingerprints, whatever their construction order.
+        """
+        return self._fingerprint
+
+    def _set_intervals(self, u, intervals, owned=True):
+        """
+            Sets the intervals of a node that is not in the set yet.
+            owned is False if the list is shared with another set.
+        """
+        self.elements[u] = intervals
+        if owned:
+            self._owned.add(u)
+        self._fingerprint = (self._fingerprint + sum(map(hash, intervals))) & _FINGERPRINT_MASK
 
     def json(self):
         """
@@ -141,25 +240,74 @@ class TimeNodeSet:
         return self.elements.keys()
                 
     def add(self, x):
-        
+        """
+            Adds a TimeNode to the set, merging it with the intervals
+            of x.node it overlaps.
+        """
         if not x.node in self.elements:
-            self.elements[x.node] = [ (Interval(x.b, x.e), x.label) ]
+            self._set_intervals(x.node, [ x ])
             return
-        
-        for i in range(0, len(self.elements[x.node])):
-            intv = self.elements[x.node][i][0]
-            b, e = intv.b, intv.e
-
-            if x.interval.included(intv):
-                # All elements are already in the set
-                return
-            intersects, inter_val = x.interval.intersect(intv)
-            if intersects:
-                self.elements[x.node][i] = (x.interval.union(intv), x.label)
-                return
-        # New element, add it
-        self.elements[x.node].append((x.interval, x.label))
+
+        intervals = self.elements[x.node]
+        i, j = _overlap_range(intervals, x.b, x.e)
+
+        if j == i + 1 and intervals[i].b <= x.b and x.e <= intervals[i].e:
+            # All elements are already in the set
+            return
+
+        if not x.node in self._owned:
+            intervals = list(intervals)
+            self.elements[x.node] = intervals
+            self._owned.add(x.node)
+
+        # Absorb all intervals overlapping x
+        b, e = x.b, x.e
+        if j > i:
+            b = min(b, intervals[i].b)
+            e = max(e, intervals[j - 1].e)
+
+        if not (b == x.b and e == x.e):
+            x = TimeNode(x.node, b, e, x.label)
+
+        self._fingerprint = (self._fingerprint + hash(x) - sum(map(hash, intervals[i:j]))) & _FINGERPRINT_MASK
+        intervals[i:j] = [ x ]
     
+    def covers(self, u, t):
+        """
+            Returns True if node u is in the set at time t
+        """
+        if not u in self.elements:
+            return False
+
+        intervals = self.elements[u]
+        i = bisect_left(intervals, t, key=_end)
+
+        return i < len(intervals) and intervals[i].b <= t
+
+    def overlapping(self, u, b, e):
+        """
+            Returns the TimeNodes of node u that overlap [b, e]
+        """
+        if not u in self.elements:
+            return []
+
+        intervals = self.elements[u]
+        i, j = _overlap_range(intervals, b, e)
+
+        return intervals[i:j]
+
+    def __contains__(self, x):
+        """
+            Returns True if the TimeNode x is an element of the set
+        """
+        if not x.node in self.elements:
+            return False
+
+        intervals = self.elements[x.node]
+        i = bisect_left(intervals, x.b, key=_begin)
+
+        return i < len(intervals) and intervals[i].b == x.b and intervals[i].e == x.e
+
     def intersection(self, x):
         """
             Intersection of two TimeNodeSets.
@@ -169,25 +317,10 @@ class TimeNodeSet:
         for node in self.elements:
             if node in x.elements:
                 # Otherwise cannot be in intersection
-                # Merge the two Intervals list (what about labels... ?)
-                for i, label in self.elements[node]:
-                    for j, label in x.elements[node]:
-
-                        if i.included(j):
-                            new_x = TimeNode(node, i.b, i.e, label)
-                            intersection_set.add(new_x)
-                            continue
-                        elif j.included(i):
-                            new_x = TimeNode(node, j.b, j.e, label)
-                            intersection_set.add(new_x)
-                            continue
-
-                        intersects, inter_val = i.intersect(j)
-                        if intersects:
-                            new_x = TimeNode(node, inter_val.b, inter_val.e, label)
-                            intersection_set.add(new_x)
-                        # No else, if there is no intersection nor inclusion,
-                        # then it's not in the intersection :)
+                cap = _intersect_intervals(self.elements[node], x.elements[node])
+                if len(cap) > 0:
+                    intersection_set._set_intervals(node, cap)
+
         return intersection_set
 
     def union(self, x):
@@ -195,59 +328,71 @@ class TimeNodeSet:
             Union of two TimeNodeSets.
         """
         union_set = TimeNodeSet()
-        
-        keys = set(list(self.elements.keys()) + list(x.elements.keys()))
 
-        for node in keys:
+        for node in self.elements:
             if node in x.elements:
-                cur_set = x
-                other_set = self
+                union_set._set_intervals(node, _union_intervals(self.elements[node], x.elements[node]))
             else:
-                cur_set = self
-                other_set = x
-            
-            if not node in cur_set.elements:
-                union_set.elements[node] = other_set.elements[node]
-            elif not node in other_set.elements:
-                union_set.elements[node] = cur_set.elements[node]
-            else:
-                for i, label in cur_set.elements[node]:
-                    for j, label in other_set.elements[node]:
-
-                        union_val = i.union(j)
-                        if type(union_val) is tuple:
-                            # Union is disjoint
-                            new_x = TimeNode(node, union_val[0].b, union_val[0].e, label)
-                            new_x2 = TimeNode(node, union_val[1].b, union_val[1].e, label)
-                            union_set.add(new_x)
-                            union_set.add(new_x2)
-                            break
-                        else:
-                            new_x = TimeNode(node, union_val.b, union_val.e, label)
-                            union_set.add(new_x)
-                            break
-                        # No else case, if there is nor intersection nor inclusion,
-                        # then it's not in the intersection :)
+                union_set._set_intervals(node, self.elements[node], owned=False)
+                self._owned.discard(node)
+
+        for node in x.elements:
+            if not node in self.elements:
+                union_set._set_intervals(node, x.elements[node], owned=False)
+                if isinstance(x, TimeNodeSet):
+                    x._owned.discard(node)
 
         return union_set
 
+    def difference(self, x):
+        """
+            Difference of two TimeNodeSets: elements of self not in x.
+            Intervals are closed, so a time-node cut by x keeps the
+            boundaries it shares with x.
+        """
+        difference_set = TimeNodeSet()
+
+        for node in self.elements:
+            if node in x.elements:
+                diff = _difference_intervals(self.elements[node], x.elements[node])
+            else:
+                difference_set._set_intervals(node, self.elements[node], owned=False)
+                self._owned.discard(node)
+                continue
+
+            if len(diff) > 0:
+                difference_set._set_intervals(node, diff)
+
+        return difference_set
+
+    def issubset(self, x):
+        """
+            Returns True if every element of self is covered by x
+        """
+        return len(self.difference(x)) == 0
+
+    def duration(self):
+        """
+            Total duration of the elements of the set
+        """
+        return sum(( x.e - x.b for x in self ))
+
     def copy(self):
+        """
+            Returns a copy of the set, sharing its interval lists
+            until either set modifies them.
+        """
         new = TimeNodeSet()
-        new.elements = copy.deepcopy(self.elements)
+        new.elements = dict(self.elements)
+        new._fingerprint = self._fingerprint
+        self._owned = set()
         return new
 
     def __len__(self):
-        return len(list(self.values()))
+        return sum(( len(intervals) for intervals in self.elements.values() ))
 
-    # @property
     def values(self):
-        values = []
-        for w in self.elements:
-            for i in self.elements[w]:
-                # values.append(TimeNode(w, i[0].b, i[0].e, set()))
-                yield TimeNode(w, i[0].b, i[0].e, set())
-    # Define iter and next properly
-    # def __iter__(self):
+        return self.__iter__()
 
     
     def __str__(self):
@@ -258,3 +403,133 @@ class TimeNodeSet:
     def __repr__(self):
         return str(self.__str__())
 
+
+_FINGERPRINT_MASK = (1 << 64) - 1
+
+def _same_intervals(i_list, j_list):
+    """
+        Returns True if two lists of TimeNodes have the same intervals
+    """
+    return len(i_list) == len(j_list) and all([ x.b == y.b and x.e == y.e for x, y in zip(i_list, j_list) ])
+
+_begin = attrgetter("b")
+_begin_end = itemgetter(0, 1)
+_end = attrgetter("e")
+
+def _overlap_range(intervals, b, e):
+    """
+        Returns the range [i, j) of the sorted disjoint TimeNodes overlapping [b, e].
+        As intervals are disjoint, they are sorted by their ends too.
+    """
+    return bisect_left(intervals, b, key=_end), bisect_right(intervals, e, key=_begin)
+
+def _intersect_intervals(i_list, j_list):
+    """
+        Intersection of two sorted lists of disjoint TimeNodes of the
+        same node, in a single sweep. Labels are taken from j_list.
+    """
+    if len(i_list) * 8 < len(j_list):
+        # Much shorter list, look up its intervals in the other one
+        return _intersect_lookup(i_list, j_list)
+
+    cap = []
+    i, j = 0, 0
+
+    while i < len(i_list) and j < len(j_list):
+        x_i = i_list[i]
+        x_j = j_list[j]
+
+        b = max(x_i.b, x_j.b)
+        e = min(x_i.e, x_j.e)
+        if b == x_j.b and e == x_j.e:
+            cap.append(x_j)
+        elif b <= e:
+            cap.append(TimeNode(x_j.node, b, e, x_j.label))
+
+        # Advance the interval ending first, it cannot meet anything else
+        if x_i.e < x_j.e:
+            i += 1
+        elif x_j.e < x_i.e:
+            j += 1
+        else:
+            i += 1
+            j += 1
+
+    return cap
+
+def _intersect_lookup(i_list, j_list):
+    """
+        Same as _intersect_intervals, but in O(len(i_list) * log(len(j_list))).
+    """
+    cap = []
+
+    for x_i in i_list:
+        i, j = _overlap_range(j_list, x_i.b, x_i.e)
+        for x_j in j_list[i:j]:
+            b = max(x_i.b, x_j.b)
+            e = min(x_i.e, x_j.e)
+            if b == x_j.b and e == x_j.e:
+                cap.append(x_j)
+            else:
+                cap.append(TimeNode(x_j.node, b, e, x_j.label))
+
+    return cap
+
+def _union_intervals(i_list, j_list):
+    """
+        Union of two sorted lists of disjoint TimeNodes of the same node,
+        in a single sweep. Merged intervals keep the label of the first one.
+    """
+    cup = []
+    i, j = 0, 0
+
+    while i < len(i_list) or j < len(j_list):
+        if j == len(j_list) or (i < len(i_list) and i_list[i].b <= j_list[j].b):
+            x = i_list[i]
+            i += 1
+        else:
+            x = j_list[j]
+            j += 1
+
+        if len(cup) > 0 and x.b <= cup[-1].e:
+            last = cup[-1]
+            if x.e > last.e:
+                cup[-1] = TimeNode(last.node, last.b, x.e, last.label)
+        else:
+            cup.append(x)
+
+    return cup
+
+def _difference_intervals(i_list, j_list):
+    """
+        Difference of two sorted lists of disjoint TimeNodes of the same
+        node, in a single sweep. Zero-length intervals of j_list only remove
+        zero-length intervals.
+    """
+    diff = []
+    j = 0
+
+    for x in i_list:
+        # j_list intervals ending before x cannot cut later intervals either
+        while j < len(j_list) and j_list[j].e < x.b:
+            j += 1
+
+        cur = x.b
+        cut = False
+        k = j
+        while k < len(j_list) and j_list[k].b <= x.e:
+            cut_x = j_list[k]
+            k += 1
+            if cut_x.b == cut_x.e and x.b != x.e:
+                continue
+            if cur < cut_x.b:
+                diff.append(TimeNode(x.node, cur, cut_x.b, x.label))
+            cur = max(cur, cut_x.e)
+            cut = True
+
+        if not cut:
+            diff.append(x)
+        elif cur < x.e:
+            diff.append(TimeNode(x.node, cur, x.e, x.label))
+
+    return diff
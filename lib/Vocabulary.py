@@ -0,0 +1,87 @@
+class Vocabulary:
+    """
+        Interns the labels of a stream: each label gets an integer id, and
+        each set of labels is stored once, as a frozenset shared by all the
+        links carrying it, along with the sorted ids of its labels. Bitmasks
+        of label sets (bit i set if the label of id i is in the set) are only
+        built when asked for, as they are as wide as the vocabulary.
+    """
+
+    def __init__(self, labels=[]):
+        # label -> id, and id -> label
+        self.ids = {}
+        self.labels = []
+        # label set -> (canonical frozenset, sorted ids of its labels)
+        self._sets = {}
+
+        for x in labels:
+            self.id(x)
+
+    def id(self, label):
+        """
+            Returns the id of a label, adding it to the vocabulary if needed.
+        """
+        try:
+            return self.ids[label]
+        except KeyError:
+            self.ids[label] = len(self.labels)
+            self.labels.append(label)
+            return self.ids[label]
+
+    def intern(self, labels):
+        """
+            Returns the canonical frozenset holding the given labels.
+        """
+        labels = frozenset(labels)
+        try:
+            return self._sets[labels][0]
+        except KeyError:
+            ids = tuple(sorted([ self.id(x) for x in labels ]))
+            canonical = frozenset([ self.labels[i] for i in ids ])
+            self._sets[canonical] = (canonical, ids)
+            return canonical
+
+    def label_ids(self, labels):
+        """
+            Returns the sorted ids of a set of labels, adding them to the vocabulary if needed.
+        """
+        try:
+            return self._sets[labels][1]
+        except (KeyError, TypeError):
+            return self._sets[self.intern(labels)][1]
+
+    def mask(self, labels):
+        """
+            Returns the bitmask of a set of labels, adding them to the vocabulary if needed.
+        """
+        mask = 0
+        for i in self.label_ids(labels):
+            mask |= 1 << i
+        return mask
+
+    def query(self, labels):
+        """
+            Returns the bitmask of a set of labels without adding them to
+            the vocabulary, or None if one of them is not in it (so that no
+            label set of the stream contains them).
+        """
+        mask = 0
+        for x in labels:
+            if x not in self.ids:
+                return None
+            mask |= 1 << self.ids[x]
+        return mask
+
+    def decode(self, mask):
+        """
+            Returns the set of labels of a bitmask
+        """
+        labels = set()
+        while mask:
+            low = mask & -mask
+            labels.add(self.labels[low.bit_length() - 1])
+            mask ^= low
+        return labels
+
+    def __len__(self):
+        return len(self.labels)
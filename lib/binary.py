@@ -0,0 +1,57 @@
+import os
+import ujson as json
+import numpy as np
+
+FORMAT_VERSION = 1
+
+def write_arrays(path, meta, arrays):
+    """
+        Writes a directory holding meta.json, a JSON description, and one
+        .npy file per array, that can be memory-mapped by read_arrays().
+    """
+    os.makedirs(path, exist_ok=True)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(array))
+
+    meta = dict(meta, format=FORMAT_VERSION, arrays=sorted(arrays))
+    with open(os.path.join(path, "meta.json"), "w") as fp:
+        json.dump(meta, fp)
+
+def read_arrays(path, mmap_mode="r"):
+    """
+        Reads a directory written by write_arrays(). Arrays are
+        memory-mapped (read-only by default), so they are only read from
+        disk when accessed, and their pages are shared between processes.
+    """
+    with open(os.path.join(path, "meta.json")) as fp:
+        meta = json.load(fp)
+
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported binary stream format {meta.get('format')}")
+
+    arrays = { name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+               for name in meta["arrays"] }
+
+    return meta, arrays
+
+def pack_sets(sets, ids=None):
+    """
+        Packs a list of sets (or lists) as the offsets and concatenated ids
+        of their elements. ids maps elements to integers, if they are not.
+    """
+    offsets = np.zeros(len(sets) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([ len(x) for x in sets ])
+    if ids is None:
+        values = np.array([ x for s in sets for x in s ], dtype=np.int64)
+    else:
+        values = np.array([ ids[x] for s in sets for x in s ], dtype=np.int64)
+
+    return offsets, values
+
+def unpack_sets(offsets, values, elements):
+    """
+        Reverse of pack_sets: returns the list of sets, as frozensets of elements
+    """
+    return [ frozenset([ elements[x] for x in values[offsets[i]:offsets[i + 1]].tolist() ])
+             for i in range(len(offsets) - 1) ]
@@ -0,0 +1,130 @@
+import json
+import ujson
+
+CHUNK_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+
+def iter_stream(filepath, chunk_size=CHUNK_SIZE):
+    """
+        Reads a stream file incrementally, without loading the whole document.
+        Yields ("link", l) for each link of E as soon as it is parsed, and
+        (key, value) for the other entries of the document (T, V, I...).
+
+        Files ending in .ndjson or .jsonl hold one JSON object per line:
+        either a link, or an object holding some of the other entries.
+    """
+    with open(filepath) as fp:
+        if str(filepath).endswith((".ndjson", ".jsonl")):
+            yield from _iter_ndjson(fp)
+        else:
+            yield from _iter_document(fp, chunk_size)
+
+def _iter_ndjson(fp):
+    for line in fp:
+        line = line.strip()
+        if line == "":
+            continue
+
+        obj = ujson.loads(line)
+        if "u" in obj and "v" in obj:
+            yield "link", obj
+            continue
+
+        for key, value in obj.items():
+            if key == "E":
+                for l in value:
+                    yield "link", l
+            else:
+                yield key, value
+
+def _iter_document(fp, chunk_size):
+    buf = _Buffer(fp, chunk_size)
+
+    buf.expect("{")
+    if buf.peek() == "}":
+        return
+
+    while True:
+        key = buf.value()
+        buf.expect(":")
+
+        if key == "E":
+            # Links are parsed one at a time
+            buf.expect("[")
+            if buf.peek() != "]":
+                while True:
+                    yield "link", buf.value()
+                    if buf.peek() != ",":
+                        break
+                    buf.pos += 1
+            buf.expect("]")
+        else:
+            yield key, buf.value()
+
+        if buf.peek() != ",":
+            break
+        buf.pos += 1
+
+    buf.expect("}")
+
+class _Buffer:
+    """
+        Window on a text file, read by chunks, from which JSON values are parsed
+    """
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """
+            Reads more text, at least as much as is left to parse, so that
+            a value spanning several chunks is parsed a logarithmic number of
+            times. Returns False at the end of the file.
+        """
+        chunk = self.fp.read(max(self.chunk_size, len(self.text) - self.pos))
+        if chunk == "":
+            self.eof = True
+            return False
+
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+            Returns the next non-whitespace character, or "" at the end of the file
+        """
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, c):
+        if self.peek() != c:
+            raise ValueError(f"Invalid stream file: expected '{c}' at '{self.text[self.pos:self.pos + 20]}'")
+        self.pos += 1
+
+    def value(self):
+        """
+            Parses the next JSON value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                # A value ending with the text (e.g. a number) may go on in the file
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
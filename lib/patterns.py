@@ -6,7 +6,10 @@ from lib.errors import *
 import copy
 import ujson as json
 import sys
+import numpy as np
 from operator import itemgetter
+from functools import reduce
+from collections import OrderedDict
 
 import networkx as nx
 
@@ -28,16 +31,25 @@ class Pattern:
         """
             Returns the intent of a pattern
         """
-        
-        langs = [ self.support_set.label(x) for x in self.support_set.W.values() if len(self.support_set.label(x)) > 0 ]
+        S = self.support_set
+        label_sets = [ labels for _, labels in S.label_sets(S.W) if len(labels) > 0 ]
 
-        if langs == []:
-            langs = [set()]
-        return set.intersection(*langs)
+        if label_sets == []:
+            return set()
+        return set(frozenset.intersection(*label_sets))
 
-    def extent(self, S=None):
+    def links(self, S, within=(None, None)):
+        """
+            Returns the indices of the links of S whose left labels, and of
+            the links whose right labels, contain the pattern. within restricts
+            the search to given links, e.g. those of a subpattern.
         """
-            Returns the extent (support set) of a pattern in a stream S
+        return S.links_with(self.lang, "left", within[0]), S.links_with(self.lang, "right", within[1])
+
+    def extent(self, S=None, within=(None, None)):
+        """
+            Returns the extent (support set) of a pattern in a stream S.
+            within: see links()
         """
         q = self.lang
         
@@ -46,8 +58,13 @@ class Pattern:
         # else:
             # S = (S.E, S.E)
             
-        X1 = [ TimeNode(x["u"], x["b"], x["e"], _label=set(x["label"]["left"])) for x in S.E if q.issubset(set(x["label"]["left"]))]
-        X2 = [ TimeNode(x["v"], x["b"], x["e"], _label=set(x["label"]["right"])) for x in S.E if q.issubset(set(x["label"]["right"]))]
+        links_left, links_right = self.links(S, within)
+        E = S.E
+        if isinstance(E, LinkTable):
+            return E.timenodes(np.array(links_left, dtype=np.int64), np.array(links_right, dtype=np.int64), S.W_class)
+
+        X1 = [ TimeNode(E[i]["u"], E[i]["b"], E[i]["e"], _label=set(E[i]["label"]["left"])) for i in links_left ]
+        X2 = [ TimeNode(E[i]["v"], E[i]["b"], E[i]["e"], _label=set(E[i]["label"]["right"])) for i in links_right ]
         
         X = X1 + X2
         X = TimeNodeSet(X)
@@ -125,20 +142,27 @@ class BiPattern:
         """
             Returns the intent of a pattern
         """
-        
-        langs_left = [ self.support_set.label(x) for x in self.support_set.W.values() if x.node in self.support_set.V["left"] ]
-        langs_right = [ self.support_set.label(x) for x in self.support_set.W.values() if x.node in self.support_set.V["right"] ]
-        
-        if langs_left == []:
-            langs_left = [set()]
-        if langs_right == []:
-            langs_right = [set()]
+        S = self.support_set
+        label_sets = S.label_sets(S.W)
+        left = [ labels for x, labels in label_sets if x.node in S.V["left"] ]
+        right = [ labels for x, labels in label_sets if x.node in S.V["right"] ]
 
-        return { "left": set.intersection(*langs_left), "right": set.intersection(*langs_right) }
+        return { "left": set(frozenset.intersection(*left)) if len(left) > 0 else set(),
+                 "right": set(frozenset.intersection(*right)) if len(right) > 0 else set() }
 
-    def extent(self, S=None):
+    def links(self, S, within=(None, None)):
         """
-            Returns the extent (support set) of a pattern in a stream S
+            Returns the indices of the links of S whose left labels contain
+            the left part of the pattern, and of the links whose right labels
+            contain its right part. within restricts the search to given links,
+            e.g. those of a subpattern.
+        """
+        return S.links_with(self.lang["left"], "left", within[0]), S.links_with(self.lang["right"], "right", within[1])
+
+    def extent(self, S=None, within=(None, None)):
+        """
+            Returns the extent (support set) of a pattern in a stream S.
+            within: see links()
         """
         q = self.lang
         
@@ -148,8 +172,13 @@ class BiPattern:
             # if len(q["right"]) > 0 and len(x["label"]["right"]) > 0:
                 # assert(list(q["right"])[0][0] == list(x["label"]["right"])[0][0])
 
-        X1 = [ TimeNode(x["u"], x["b"], x["e"]) for x in S.E if q["left"].issubset(set(x["label"]["left"]))]
-        X2 = [ TimeNode(x["v"], x["b"], x["e"]) for x in S.E if q["right"].issubset(set(x["label"]["right"]))]
+        links_left, links_right = self.links(S, within)
+        E = S.E
+        if isinstance(E, LinkTable):
+            return E.timenodes(np.array(links_left, dtype=np.int64), np.array(links_right, dtype=np.int64), S.W_class)
+
+        X1 = [ TimeNode(E[i]["u"], E[i]["b"], E[i]["e"]) for i in links_left ]
+        X2 = [ TimeNode(E[i]["v"], E[i]["b"], E[i]["e"]) for i in links_right ]
         
         X = X1 + X2
         X = TimeNodeSet(X)
@@ -177,33 +206,56 @@ def generic_interior(s, X1, X2,  patterns=set()):
     """
         Slower, but works for any property that defines p_1 and p2
         Use it if the property has no self defined interior function.
+
+        p1 and p2 are evaluated on every node of the substream induced by X1
+        and X2, then again on the substream induced by the TimeNodes for
+        which they hold, until these no longer change. After the first
+        round, only the nodes on which a change may have an effect (see
+        StreamProperty.affected) are evaluated again.
     """
-    stsa = s.core_property
-        
-    S1 = TimeNodeSet()
-    S2 = TimeNodeSet()
+    S1, S2, _ = _generic_core(s, X1, X2)
+    return S1, S2
+
+def _generic_core(s, X1, X2):
+    """
+        Same as generic_interior, also returning the last substream it
+        evaluated p1 and p2 on: its links are truncated at each round, as
+        in the interior functions of the properties.
+    """
+    prop = s.core_property
+
+    # (b, e) of the TimeNodes of each node for which p1 (resp. p2) holds
+    S1 = {}
+    S2 = {}
 
     substream = s.substream(X1, X2)
-    nodes = set(substream.V) # set( list(X1.nodes()) +  list(X2.nodes()) )
-
-    while 1:
-        old_S1 = S1
-        old_S2 = S2
-        for u in nodes:
-            p1_true, tmp = stsa.p1(u, substream)
-            p2_true, tmp2 = stsa.p2(u, substream)
-
-            if p1_true:
-                for x in tmp:
-                    S1.add(x)
-            if p2_true:
-                for x in tmp2:
-                    S2.add(x)
-        
-        if S1 == old_S1 or S2 == old_S2:
+    dirty = set(substream.W.nodes())
+
+    while len(dirty) > 0:
+        changed = set()
+        for u in dirty:
+            p1_true, tmp = prop.p1(u, substream)
+            p2_true, tmp2 = prop.p2(u, substream)
+            times1 = [ (x.b, x.e) for x in tmp ] if p1_true else []
+            times2 = [ (x.b, x.e) for x in tmp2 ] if p2_true else []
+
+            if times1 != S1.get(u) or times2 != S2.get(u):
+                changed.add(u)
+            S1[u] = times1
+            S2[u] = times2
+
+        if len(changed) == 0:
             break
 
-    return S1, S2
+        # Nodes are affected by changes through the links they lose
+        dirty = prop.affected(changed, substream)
+        substream = substream.substream(_time_nodes(S1), _time_nodes(S2))
+        dirty.intersection_update(substream.W.nodes())
+
+    return _time_nodes(S1), _time_nodes(S2), substream
+
+def _time_nodes(S):
+    return TimeNodeSet.from_intervals([ (u, b, e, set()) for u in S for b, e in S[u] ])
 
 def interior(s):
     """
@@ -211,7 +263,52 @@ def interior(s):
         or will default to the generic algorithm if there is no such function
     """
     prop = s.core_property
-    return prop.interior(s)
+    if hasattr(prop, "interior"):
+        return prop.interior(s)
+
+    return _generic_core(s, s.W, s.W)[2]
+
+class InteriorCache:
+    """
+        Interiors of streams (see interior()), keyed by the signature of
+        the stream (see Stream.signature) and the parameters of its core
+        property (see StreamProperty.key), so that identical substreams met
+        in different branches of the enumeration are only reduced once.
+        Streams themselves are not kept: two streams with the same signature
+        are taken to be the same.
+
+        Only the maxsize most recently used interiors are kept, so the cache
+        holds at most maxsize interiors, each a view on the links of the
+        root stream (its W and the times of its links, and its own links if
+        they were read). hits and misses count the lookups that found an
+        interior, and those that computed it.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._interiors = OrderedDict()
+
+    def interior(self, s):
+        """
+            Returns the interior of s, computing it if it is not in the cache
+        """
+        key = (s.signature(), s.core_property.key())
+        if key in self._interiors:
+            self.hits += 1
+            self._interiors.move_to_end(key)
+            return self._interiors[key]
+
+        self.misses += 1
+        S = interior(s)
+        self._interiors[key] = S
+        while len(self._interiors) > self.maxsize:
+            self._interiors.popitem(last=False)
+        return S
+
+    def __len__(self):
+        return len(self._interiors)
 
 def check_patterns(pattern_list):
     """
@@ -266,9 +363,11 @@ def load_patterns(filepath, bipartite=False, bipatterns=False):
 
     return patterns_list
 
-def bipatterns(stream, s=2):
+def bipatterns(stream, s=2, window=None, cache=None):
     """
-        Enumerates all bipatterns
+        Enumerates all bipatterns, or those of the period window = (b, e)
+        only (see Stream.window). Interiors are looked up in cache, an
+        InteriorCache (a new one if None).
     """
 
     # Check that stream can enumerate monopatterns
@@ -276,20 +375,31 @@ def bipatterns(stream, s=2):
         raise ValueError("The stream is not formatted for bipattern enumeration. Make sure that the language description (stream.I) is a dictionary containing lists, likes so: {'left': ..., 'right':...}.")
         sys.exit()
 
+    caller = stream
+    if window is not None:
+        stream = stream.window(*window)
+
     stream.EL = set()
     stream.pattern_list = []
+    stream.interior_cache = InteriorCache() if cache is None else cache
     # S = interior(self, _top, _bot, set())
-    S = stream.core_property.interior(stream)
+    S = stream.interior_cache.interior(stream)
 #     pattern = Pattern(set(), S)
     pattern = BiPattern({ "left": set(), "right": set() }, S)
     pattern.lang = pattern.intent() # Pattern(stream.intent([stream.label(x) for x in stream.W.values()]),S)
     enum(stream, pattern, set(), min_support_size=s, glob_stream=stream, patternClass=BiPattern)
+    # Results are read off the given stream, not its window
+    caller.EL = stream.EL
+    caller.pattern_list = stream.pattern_list
+    caller.interior_cache = stream.interior_cache
     
     return stream.pattern_list
 
-def patterns(stream, s=2):  
+def patterns(stream, s=2, window=None, cache=None):  
     """
-        Enumerates all patterns
+        Enumerates all patterns, or those of the period window = (b, e)
+        only (see Stream.window). Interiors are looked up in cache, an
+        InteriorCache (a new one if None).
     """
 
     # Check that stream can enumerate monopatterns
@@ -297,14 +407,23 @@ def patterns(stream, s=2):
         raise ValueError("The stream is not formatted for pattern enumeration. Make sure that the language description (stream.I) is a single list.")
         sys.exit()
 
+    caller = stream
+    if window is not None:
+        stream = stream.window(*window)
+
     stream.EL = set()
     excl_list = set()
     stream.pattern_list = []
+    stream.interior_cache = InteriorCache() if cache is None else cache
     # S = interior(self, _top, _bot, set())
-    S = stream.core_property.interior(stream)
+    S = stream.interior_cache.interior(stream)
     pattern = Pattern(set(), S)
     pattern.lang = pattern.intent() # Pattern(stream.intent([stream.label(x) for x in stream.W.values()]),S)
     enum(stream, pattern, set(), min_support_size=s, glob_stream=stream, patternClass=Pattern)
+    # Results are read off the given stream, not its window
+    caller.EL = stream.EL
+    caller.pattern_list = stream.pattern_list
+    caller.interior_cache = stream.interior_cache
 
     return stream.pattern_list
     
@@ -355,6 +474,9 @@ def enum(stream, pattern, excl_list=set(), depth=0, min_support_size=2, parent=s
     
     # bak variables are necessary so that deeper recursion levels do not modify the current object
     pattern_bak = pattern.copy()
+
+    # Links of the stream carrying q: the extents of the candidates are among them
+    links_q = pattern.links(stream)
     # for x, side in sorted(candidates, key=sort_crit(itemgetter(0))):
     for x, side in candidates:
         # S is not reduced between candidates at the same level of the search tree
@@ -371,7 +493,7 @@ def enum(stream, pattern, excl_list=set(), depth=0, min_support_size=2, parent=s
         
         # Support set (extent) of q_x
         # print(f"Getting extent of {pattern_x.lang}")
-        X = pattern_x.extent(S=stream)
+        X = pattern_x.extent(S=stream, within=links_q)
         # print(f"{pattern_x.lang} has extent {list(X)}")
         S_x = (X.intersection(stream.W).copy(), X.intersection(stream.W).copy())
 
@@ -384,7 +506,7 @@ def enum(stream, pattern, excl_list=set(), depth=0, min_support_size=2, parent=s
 
         # Compute the new interior
         # print(f"Getting interior of {pattern_x.lang}")
-        S_x = subs.core_property.interior(subs)
+        S_x = glob_stream.interior_cache.interior(subs)
         # print(S_x.I)
         # print(f"s_x size is {len(S_x.W)}")
         
@@ -3,6 +3,7 @@
 import ujson as json
 import math
 import sys
+import os
 
 from lib.Stream import BipartiteStream
 from lib.StreamProperties import *
@@ -15,8 +16,12 @@ DELTA = 3600
 
 data_file = sys.argv[1]
 
-s = BipartiteStream()
-s.readStream(data_file)
+if os.path.isdir(data_file):
+    # Stream saved with Stream.save_binary()
+    s = BipartiteStream.open_mmap(data_file)
+else:
+    s = BipartiteStream()
+    s.readStream(data_file)
 core_property = StreamStarSat(s, threshold=30)
 s.setCoreProperty(core_property)
 
@@ -0,0 +1,99 @@
+import pytest
+
+from lib.TimeNode import TimeNode, TimeNodeSet
+from lib.BitsetTimeNode import BitsetTimeNodeSet
+from lib.Stream import Stream
+from lib.StreamProperties import StreamStarSat
+from lib.patterns import interior
+
+
+class TestBitsetTimeNodeSet:
+
+    def test_len(self):
+        W = BitsetTimeNodeSet()
+        assert(len(W) == 0)
+
+    def test_add_existing(self):
+        W = BitsetTimeNodeSet([TimeNode("u", 1, 3)])
+        W.add(TimeNode("u", 3, 4))
+
+        expected = BitsetTimeNodeSet([TimeNode("u", 1, 4)])
+
+        assert(W == expected and len(W) == 1)
+
+    def test_slots(self):
+        W = BitsetTimeNodeSet.slots(20, alpha=100)([TimeNode("u", 110, 150)])
+
+        assert(list(W.values()) == [TimeNode("u", 100, 160)])
+        assert(W.duration() == 60)
+
+    def test_fingerprint(self):
+        W = BitsetTimeNodeSet([TimeNode("u", 1, 3), TimeNode("u", 3, 4), TimeNode("v", 6, 8)])
+        W = W.difference(BitsetTimeNodeSet([TimeNode("v", 7, 8)]))
+
+        assert(W.fingerprint() == TimeNodeSet([TimeNode("u", 1, 4), TimeNode("v", 6, 7)]).fingerprint())
+
+    def test_set_intersection(self):
+        W = BitsetTimeNodeSet([
+                TimeNode("u", 2, 4)
+            ])
+        W2 = BitsetTimeNodeSet([
+                TimeNode("u", 3, 5),
+                TimeNode("v", 1, 6)
+            ])
+
+        expected = BitsetTimeNodeSet([
+                TimeNode("u", 3, 4)
+            ])
+
+        assert(W.intersection(W2) == expected)
+
+    def test_set_disjoint_union(self):
+        W = BitsetTimeNodeSet([
+                TimeNode("u", 2, 4)
+            ])
+        W2 = BitsetTimeNodeSet([
+                TimeNode("u", 5, 7)
+            ])
+
+        expected = BitsetTimeNodeSet([
+                TimeNode("u", 2, 4),
+                TimeNode("u", 5, 7)
+            ])
+
+        assert(W.union(W2) == expected and len(W.union(W2)) == 2)
+
+    def test_set_difference(self):
+        W = BitsetTimeNodeSet([
+                TimeNode("u", 1, 10)
+            ])
+        W2 = TimeNodeSet([
+                TimeNode("u", 3, 5)
+            ])
+
+        expected = BitsetTimeNodeSet([
+                TimeNode("u", 1, 3),
+                TimeNode("u", 5, 10)
+            ])
+
+        assert(W.difference(W2) == expected and W.difference(W2).duration() == 7)
+
+    def test_covers(self):
+        W = BitsetTimeNodeSet([TimeNode("u", 1, 3)])
+
+        assert(W.covers("u", 2) and not W.covers("u", 3))
+
+    def test_discrete_stream_interior(self):
+        s = Stream()
+        s.setCoreProperty(StreamStarSat(s, threshold=2))
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json", time_step=1)
+
+        int_val = interior(s)
+
+        assert(isinstance(int_val.W, BitsetTimeNodeSet))
+        assert(int_val.W == s.W_class([
+                TimeNode("u", 1, 4),
+                TimeNode("v", 1, 4),
+                TimeNode("x", 1, 3),
+                TimeNode("y", 2, 4)
+            ]))
@@ -0,0 +1,128 @@
+import pytest
+import io
+import numpy as np
+
+from lib.TimeNode import TimeNode, TimeNodeSet
+from lib.LinkTable import LinkTable
+from lib.ChunkedLinkTable import ChunkedLinkTable
+from lib.StreamCSR import StreamCSR
+from lib.Stream import Stream, BipartiteStream, ChunkedStream
+from lib.StreamProperties import StreamStarSat, StreamBHACore
+from lib.patterns import patterns
+
+
+class TestChunkedLinkTable:
+
+    @pytest.fixture
+    def test_stream(self):
+        s = Stream(_fp=io.StringIO())
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+        return s
+
+    def test_links_view(self, test_stream):
+        s = test_stream
+        E = ChunkedLinkTable.chunks(2)(s.E)
+
+        assert(len(E) == len(s.E) and E == s.E)
+        assert(E[-1] == s.E[-1] and E[1:] == s.E[1:])
+        assert(ChunkedLinkTable.chunks(2) is type(E) and len(E._chunks) > 1)
+
+    def test_links_between(self, test_stream):
+        s = test_stream
+        E = ChunkedLinkTable.chunks(2)(s.E)
+
+        for b, e in [(0, 1), (2, 4), (4.5, 5), (6, 9)]:
+            assert(E.links_between(b, e) == [ i for i, l in enumerate(s.E) if l["b"] <= e and l["e"] >= b ])
+        assert(len(E.overlapping(6, 9)) < len(E._chunks))
+
+    def test_link_table(self, test_stream):
+        s = test_stream
+        E = ChunkedLinkTable.chunks(2)(s.E)
+        table = LinkTable(s.E)
+
+        assert(isinstance(E, LinkTable) and E.n == table.n)
+        assert(E.nodes == table.nodes and E.labels == table.labels)
+        assert(all([ (getattr(E, col)[:E.n] == getattr(table, col)[:table.n]).all() for col in ("u", "v", "b", "e", "left", "right") ]))
+
+    def test_csr(self, test_stream):
+        s = test_stream
+        E = ChunkedLinkTable.chunks(2)(s.E)
+        csr, table_csr = E.csr(), StreamCSR(LinkTable(s.E))
+
+        assert(csr.nodes == table_csr.nodes)
+        assert(all([ (getattr(csr, name) == getattr(table_csr, name)).all() for name in StreamCSR.array_names ]))
+
+        # Only the chunks overlapping the period are combined
+        csr = E.csr(6, 9)
+        assert(set(E.links_between(6, 9)) <= set(csr.link.tolist()) < set(range(len(E))))
+
+    def test_copy_on_write(self, test_stream):
+        s = test_stream
+        E = ChunkedLinkTable.chunks(2)(s.E)
+        E2 = E.copy()
+        E2.append({ "u": "u", "v": "x", "b": 7, "e": 8, "label": { "left": set(), "right": set() } })
+
+        assert(E == s.E and len(E2) == len(s.E) + 1 and E2[:-1] == s.E)
+
+    def test_partition(self, test_stream):
+        s = test_stream
+        s.partition(2)
+        sub = s.substream(TimeNodeSet([TimeNode("u", 1, 2), TimeNode("v", 1, 2)]),
+                          TimeNodeSet([TimeNode("u", 1, 2), TimeNode("v", 1, 2)]))
+
+        assert(isinstance(s.E, ChunkedLinkTable) and s.E_class.length == 2)
+        assert(sub.E == [ dict(l, b=1, e=2) for l in s.E if set([l["u"], l["v"]]) == set("uv") ])
+        assert(s.window(4, 5).E == [ dict(l, b=max(4, l["b"]), e=min(5, l["e"])) for l in s.E if l["b"] <= 5 and l["e"] >= 4 ])
+
+    def test_save_and_evict(self, test_stream, tmp_path):
+        s = test_stream
+        s.partition(2)
+        s.save_chunks(str(tmp_path / "stream"))
+        s.E.evict()
+
+        assert(s.E.loaded() == 0)
+        assert(len(s.window(0, 1).E) > 0 and s.E.loaded() == 1)
+
+    def test_save_binary(self, test_stream, tmp_path):
+        s = test_stream
+        s.partition(2)
+        s.save_binary(str(tmp_path / "stream"))
+        s2 = Stream.open_mmap(str(tmp_path / "stream"), _W_class=TimeNodeSet)
+
+        assert(s2.E == s.E and s2.W == s.W and s2.degrees == s.degrees)
+
+    def test_interior_chunks(self, tmp_path):
+        # Hubs l0, l1 and authorities r0, r1 all linked during [4k, 4k + 2]
+        links = [ { "u": u, "v": v, "b": 4 * k, "e": 4 * k + 2, "label": { "left": ["a"], "right": ["b"] } }
+                  for k in range(10) for u in ("l0", "l1") for v in ("r0", "r1") ]
+        s = BipartiteStream.from_links(links)
+        s.V = { "left": set(["l0", "l1"]), "right": set(["r0", "r1"]) }
+        s.W = TimeNodeSet.from_intervals([ (x.node, max(11, x.b), min(15, x.e), set()) for x in s.W.values() if x.b <= 15 and x.e >= 11 ])
+        core = StreamBHACore(s, 2, 2).interior(s)
+
+        s.partition(4)
+        s.save_chunks(str(tmp_path / "stream"))
+        s2 = Stream.open_chunks(str(tmp_path / "stream"))
+        core2 = StreamBHACore(s2, 2, 2).interior(s2)
+
+        assert(len(core.E) == 4 and core2.W == core.W and core2.E == core.E)
+        # Only the chunk of the links during [12, 14] is read
+        assert(s2.W == s.W and s2.E.loaded() == 1)
+
+    def test_open_chunks(self, tmp_path):
+        s = Stream(_fp=io.StringIO())
+        s.readStream("./tests/integration/fixtures/3links-StSa.json")
+        s.setCoreProperty(StreamStarSat(s, threshold=2))
+        s.partition(2)
+        s.save_chunks(str(tmp_path / "stream"))
+        s2 = Stream.open_chunks(str(tmp_path / "stream"))
+        s2.bip_fp = io.StringIO()
+        s2.setCoreProperty(StreamStarSat(s2, threshold=2))
+
+        assert(isinstance(s2, ChunkedStream) and s2.E.loaded() == 0)
+        assert(s2.window(5, 6).E == s.window(5, 6).E and s2.E.loaded() == 1)
+        assert(s2.E == s.E and s2.W == s.W and s2.degrees == s.degrees and s2.times == s.times)
+
+        results = lambda pattern_list: sorted([ (sorted(p.elements()), sorted([ (x.node, x.b, x.e) for x in p.support_set.W.values() ]))
+                                                for p, _ in pattern_list ])
+        assert(results(patterns(s2)) == results(patterns(s)))
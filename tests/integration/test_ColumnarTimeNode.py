@@ -0,0 +1,115 @@
+import pytest
+
+from lib.TimeNode import TimeNode, TimeNodeSet
+from lib.ColumnarTimeNode import ColumnarTimeNodeSet
+from lib.Stream import Stream
+from lib.StreamProperties import StreamStarSat
+from lib.patterns import interior
+
+
+class TestColumnarTimeNodeSet:
+
+    def test_len(self):
+        W = ColumnarTimeNodeSet()
+        assert(len(W) == 0)
+
+    def test_add_existing(self):
+        W = ColumnarTimeNodeSet([TimeNode("u", 1, 3)])
+        W.add(TimeNode("u", 2,4))
+
+        expected = ColumnarTimeNodeSet([TimeNode("u", 1, 4)])
+
+        assert(W == expected)
+
+    def test_set_intersection(self):
+        W = ColumnarTimeNodeSet([
+                TimeNode("u", 2, 4)
+            ])
+        W2 = ColumnarTimeNodeSet([
+                TimeNode("u", 3, 5),
+                TimeNode("v", 1, 6)
+            ])
+
+        expected = ColumnarTimeNodeSet([
+                TimeNode("u", 3, 4)
+            ])
+
+        assert(W.intersection(W2) == expected)
+
+    def test_set_union(self):
+        W = ColumnarTimeNodeSet([
+                TimeNode("u", 2, 4)
+            ])
+        W2 = ColumnarTimeNodeSet([
+                TimeNode("u", 3, 5),
+                TimeNode("v", 1, 6)
+            ])
+
+        expected = ColumnarTimeNodeSet([
+                TimeNode("u", 2, 5),
+                TimeNode("v", 1, 6)
+            ])
+
+        assert(W.union(W2) == expected)
+
+    def test_set_difference(self):
+        W = ColumnarTimeNodeSet([
+                TimeNode("u", 1, 10),
+                TimeNode("v", 1, 6)
+            ])
+        W2 = ColumnarTimeNodeSet([
+                TimeNode("u", 3, 5),
+                TimeNode("v", 0, 7)
+            ])
+
+        expected = ColumnarTimeNodeSet([
+                TimeNode("u", 1, 3),
+                TimeNode("u", 5, 10)
+            ])
+
+        assert(W.difference(W2) == expected)
+
+    def test_duration(self):
+        W = ColumnarTimeNodeSet([
+                TimeNode("u", 1, 4),
+                TimeNode("u", 3, 5),
+                TimeNode("v", 1, 2)
+            ])
+
+        assert(W.duration() == 5)
+
+    def test_mixed_with_TimeNodeSet(self):
+        W = TimeNodeSet([
+                TimeNode("u", 2, 4),
+                TimeNode("v", 1, 2)
+            ])
+        W2 = ColumnarTimeNodeSet([
+                TimeNode("u", 3, 5)
+            ])
+
+        expected = TimeNodeSet([
+                TimeNode("u", 3, 4)
+            ])
+
+        assert(W.intersection(W2) == expected and W2.intersection(W) == expected)
+
+    def test_fingerprint(self):
+        elements = [ TimeNode("u", 1, 3), TimeNode("u", 4, 5.5), TimeNode("v", 2, 6) ]
+
+        assert(ColumnarTimeNodeSet(elements).fingerprint() == TimeNodeSet(elements).fingerprint())
+        assert(hash(ColumnarTimeNodeSet(elements)) == hash(TimeNodeSet(elements[::-1])))
+
+    def test_stream_interior(self):
+        s = Stream(_W_class=ColumnarTimeNodeSet)
+        s.setCoreProperty(StreamStarSat(s, threshold=2))
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+
+        int_val = interior(s)
+
+        assert(type(int_val.W) is ColumnarTimeNodeSet)
+        assert(int_val.W == ColumnarTimeNodeSet([
+                TimeNode("u", 1, 4),
+                TimeNode("v", 1, 4),
+                TimeNode("x", 1, 3),
+                TimeNode("y", 2, 4)
+            ]))
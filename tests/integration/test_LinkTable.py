@@ -0,0 +1,92 @@
+import pytest
+
+from lib.TimeNode import TimeNode, TimeNodeSet
+from lib.LinkTable import LinkTable
+from lib.Stream import Stream, BipartiteStream
+from lib.patterns import Pattern, BiPattern
+
+
+class TestLinkTable:
+
+    @pytest.fixture
+    def links(self):
+        s = Stream()
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+        for l in s.E:
+            l["label"] = { side: set(l["label"][side]) for side in l["label"] }
+        return s.E
+
+    def test_links_view(self, links):
+        E = LinkTable(links)
+
+        assert(len(E) == len(links) and E == links)
+        assert(E[-1] == links[-1] and E[1:] == links[1:])
+
+    def test_shared_labels(self, links):
+        E = LinkTable(links)
+
+        assert(len(E.labels) < 2 * len(links))
+
+    def test_copy_on_write(self, links):
+        E = LinkTable(links)
+        E2 = E.copy()
+        E2.append({ "u": "u", "v": "x", "b": 7, "e": 8, "label": { "left": ["z"], "right": [] } })
+
+        assert(len(E) == len(links) and E == links)
+        assert(len(E2) == len(links) + 1 and E2[:-1] == links)
+        assert(frozenset(["z"]) not in E.label_ids)
+
+    def test_extent(self):
+        s = Stream()
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+        s2 = Stream(_E_class=LinkTable)
+        s2.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+
+        for q in [ set(), set("a"), set("abc"), set("abcd") ]:
+            assert(Pattern(q).extent(S=s2) == Pattern(q).extent(S=s))
+
+    def test_extent_within(self):
+        s = Stream()
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+        s2 = Stream(_E_class=LinkTable)
+        s2.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+
+        assert(s2.postings("left") == s.postings("left") and s2.postings("right") == s.postings("right"))
+        p = Pattern(set("a"))
+        within = p.links(s2)
+        assert(within == p.links(s))
+        # Links out of within are left out, as for links stored as dicts
+        within = (within[0][1:], within[1][1:])
+        for q in [ set("a"), set("ab"), set("abd") ]:
+            assert(Pattern(q).extent(S=s2, within=within) == Pattern(q).extent(S=s, within=within))
+
+    def test_substream(self):
+        s = BipartiteStream()
+        s.readStream("./tests/integration/fixtures/Bipattern-ChangingNeighbours-StSa.json")
+        s2 = BipartiteStream(_E_class=LinkTable)
+        s2.readStream("./tests/integration/fixtures/Bipattern-ChangingNeighbours-StSa.json")
+
+        W = TimeNodeSet([ TimeNode("u", 2, 4), TimeNode("v", 0, 10), TimeNode("x", 0, 10) ])
+        sub, sub2 = s.substream(W, W), s2.substream(W, W)
+
+        assert(isinstance(sub2.E, LinkTable))
+        assert(sub2.E == sub.E and sub2.W == sub.W)
+        q = { "left": set("a"), "right": set("w") }
+        assert(BiPattern(q).extent(S=s2) == BiPattern(q).extent(S=s))
+
+    def test_events(self):
+        s = BipartiteStream()
+        s.readStream("./tests/integration/fixtures/Bipattern-ChangingNeighbours-StSa.json")
+        s2 = BipartiteStream(_E_class=LinkTable)
+        s2.readStream("./tests/integration/fixtures/Bipattern-ChangingNeighbours-StSa.json")
+
+        assert(not isinstance(s2.degrees, dict))
+        assert(s2.degrees == s.degrees and s2.times == s.times)
+
+        l = { "u": "u", "v": "x", "b": 7, "e": 8, "label": { "left": ["z"], "right": [] } }
+        s3 = s2.copy()
+        s3.add_link(l)
+        s.add_link(l)
+
+        assert(s3.degrees == s.degrees and s3.times == s.times)
+        assert(len(s2.degrees["u"]) == len(s.degrees["u"]) - 2)
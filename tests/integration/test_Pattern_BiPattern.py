@@ -1,10 +1,14 @@
 import pytest
 
 from lib.Stream import BipartiteStream
-from lib.StreamProperties import StreamStarSat
+from lib.StreamProperties import StreamStarSat, StreamBHACore
 from lib.patterns import *
 from lib.TimeNode import *
 import logging
+import io
+import gc
+import weakref
+import json
 import os
 
 
@@ -74,6 +78,27 @@ class TestPattern:
             ])
         assert(result == expected)
 
+    def test_patterns_window(self):
+        s = Stream(_fp=io.StringIO())
+        s.readStream("./tests/integration/fixtures/3links-StSa.json")
+        s.setCoreProperty(StreamStarSat(s, threshold=2))
+
+        # Same stream, with its links filtered by hand
+        links = [ dict(l, b=max(3, l["b"]), e=min(5, l["e"])) for l in s.E if l["b"] <= 5 and l["e"] >= 3 ]
+        s2 = Stream.from_links(links, T={ "alpha": 3, "omega": 5 }, lang=s.I, _fp=io.StringIO())
+        s2.patterns_flag = True
+        s2.setCoreProperty(StreamStarSat(s2, threshold=2))
+
+        results = lambda pattern_list: sorted([ (sorted(p.elements()), sorted([ (x.node, x.b, x.e) for x in p.support_set.W.values() ]))
+                                                for p, _ in pattern_list ])
+        pattern_list = patterns(s, window=(3, 5))
+        assert(results(pattern_list) == results(patterns(s2)))
+        assert(len(s.window(3, 5).E) == len(links))
+
+        # Results are stored on the stream itself, as without a window
+        assert(s.pattern_list is pattern_list and len(s.pattern_list) > 0)
+        assert(s.EL == s2.EL)
+
 class TestBiPattern:
 
     FIXTURE_DIR = os.path.join(
@@ -148,3 +173,79 @@ class TestBiPattern:
                 TimeNode("v", 1, 5)
             ])
         assert(result == expected)
+
+    def test_bipatterns_cache(self):
+        results = lambda pattern_list: sorted([ (sorted(p.elements()), sorted([ (x.node, x.b, x.e) for x in p.support_set.W.values() ]))
+                                                for p, _ in pattern_list ])
+        caches = [ InteriorCache(), InteriorCache(maxsize=0) ]
+        runs = []
+        for cache in caches:
+            s = BipartiteStream(_fp=io.StringIO())
+            s.readStream("./tests/integration/fixtures/1-1-bha-core.json")
+            s.setCoreProperty(StreamStarSat(s, threshold=2))
+            runs.append(results(bipatterns(s, cache=cache)))
+
+            assert(s.interior_cache is cache)
+
+        # Some branches have the same extents
+        assert(runs[0] == runs[1])
+        assert(caches[0].hits > 0 and caches[1].hits == 0 and len(caches[1]) == 0)
+        assert(caches[0].hits + caches[0].misses == caches[1].misses)
+
+    def test_bipatterns_window(self):
+        s = BipartiteStream(_fp=io.StringIO())
+        s.readStream("./tests/integration/fixtures/1-1-bha-core.json")
+        s.setCoreProperty(StreamStarSat(s, threshold=1))
+        pattern_list = bipatterns(s, window=(3, 10))
+
+        assert(s.pattern_list is pattern_list and len(pattern_list) > 0)
+        assert(all([ x.b >= 3 for p, _ in pattern_list for x in p.support_set.W.values() ]))
+
+    def test_interior_cache_lru(self, test_stream):
+        s = test_stream
+        s.setCoreProperty(StreamStarSat(s, threshold=2))
+        cache = InteriorCache(maxsize=1)
+
+        S = cache.interior(s)
+        assert(cache.interior(s) is S and (cache.hits, cache.misses) == (1, 1))
+
+        s.setCoreProperty(StreamStarSat(s, threshold=3))
+        cache.interior(s)
+        s.setCoreProperty(StreamStarSat(s, threshold=2))
+        assert(cache.interior(s) is not S and (cache.hits, cache.misses) == (1, 3) and len(cache) == 1)
+
+    def test_interior_cache_labels(self, tmp_path):
+        with open("./tests/integration/fixtures/1-1-bha-core.json") as f:
+            data = json.load(f)
+        streams = []
+        for label in ("c", "e"):
+            data["E"][0]["label"]["left"] = ["a", "b", label]
+            with open(tmp_path / "stream.json", "w") as f:
+                json.dump(data, f)
+            s = BipartiteStream(_fp=io.StringIO())
+            s.readStream(str(tmp_path / "stream.json"))
+            s.setCoreProperty(StreamStarSat(s, threshold=1))
+            streams.append(s)
+        cache = InteriorCache()
+
+        # Streams that differ by their labels only
+        assert(streams[0].signature() != streams[1].signature())
+        S = [ cache.interior(s) for s in streams ]
+        assert(cache.misses == 2 and S[1].E[0]["label"]["left"] == set("abe"))
+        assert(cache.interior(streams[1]) is S[1] and cache.hits == 1)
+
+    def test_interior_cache_streams(self, test_stream):
+        # The cache does not keep the streams it reduced alive
+        s = test_stream
+        cache = InteriorCache()
+        subs = s.substream(s.W, s.W)
+        subs.setCoreProperty(StreamBHACore(subs, h=1, a=1))
+        S = cache.interior(subs)
+        ref = weakref.ref(subs)
+        del subs
+        gc.collect()
+
+        assert(ref() is None and len(cache) == 1)
+        subs = s.substream(s.W, s.W)
+        subs.setCoreProperty(StreamBHACore(subs, h=1, a=1))
+        assert(cache.interior(subs) is S)
@@ -1,6 +1,7 @@
 import pytest
+import random
 
-from lib.Stream import Stream, BipartiteStream
+from lib.Stream import Stream, BipartiteStream, _add_events
 from lib.TimeNode import TimeNode, TimeNodeSet
 from lib.StreamProperties import StreamStarSat
 import logging
@@ -67,6 +68,142 @@ class TestStream:
 
         assert(sub == expected)
 
+    def test_substream_clipped(self):
+        s = Stream()
+        s.readStream("./tests/integration/fixtures/3links-StSa.json")
+        W = TimeNodeSet([
+                TimeNode("u", 2, 4),
+                TimeNode("v", 0, 10),
+                TimeNode("x", 3, 10),
+            ])
+        sub = s.substream(W, W)
+
+        assert([ (l["u"], l["v"], l["b"], l["e"]) for l in sub.E ] == [("u", "v", 2, 4), ("v", "x", 3, 4)])
+        assert(sub.E[0]["label"]["left"] == set("abc") and sub.E[0]["label"]["right"] == set("bcd"))
+
+    def test_substream_view(self, test_stream):
+        s = test_stream
+        W = TimeNodeSet([
+                TimeNode("u", 0, 10),
+                TimeNode("v", 0, 10),
+                TimeNode("x", 2, 10),
+            ])
+        sub = s.substream(W, W)
+
+        assert(sub._E is None and sub._selected is None)
+
+        W2 = TimeNodeSet([ TimeNode("v", 0, 10), TimeNode("x", 0, 10) ])
+        sub2 = sub.substream(W2, W2)
+
+        assert(sub._E is None and [ (l["u"], l["v"], l["b"], l["e"]) for l in sub2.E ] == [("v", "x", 2, 3)])
+        assert(sub2.E[0]["label"]["left"] is s.E[1]["label"]["left"])
+        assert(sub.copy() == s.copy().substream(W, W))
+
+    def test_sorted_events(self, test_stream):
+        s = test_stream
+        s.add_link({ "u": "u", "v": "x", "b": 0, "e": 1, "label": { "left": ["e"], "right": [] } })
+        s.add_link({ "u": "u", "v": "y", "b": 5, "e": 5, "label": { "left": ["f"], "right": [] } })
+
+        events = [ (t, ev_type) for v, t, ev_type, label in s.degrees["u"] ]
+
+        assert(events == sorted(events, key=lambda x: x[0]))
+        assert(events[:4] == [(0, 1), (1, -1), (1, 1), (5, -1)] and events[-2:] == [(5, 1), (5, -1)])
+        assert(s.label(TimeNode("u", 0, 1)) == set("abcde") and s.label(TimeNode("u", 5, 5)) == set("abcdf"))
+
+    def test_events_out_of_order(self):
+        # Events are queued, then merged as if they had been inserted one by one
+        random.seed(0)
+        links = [ { "u": "u", "v": f"v{random.randrange(10)}", "b": b, "e": b + random.randint(0, 2),
+                    "label": { "left": [], "right": [] } } for b in [ random.randint(0, 20) for _ in range(300) ] ]
+        s = Stream()
+        expected = []
+        for k, l in enumerate(links):
+            s.add_link(l)
+            _add_events(expected, l["v"], l["b"], l["e"], frozenset())
+            if k % 100 == 0:
+                assert(s.degrees["u"] == expected)
+
+        assert(s.degrees["u"] == expected)
+
+    def test_fingerprint(self, test_stream):
+        s = test_stream
+        s2 = Stream()
+        s2.loadJson(s.json())
+
+        assert(s.fingerprint() == s2.fingerprint() and s == s2)
+
+        s2.add_link({ "u": "u", "v": "x", "b": 7, "e": 8, "label": { "left": [], "right": [] } })
+
+        assert(s.fingerprint() != s2.fingerprint() and s != s2)
+
+    def test_copy_on_write(self, test_stream):
+        s = test_stream
+        s2 = s.copy()
+        n_links, n_events = len(s.E), len(s.degrees["u"])
+        s2.add_link({ "u": "u", "v": "x", "b": 7, "e": 8, "label": { "left": [], "right": [] } })
+
+        assert(len(s.E) == n_links and len(s.degrees["u"]) == n_events)
+        assert(len(s2.E) == n_links + 1 and len(s2.degrees["u"]) == n_events + 2)
+        assert(s2.E[:-1] == s.E and s != s2)
+
+    def test_links_with(self, test_stream):
+        s = test_stream
+        index = s.postings("left")
+
+        assert(index["d"] == [ i for i, l in enumerate(s.E) if "d" in l["label"]["left"] ])
+        assert(s.links_with(set(), "right") == list(range(len(s.E))))
+        assert(s.links_with(set("ad"), "right") == [ i for i, l in enumerate(s.E) if set("ad").issubset(l["label"]["right"]) ])
+        assert(s.links_with(set("a"), "right", within=[1]) == [1] and s.links_with(set("z"), "left") == [])
+
+        s.add_link({ "u": "u", "v": "x", "b": 7, "e": 8, "label": { "left": ["d", "z"], "right": [] } })
+
+        assert(s.links_with(set("dz"), "left") == [len(s.E) - 1])
+
+    def test_label_index(self, test_stream):
+        s = test_stream
+        s.add_link({ "u": "u", "v": "x", "b": 5, "e": 7, "label": { "left": ["e"], "right": [] } })
+
+        assert(s.label(TimeNode("u", 0, 5)) == set("abcde"))
+        assert(s.label(TimeNode("u", 5, 6)) == set("e") and s.label(TimeNode("u", 8, 9)) == set())
+
+        W = TimeNodeSet([TimeNode("u", 0, 2), TimeNode("u", 5, 6), TimeNode("v", 1, 4), TimeNode("w", 1, 2)])
+        assert(dict(s.label_sets(W)) == { x: s.label(x) for x in W.values() })
+        # Equal label sets are stored once
+        assert(all([ labels is s.vocabulary.intern(labels) for _, labels in s.label_sets(W) if len(labels) > 0 ]))
+        assert(s.labels(W) == set.union(*[ s.label(x) for x in W.values() ]))
+
+    def test_window(self, test_stream):
+        s = test_stream
+        s.add_link({ "u": "u", "v": "y", "b": 0, "e": 9, "label": { "left": ["e"], "right": [] } })
+        w = s.window(2, 4)
+        expected = [ dict(l, b=max(2, l["b"]), e=min(4, l["e"])) for l in s.E if l["b"] <= 4 and l["e"] >= 2 ]
+
+        assert(s.links_between(2, 4) == [ i for i, l in enumerate(s.E) if l["b"] <= 4 and l["e"] >= 2 ])
+        assert(w.E == expected and w.T == { "alpha": 2, "omega": 4 })
+        assert(w.W == s.W.intersection(TimeNodeSet([ TimeNode(u, 2, 4) for u in s.W.nodes() ])))
+        assert(w.vocabulary is s.vocabulary and w.I == s.I)
+        assert(s.window(20, 30).E == [])
+
+    def test_from_links(self, test_stream):
+        s = test_stream
+        s2 = Stream.from_links(s.E, T=s.T)
+
+        assert(s2.W == s.W and s2.E == s.E and s2.T == s.T)
+        assert(s2.degrees == s.degrees and s2.times == s.times)
+        assert(Stream.from_links(s.E).T == { "alpha": min([ l["b"] for l in s.E ]), "omega": max([ l["e"] for l in s.E ]) })
+
+    def test_add_links(self):
+        links = [ { "u": "u", "v": "v", "b": 1, "e": 3, "label": { "left": ["a"], "right": ["b"] } },
+                  { "u": "v", "v": "w", "b": 2, "e": 4, "label": { "left": ["c"], "right": ["d"] } } ]
+        s = Stream()
+        s.add_links(links)
+        s2 = Stream()
+        for l in links:
+            s2.add_link(l)
+
+        assert(s.degrees == s2.degrees and s.times == s2.times)
+        assert(s.times[frozenset(["u", "v"])] == [ (1, 3, frozenset("a"), frozenset("b")) ])
+
 class TestBipartiteStream:
 
     FIXTURE_DIR = os.path.join(
@@ -0,0 +1,90 @@
+import pytest
+
+from lib.Stream import Stream, BipartiteStream
+from lib.LinkTable import LinkTable
+from lib.StreamCSR import StreamCSR
+
+
+class TestStreamCSR:
+
+    @pytest.fixture
+    def test_stream(self):
+        s = BipartiteStream()
+        s.readStream("./tests/integration/fixtures/2-2-bha-core.json")
+        s.add_link({ "u": "u", "v": "x", "b": 3, "e": 3, "label": { "left": ["a"], "right": [] } })
+        return s
+
+    def test_events(self, test_stream):
+        s = test_stream
+        csr = s.csr()
+
+        for u in s.degrees:
+            neighbour, t, ev_type, link, side = csr.events(u)
+            expected = [ (csr.node_ids[v], t_v, type_v) for v, t_v, type_v, label in s.degrees[u] ]
+
+            assert(list(zip(neighbour.tolist(), t.tolist(), ev_type.tolist())) == expected)
+            assert([ s.E[i]["label"]["right" if j else "left"] for i, j in zip(link, side) ] == [ x[3] for x in s.degrees[u] ])
+
+    def test_pair_times(self, test_stream):
+        s = test_stream
+        csr = s.csr()
+
+        for pair in s.times:
+            u, v = list(pair)
+            b, e, link = csr.pair_times(u, v)
+            assert(list(zip(b.tolist(), e.tolist())) == [ x[:2] for x in s.times[pair] ])
+
+        assert(len(csr.pair_times("u", "nobody")[0]) == 0)
+
+    def test_link_table(self, test_stream):
+        s = test_stream
+        csr = StreamCSR(LinkTable(s.E))
+
+        assert(len(csr) == 4 * len(s.E))
+        assert((csr.t == s.csr().t).all() and (csr.link == s.csr().link).all())
+
+    def test_rebuilt(self, test_stream):
+        s = test_stream
+        csr = s.csr()
+
+        assert(s.csr() is csr)
+
+        s.add_link({ "u": "u", "v": "x", "b": 8, "e": 9, "label": { "left": ["a"], "right": [] } })
+
+        assert(s.csr() is not csr and len(s.csr()) == len(csr) + 4)
+
+    @pytest.mark.parametrize("threshold", [1, 2, 3])
+    def test_sweep(self, test_stream, threshold):
+        s = test_stream
+        s.add_link({ "u": "u", "v": "x", "b": 1, "e": 4, "label": { "left": ["a"], "right": [] } })
+        csr = s.csr()
+        ends, rows, begun, reached = csr.sweep(threshold)
+
+        expected = []
+        for u in s.degrees:
+            offset = csr.offsets[csr.node_ids[u]]
+            neighbours = {}
+            last_begin = None
+            for k, (v, t, ev_type, label) in enumerate(s.degrees[u]):
+                if ev_type == 1:
+                    if len(neighbours) < threshold:
+                        last_reached = offset + k
+                    neighbours[v] = neighbours.get(v, 0) + 1
+                    last_begin = offset + k
+                else:
+                    if len(neighbours) >= threshold:
+                        expected.append((offset + k, csr.node_ids[u], last_begin, last_reached))
+                    neighbours[v] -= 1
+                    if neighbours[v] == 0:
+                        del neighbours[v]
+
+        assert(sorted(expected) == list(zip(ends.tolist(), rows.tolist(), begun.tolist(), reached.tolist())))
+
+    def test_spans(self, test_stream):
+        s = test_stream
+        csr = s.csr()
+        begins, ends = csr.spans()
+
+        assert(len(begins) == 2 * len(s.E))
+        assert((csr.link[begins] == csr.link[ends]).all() and (csr.side[begins] == csr.side[ends]).all())
+        assert((csr.type[begins] == 1).all() and (csr.type[ends] == -1).all() and (begins < ends).all())
@@ -24,6 +24,17 @@ class TestTimeNode:
 
         assert(w != w2)
 
+    def test_TimeNode_slots(self):
+        w = TimeNode("u", 2, 4)
+
+        assert(not hasattr(w, "__dict__") and w.interval is w.interval)
+
+    def test_TimeNode_interned_node(self):
+        w = TimeNode("".join(["u", "v"]), 2, 4)
+        w2 = TimeNode("".join(["u", "v"]), 1, 3)
+
+        assert(w.node is w2.node)
+
 class TestInterval:
 
     def test_interval_included(self):
@@ -118,3 +129,107 @@ class TestTimeNodeSet:
             ])
 
         assert(W.union(W2) == expected)
+
+    def test_iteration_does_not_copy(self):
+        W = TimeNodeSet([TimeNode("u", 1, 2), TimeNode("v", 5, 6)])
+
+        assert(all([ x is y for x, y in zip(W, W.values()) ]))
+
+    def test_add_bridging(self):
+        W = TimeNodeSet([TimeNode("u", 1, 2), TimeNode("u", 5, 6)])
+        W.add(TimeNode("u", 2, 5))
+
+        assert(list(W.values()) == [TimeNode("u", 1, 6)])
+
+    def test_add_keeps_sorted(self):
+        W = TimeNodeSet([TimeNode("u", 5, 6), TimeNode("u", 1, 2), TimeNode("u", 3, 4)])
+
+        assert(list(W.values()) == [TimeNode("u", 1, 2), TimeNode("u", 3, 4), TimeNode("u", 5, 6)])
+
+    def test_covers(self):
+        W = TimeNodeSet([TimeNode("u", 1, 3), TimeNode("u", 5, 8)])
+
+        assert(W.covers("u", 3) and W.covers("u", 6))
+        assert(not W.covers("u", 4) and not W.covers("v", 2))
+
+    def test_overlapping(self):
+        W = TimeNodeSet([TimeNode("u", 1, 3), TimeNode("u", 5, 8), TimeNode("u", 10, 12)])
+
+        assert(W.overlapping("u", 3, 9) == [TimeNode("u", 1, 3), TimeNode("u", 5, 8)])
+        assert(W.overlapping("u", 8.5, 9.5) == [])
+
+    def test_set_intersection_several_intervals(self):
+        W = TimeNodeSet([
+                TimeNode("u", 1, 4),
+                TimeNode("u", 6, 9)
+            ])
+        W2 = TimeNodeSet([
+                TimeNode("u", 3, 7),
+                TimeNode("u", 8, 10)
+            ])
+
+        expected = TimeNodeSet([
+                TimeNode("u", 3, 4),
+                TimeNode("u", 6, 7),
+                TimeNode("u", 8, 9)
+            ])
+
+        assert(W.intersection(W2) == expected and len(W.intersection(W2)) == 3)
+
+    def test_set_difference(self):
+        W = TimeNodeSet([
+                TimeNode("u", 1, 10),
+                TimeNode("v", 1, 6)
+            ])
+        W2 = TimeNodeSet([
+                TimeNode("u", 3, 5),
+                TimeNode("v", 0, 7)
+            ])
+
+        expected = TimeNodeSet([
+                TimeNode("u", 1, 3),
+                TimeNode("u", 5, 10)
+            ])
+
+        assert(W.difference(W2) == expected and len(W.difference(W2)) == 2)
+
+    def test_fingerprint_order_independent(self):
+        W = TimeNodeSet([TimeNode("u", 1, 3), TimeNode("v", 2, 4), TimeNode("u", 2, 5)])
+        W2 = TimeNodeSet([TimeNode("v", 2, 4), TimeNode("u", 1, 5)])
+
+        assert(W.fingerprint() == W2.fingerprint() and W == W2)
+        assert({ W: 1 }[W2] == 1)
+
+    def test_neq_different_fingerprint(self):
+        W = TimeNodeSet([TimeNode("u", 1, 3)])
+        W2 = TimeNodeSet([TimeNode("u", 1, 3), TimeNode("v", 2, 4)])
+
+        assert(W.fingerprint() != W2.fingerprint() and W != W2)
+
+    def test_copy_on_write(self):
+        W = TimeNodeSet([TimeNode("u", 1, 3), TimeNode("v", 2, 4)])
+        W2 = W.copy()
+        W2.add(TimeNode("u", 5, 6))
+        W.add(TimeNode("v", 4, 8))
+
+        assert(W == TimeNodeSet([TimeNode("u", 1, 3), TimeNode("v", 2, 8)]))
+        assert(W2 == TimeNodeSet([TimeNode("u", 1, 3), TimeNode("u", 5, 6), TimeNode("v", 2, 4)]))
+
+    def test_union_does_not_alias(self):
+        W = TimeNodeSet([TimeNode("u", 1, 3)])
+        W2 = TimeNodeSet([TimeNode("v", 2, 4)])
+        U = W.union(W2)
+        W.add(TimeNode("u", 5, 6))
+        U.add(TimeNode("v", 6, 7))
+
+        assert(U == TimeNodeSet([TimeNode("u", 1, 3), TimeNode("v", 2, 4), TimeNode("v", 6, 7)]))
+        assert(W2 == TimeNodeSet([TimeNode("v", 2, 4)]))
+
+    def test_from_intervals(self):
+        intervals = [("u", 5, 6, set()), ("v", 2, 4, set()), ("u", 1, 3, set()),
+                     ("u", 2, 5, set()), ("v", 6, 7, set()), ("v", 4, 4, set())]
+        W = TimeNodeSet.from_intervals(intervals)
+        W2 = TimeNodeSet([ TimeNode(u, b, e) for u, b, e, _ in intervals ])
+
+        assert(W == W2 and W.fingerprint() == W2.fingerprint())
+        assert(W == TimeNodeSet([TimeNode("u", 1, 6), TimeNode("v", 2, 4), TimeNode("v", 6, 7)]))
@@ -0,0 +1,33 @@
+import pytest
+
+from lib.Vocabulary import Vocabulary
+from lib.Stream import Stream
+from lib.TimeNode import TimeNode
+
+
+class TestVocabulary:
+
+    def test_intern(self):
+        voc = Vocabulary()
+        x = voc.intern(["a", "b"])
+
+        assert(x == frozenset("ab") and voc.intern(set("ba")) is x)
+        assert(len(voc) == 2)
+
+    def test_mask(self):
+        voc = Vocabulary("abc")
+        mask = voc.mask(["a", "c"])
+
+        assert(voc.query("a") & mask == voc.query("a"))
+        assert(voc.query("b") & mask != voc.query("b"))
+        assert(voc.query("z") is None and len(voc) == 3)
+        assert(voc.decode(mask & voc.mask("bc")) == set("c"))
+        assert(voc.label_ids(set("ca")) == (0, 2))
+
+    def test_stream_labels(self):
+        s = Stream()
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+
+        assert(all([ l["label"]["left"] is s.vocabulary.intern(l["label"]["left"]) for l in s.E ]))
+        assert(s.label(TimeNode("u", 1, 5)) == set("abcd"))
+        assert(s.copy().vocabulary is s.vocabulary)
@@ -0,0 +1,79 @@
+import pytest
+import io
+
+from lib.Stream import Stream, BipartiteStream, MappedStream, MappedBipartiteStream
+from lib.StreamProperties import StreamStarSat, StreamBHACore
+from lib.TimeNode import TimeNode, TimeNodeSet
+from lib.LinkTable import LinkTable
+from lib.patterns import Pattern, patterns, bipatterns
+
+
+def results(pattern_list):
+    return sorted([ (str(sorted(p.elements())), sorted([ (x.node, x.b, x.e) for x in p.support_set.W.values() ]))
+                    for p, _ in pattern_list ])
+
+class TestBinary:
+
+    def test_roundtrip(self, tmp_path):
+        s = Stream(_fp=io.StringIO())
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+        s.save_binary(str(tmp_path / "stream"))
+        s2 = Stream.open_mmap(str(tmp_path / "stream"))
+
+        assert(isinstance(s2, MappedStream) and isinstance(s2.E, LinkTable))
+        assert(s2.E == s.E and s2.W == s.W and s2.I == s.I and s2.V == s.V)
+        assert(s2.postings("left") == s.postings("left") and s2.postings("right") == s.postings("right"))
+        assert(s2.degrees == s.degrees and s2.times == s.times)
+        assert(s2.label(TimeNode("u", 1, 5)) == s.label(TimeNode("u", 1, 5)))
+        # W is a ColumnarTimeNodeSet in s2
+        assert(s2 == s and s == s2 and hash(s2) == hash(s))
+
+    def test_patterns(self, tmp_path):
+        s = Stream(_fp=io.StringIO())
+        s.readStream("./tests/integration/fixtures/3links-StSa.json")
+        s.save_binary(str(tmp_path / "stream"))
+        s2 = Stream.open_mmap(str(tmp_path / "stream"), _W_class=TimeNodeSet)
+        s2.bip_fp = io.StringIO()
+
+        s.setCoreProperty(StreamStarSat(s, threshold=2))
+        s2.setCoreProperty(StreamStarSat(s2, threshold=2))
+
+        assert(results(patterns(s2)) == results(patterns(s)))
+
+    def test_bipatterns(self, tmp_path):
+        s = BipartiteStream(_fp=io.StringIO())
+        s.readStream("./tests/integration/fixtures/2-2-bha-core.json")
+        s.save_binary(str(tmp_path / "stream"))
+        s2 = Stream.open_mmap(str(tmp_path / "stream"))
+        s2.bip_fp = io.StringIO()
+
+        assert(isinstance(s2, MappedBipartiteStream) and s2.bipatterns_flag)
+
+        s.setCoreProperty(StreamBHACore(s, h=2, a=2))
+        s2.setCoreProperty(StreamBHACore(s2, h=2, a=2))
+
+        assert(results(bipatterns(s2)) == results(bipatterns(s)))
+
+    def test_extent(self, tmp_path):
+        s = Stream()
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+        s.save_binary(str(tmp_path / "stream"))
+        s2 = Stream.open_mmap(str(tmp_path / "stream"), _W_class=TimeNodeSet)
+
+        # Extents are found from the saved postings
+        assert(Pattern(set("ab")).extent(S=s2) == Pattern(set("ab")).extent(S=s))
+        assert(s2._arrays is None)
+
+    def test_add_link(self, tmp_path):
+        s = Stream()
+        s.readStream("./tests/integration/fixtures/ChangingNeighbours-StSa.json")
+        s.save_binary(str(tmp_path / "stream"))
+        s2 = Stream.open_mmap(str(tmp_path / "stream"))
+
+        l = { "u": "u", "v": "x", "b": 7, "e": 8, "label": { "left": ["z"], "right": [] } }
+        s.add_link(l)
+        s2.add_link(l)
+
+        assert(s2.E == s.E and s2.degrees == s.degrees)
+        assert(s2.links_with(set("z"), "left") == [len(s.E) - 1])
+        assert(len(Stream.open_mmap(str(tmp_path / "stream")).E) == len(s.E) - 1)
@@ -1,12 +1,37 @@
 import pytest
+import random
 
-from lib.Stream import Stream, TimeNode, TimeNodeSet
-from lib.StreamProperties import StreamStarSat
-from lib.patterns import interior
+from lib.Stream import Stream, BipartiteStream, TimeNode, TimeNodeSet
+from lib.StreamProperties import StreamProperty, StreamStarSat, StreamBHACore
+from lib.patterns import interior, generic_interior
 import logging
 import os
 import ujson
 
+def link(u, v, b, e):
+    return { "u": u, "v": v, "b": b, "e": e, "label": { "left": ["a"], "right": ["b"] } }
+
+def bipartite(links):
+    """
+        Stream of links, with their u as hubs and their v as authorities
+    """
+    s = BipartiteStream.from_links(links)
+    s.V = { "left": set([ l["u"] for l in links ]), "right": set([ l["v"] for l in links ]) }
+    return s
+
+def ladder(n=20):
+    """
+        Hubs l0 to l{n-1}, each linked to authorities r{i} and r{i+1}
+    """
+    return bipartite([ link(f"l{i}", f"r{j}", 0, 10) for i in range(n) for j in (i, i + 1) ])
+
+def random_stream(nodes, links, duration):
+    """
+        Up to links random links between nodes hubs and nodes authorities,
+        beginning between 0 and 10 and lasting up to duration
+    """
+    return bipartite([ link(f"l{random.randrange(nodes)}", f"r{random.randrange(nodes)}", b, b + random.randint(0, duration))
+                       for b in [ random.randint(0, 10) for _ in range(random.randint(3, links)) ] ])
 
 class TestInterior:
 
@@ -97,3 +122,171 @@ class TestInterior:
         expected = s.substream(TimeNodeSet([TimeNode('v', 2, 4), TimeNode('v', 5, 6) ]),\
                     TimeNodeSet([TimeNode('u', 2, 4), TimeNode('y', 2, 4), TimeNode('x', 2, 4), TimeNode('u', 5, 6), TimeNode('y', 5, 6), TimeNode('x', 5, 6)]))
         assert(int_val == expected)
+
+class TestBHACoreInterior:
+
+    def fixpoint(self, core_property, s):
+        """
+            (h,a)-core as the fixpoint of find_bicore
+        """
+        core = core_property.find_bicore(s)
+        while True:
+            next_core = core_property.find_bicore(core)
+            if next_core.W == core.W and next_core.E == core.E:
+                return core
+            core = next_core
+
+    @pytest.mark.parametrize("fixture,h,a", [("1-1-bha-core", 1, 1), ("2-2-bha-core", 2, 2), ("2-2-bha-core", 1, 2)])
+    def test_interior_fixpoint(self, fixture, h, a):
+        s = BipartiteStream()
+        s.readStream(f"./tests/integration/fixtures/{fixture}.json")
+        core_property = StreamBHACore(s, h=h, a=a)
+
+        int_val = core_property.interior(s)
+
+        assert(len(int_val.W) > 0)
+        assert(int_val == self.fixpoint(core_property, s))
+
+    def test_interior_peels(self):
+        # Each round of peeling removes the ends of the ladder
+        s = ladder()
+
+        assert(len(StreamBHACore(s, h=2, a=2).interior(s).W) == 0)
+        assert(StreamBHACore(s, h=2, a=1).interior(s) == self.fixpoint(StreamBHACore(s, h=2, a=1), s))
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_interior_random(self, seed):
+        # Links to a same neighbour are truncated and dropped in turn over the rounds
+        random.seed(seed)
+        for _ in range(30):
+            s = random_stream(4, 60, 4)
+            core_property = StreamBHACore(s, h=random.randint(1, 3), a=random.randint(1, 3))
+
+            assert(core_property.interior(s) == self.fixpoint(core_property, s))
+
+    def test_interior_repeated_links(self):
+        s = BipartiteStream()
+        s.readStream("./tests/integration/fixtures/2-2-bha-core.json")
+        l = s.E[0]
+        s.add_link(dict(l, b=l["b"], e=(l["b"] + l["e"]) / 2))
+        core_property = StreamBHACore(s, h=2, a=2)
+
+        assert(core_property.interior(s) == self.fixpoint(core_property, s))
+
+class CountingBHACore(StreamBHACore):
+    """
+        (h,a)-core counting the evaluations of p1
+    """
+    calls = 0
+
+    def p1(self, u, s):
+        self.calls += 1
+        return super().p1(u, s)
+
+class GenericBHACore(StreamProperty):
+    """
+        (h,a)-core with no interior() of its own, reduced by generic_interior
+    """
+    locality = 1
+
+    def __init__(self, stream, h, a):
+        super().__init__(stream)
+        self.core = StreamBHACore(stream, h=h, a=a)
+
+    def p1(self, u, s):
+        return self.core.p1(u, s)
+
+    def p2(self, u, s):
+        return self.core.p2(u, s)
+
+class TestGenericInterior:
+
+    @pytest.mark.parametrize("h,a", [(1, 1), (2, 2), (1, 2)])
+    def test_generic_interior_bha_core(self, h, a):
+        s = BipartiteStream()
+        s.readStream("./tests/integration/fixtures/2-2-bha-core.json")
+        core_property = StreamBHACore(s, h=h, a=a)
+        s.setCoreProperty(core_property)
+
+        S1, S2 = generic_interior(s, s.W, s.W)
+        expected = core_property.interior(s)
+        assert(S1.union(S2) == expected.W)
+
+        s.setCoreProperty(GenericBHACore(s, h=h, a=a))
+        result = interior(s)
+        assert(result.W == expected.W and result.E == expected.E)
+
+    @pytest.mark.parametrize("seed", range(3))
+    def test_interior_fallback_links(self, seed):
+        # Links spanning several intervals of W are dropped, round after round
+        random.seed(seed)
+        for _ in range(100):
+            s = random_stream(4, 40, 3)
+            h, a = random.randint(1, 3), random.randint(1, 3)
+            s.setCoreProperty(StreamBHACore(s, h=h, a=a))
+            expected = interior(s)
+            s.setCoreProperty(GenericBHACore(s, h=h, a=a))
+            result = interior(s)
+
+            assert(result.W == expected.W and result.E == expected.E)
+
+    def test_generic_interior_worklist(self):
+        # Only the ends of the ladder change on each round
+        s = ladder()
+        local = CountingBHACore(s, h=2, a=2)
+        s.setCoreProperty(local)
+        S1, S2 = generic_interior(s, s.W, s.W)
+
+        anywhere = CountingBHACore(s, h=2, a=2)
+        anywhere.locality = None
+        s.setCoreProperty(anywhere)
+
+        assert((S1, S2) == generic_interior(s, s.W, s.W))
+        assert(S1.union(S2) == local.interior(s).W)
+        s.setCoreProperty(GenericBHACore(s, h=2, a=2))
+        assert(interior(s).E == local.interior(s).E)
+        assert(local.calls < anywhere.calls / 2)
+
+    def test_interior_fallback(self):
+        s = ladder()
+        s.setCoreProperty(StreamProperty(s))
+
+        assert(interior(s).W == s.W)
+
+class TestBHACoreDecomposition:
+
+    @pytest.mark.parametrize("a", [1, 2])
+    def test_decompose(self, a):
+        s = BipartiteStream()
+        s.readStream("./tests/integration/fixtures/2-2-bha-core.json")
+        decomposition = StreamBHACore(s, a=a).decompose(s)
+
+        assert(decomposition.h_max > 0)
+        for h in range(1, decomposition.h_max + 2):
+            assert(decomposition.interior(h) == StreamBHACore(s, h=h, a=a).interior(s))
+        assert(len(decomposition.interior(decomposition.h_max + 1).W) == 0)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_decompose_random(self, seed):
+        # Cores are not nested when the time-nodes of an end of a link split,
+        # or when dropping a neighbour makes a node a hub earlier
+        random.seed(seed)
+        for _ in range(100):
+            s = random_stream(5, 30 + 10 * seed, 5)
+            a = random.randint(1, 3)
+            decomposition = StreamBHACore(s, a=a).decompose(s)
+
+            for h in range(1, decomposition.h_max + 3):
+                expected = StreamBHACore(s, h=h, a=a).interior(s)
+                result = decomposition.interior(h)
+                assert(result.W == expected.W and result.E == expected.E)
+
+    def test_core_number(self):
+        # l0 has 2 neighbours, every other hub has 3
+        s = bipartite([ link(f"l{i}", f"r{j}", 0, 10) for i in range(10) for j in range(i, i + 3) if (i, j) != (0, 2) ])
+        decomposition = StreamBHACore(s, a=1).decompose(s)
+
+        assert(decomposition.h_max == 3)
+        assert(decomposition.core_number("l0", 5) == 2 and decomposition.core_number("l1", 5) == 3)
+        assert(decomposition.core_number("l1", 11) == 0 and decomposition.core_number("nobody", 5) == 0)
+        assert(set(decomposition.interior(3).W.nodes()) == set(s.W.nodes()).difference(["l0", "r0"]))
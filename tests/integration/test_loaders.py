@@ -0,0 +1,51 @@
+import pytest
+import json
+import glob
+
+from lib.loaders import iter_stream
+from lib.Stream import Stream, BipartiteStream
+
+
+class TestLoaders:
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+    def test_iter_stream(self, chunk_size):
+        for filepath in glob.glob("./tests/integration/fixtures/*.json"):
+            data = json.load(open(filepath))
+            parsed = {}
+            links = []
+            for key, value in iter_stream(filepath, chunk_size=chunk_size):
+                if key == "link":
+                    links.append(value)
+                else:
+                    parsed[key] = value
+
+            assert(links == data.pop("E") and parsed == data)
+
+    def test_ndjson(self, tmp_path):
+        filepath = "./tests/integration/fixtures/Bipattern-ChangingNeighbours-StSa.json"
+        data = json.load(open(filepath))
+        ndjson = tmp_path / "stream.ndjson"
+        with open(ndjson, "w") as fp:
+            fp.write(json.dumps({ "T": data["T"], "V": data["V"] }) + "\n")
+            for l in data["E"]:
+                fp.write(json.dumps(l) + "\n")
+            fp.write(json.dumps({ "I": data["I"] }) + "\n")
+
+        s = BipartiteStream()
+        s.readStream(filepath)
+        s2 = BipartiteStream()
+        s2.readStream(str(ndjson))
+
+        assert(s == s2 and s.I == s2.I and s2.bipatterns_flag)
+
+    def test_discrete_time_after_links(self, tmp_path):
+        filepath = tmp_path / "stream.ndjson"
+        with open(filepath, "w") as fp:
+            fp.write(json.dumps({ "u": "u", "v": "v", "b": 2, "e": 4, "label": { "left": ["a"], "right": ["a"] } }) + "\n")
+            fp.write(json.dumps({ "T": { "alpha": 1, "omega": 9 }, "V": ["u", "v"], "I": ["a"] }) + "\n")
+
+        s = Stream()
+        s.readStream(str(filepath), time_step=2)
+
+        assert(s.W.alpha == 1 and s.W.duration() == 8)